@@ -0,0 +1,112 @@
+import anyio
+import asyncpg
+import click
+
+from app.config import Settings
+from app.database.migrations import MigrationRunner, load_migrations
+from app.database.plans import HOT_PATH_QUERIES, check_plan
+from app.errors import MigrationError
+
+__all__ = ("database_group",)
+
+
+@click.group(name="database")
+def database_group() -> None:
+    """Manage the database schema."""
+
+
+@database_group.command(name="migrate")
+@click.option("--target", type=int, default=None, help="Only migrate up to this version.")
+def migrate(target: int | None) -> None:
+    """Apply pending migrations.
+
+    Raises
+    ------
+    ClickException
+        If the migrations can't be applied.
+    """
+
+    async def run() -> None:
+        settings = Settings.from_env()
+        migrations = load_migrations(settings.migrations_path)
+        db_connection = await asyncpg.connect(settings.database_dsn)
+        try:
+            applied = await MigrationRunner(db_connection, migrations).migrate(target)
+        finally:
+            await db_connection.close()
+
+        for migration in applied:
+            click.echo(f"Applied {migration.version}_{migration.name}.")
+        if not applied:
+            click.echo("Database is up to date.")
+
+    try:
+        anyio.run(run)
+    except MigrationError as e:
+        raise click.ClickException(str(e)) from e
+
+
+@database_group.command(name="status")
+def status() -> None:
+    """Show which migrations have been applied.
+
+    Raises
+    ------
+    ClickException
+        If the applied migrations don't match the migration files.
+    """
+
+    async def run() -> None:
+        settings = Settings.from_env()
+        migrations = load_migrations(settings.migrations_path)
+        db_connection = await asyncpg.connect(settings.database_dsn)
+        try:
+            runner = MigrationRunner(db_connection, migrations)
+            pending = {migration.version for migration in await runner.pending()}
+        finally:
+            await db_connection.close()
+
+        for migration in migrations:
+            state = "pending" if migration.version in pending else "applied"
+            click.echo(f"{migration.version:>4} {migration.name:<40} {state}")
+
+    try:
+        anyio.run(run)
+    except MigrationError as e:
+        raise click.ClickException(str(e)) from e
+
+
+@database_group.command(name="check-plans")
+@click.option(
+    "--analyze",
+    is_flag=True,
+    help="Vacuum and analyze first, so plans are based on current statistics.",
+)
+def check_plans(*, analyze: bool) -> None:
+    """Verify the plans of the api's hot path queries use their indexes.
+
+    Raises
+    ------
+    ClickException
+        If any plan doesn't use its index.
+    """
+
+    async def run() -> int:
+        settings = Settings.from_env()
+        db_connection = await asyncpg.connect(settings.database_dsn)
+        try:
+            if analyze:
+                await db_connection.execute("VACUUM (ANALYZE);")
+            checks = [await check_plan(db_connection, query) for query in HOT_PATH_QUERIES]
+        finally:
+            await db_connection.close()
+
+        for check in checks:
+            state = "ok" if check.ok else f"FAIL, uses {', '.join(check.indexes) or 'no index'}"
+            click.echo(f"{check.query.name:<30} {check.query.index:<40} {state}")
+        return sum(not check.ok for check in checks)
+
+    failed = anyio.run(run)
+    if failed:
+        msg = f"{failed} queries don't use their index, run `pasf database migrate`."
+        raise click.ClickException(msg)
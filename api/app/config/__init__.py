@@ -0,0 +1,3 @@
+from app.config.settings import Settings
+
+__all__ = ("Settings",)
@@ -0,0 +1,6 @@
+from app.database import migrations, plans
+
+__all__ = (
+    "migrations",
+    "plans",
+)
@@ -0,0 +1,270 @@
+import hashlib
+import logging
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+from asyncpg import Connection, Record
+
+from app.errors import MigrationError
+
+__all__ = ("Migration", "MigrationRunner", "load_migrations")
+
+logger = logging.getLogger(__name__)
+
+_FILENAME = re.compile(r"(\d+)_(\w+)\.sql")
+_NO_TRANSACTION = "-- migrate: no-transaction"
+_STATEMENT_END = re.compile(r";[ \t]*$", re.MULTILINE)
+_CONCURRENT_INDEX = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE
+)
+_LOCK_KEY = "pasf_migrations"
+
+
+@dataclass(frozen=True, slots=True)
+class Migration:
+    """A versioned sql migration, loaded from ``<version>_<name>.sql``.
+
+    Migrations run in a transaction, unless their first line is
+    ``-- migrate: no-transaction``. Those run one statement at a time, e.g. to
+    ``CREATE INDEX CONCURRENTLY``. They aren't atomic, so every statement has to
+    be safe to run again, e.g. with ``IF NOT EXISTS``.
+
+    Attributes
+    ----------
+    version : :class:`int`
+        Version of the migration, migrations are applied in this order.
+    name : :class:`str`
+        Name of the migration.
+    sql : :class:`str`
+        The sql to run.
+    """
+
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def checksum(self) -> str:
+        """Sha256 of the sql, to detect migrations edited after being applied."""
+        return hashlib.sha256(self.sql.encode()).hexdigest()
+
+    @property
+    def transactional(self) -> bool:
+        """Whether the migration runs in a transaction."""
+        return not self.sql.startswith(_NO_TRANSACTION)
+
+    def statements(self) -> list[str]:
+        """Split the sql into statements, at semicolons ending a line.
+
+        Returns
+        -------
+        list[str]
+            The statements, leading comments included.
+        """
+        statements = [statement.strip() for statement in _STATEMENT_END.split(self.sql)]
+        return [statement for statement in statements if _strip_comments(statement)]
+
+    def concurrent_indexes(self) -> list[str]:
+        """Get the names of the indexes built concurrently by this migration.
+
+        Returns
+        -------
+        list[str]
+            The index names.
+        """
+        return _CONCURRENT_INDEX.findall(self.sql)
+
+
+def _strip_comments(sql: str) -> str:
+    return "\n".join(line for line in sql.splitlines() if not line.lstrip().startswith("--"))
+
+
+def load_migrations(path: Path) -> list[Migration]:
+    """Load the migrations in a directory.
+
+    Parameters
+    ----------
+    path : Path
+        The directory, with migrations named ``<version>_<name>.sql``.
+
+    Returns
+    -------
+    list[Migration]
+        The migrations, ordered by version.
+
+    Raises
+    ------
+    MigrationError
+        If a file isn't named after a version, or two migrations share a version.
+    """
+    migrations: dict[int, Migration] = {}
+    for file in sorted(path.glob("*.sql")):
+        match = _FILENAME.fullmatch(file.name)
+        if match is None:
+            msg = f"Migration {file.name} isn't named <version>_<name>.sql."
+            raise MigrationError(msg)
+
+        version = int(match[1])
+        if version in migrations:
+            msg = f"Migrations {migrations[version].name} and {match[2]} share version {version}."
+            raise MigrationError(msg)
+        migrations[version] = Migration(version, match[2], file.read_text(encoding="utf-8"))
+
+    return [migrations[version] for version in sorted(migrations)]
+
+
+class MigrationRunner:
+    """Applies migrations and records them in the ``schema_migrations`` table.
+
+    Runners hold an advisory lock while migrating, so concurrent deploys apply
+    every migration exactly once.
+
+    Parameters
+    ----------
+    db_connection : Connection
+        Asyncpg database connection, migrations need a connection of their own.
+    migrations : Sequence[Migration]
+        All migrations, ordered by version.
+    lock_timeout : float
+        Seconds a transactional migration waits for a table lock before failing,
+        instead of queueing every other query on that table behind it.
+    """
+
+    def __init__(
+        self,
+        db_connection: Connection,
+        migrations: Sequence[Migration],
+        lock_timeout: float = 5.0,
+    ) -> None:
+        self.db_connection: Connection = db_connection
+        self.migrations: Sequence[Migration] = migrations
+        self.lock_timeout: float = lock_timeout
+
+    async def _ensure_table(self) -> None:
+        await self.db_connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version integer PRIMARY KEY,
+                name varchar(255) NOT NULL,
+                checksum char(64) NOT NULL,
+                applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+            );
+            """
+        )
+
+    async def applied(self) -> dict[int, str]:
+        """Get the applied migrations.
+
+        Returns
+        -------
+        dict[int, str]
+            Checksums of the applied migrations, by version.
+        """
+        await self._ensure_table()
+        selection: list[Record] = await self.db_connection.fetch(
+            "SELECT version, checksum FROM schema_migrations;"
+        )
+        return {record[0]: record[1] for record in selection}
+
+    async def pending(self) -> list[Migration]:
+        """Get the migrations that haven't been applied yet.
+
+        Returns
+        -------
+        list[Migration]
+            The pending migrations, ordered by version.
+
+        Raises
+        ------
+        MigrationError
+            If an applied migration has been edited or removed since.
+        """
+        applied = await self.applied()
+        known = {migration.version for migration in self.migrations}
+        if missing := sorted(applied.keys() - known):
+            msg = f"Applied migrations {missing} are missing."
+            raise MigrationError(msg)
+
+        pending: list[Migration] = []
+        for migration in self.migrations:
+            checksum = applied.get(migration.version)
+            if checksum is None:
+                pending.append(migration)
+            elif checksum != migration.checksum:
+                msg = (
+                    f"Migration {migration.version}_{migration.name} was edited after being "
+                    "applied, add a new migration instead."
+                )
+                raise MigrationError(msg)
+        return pending
+
+    async def migrate(self, target: int | None = None) -> list[Migration]:
+        """Apply the pending migrations, in order.
+
+        Parameters
+        ----------
+        target : int | None
+            Only apply migrations up to and including this version, or all if ``None``.
+
+        Returns
+        -------
+        list[Migration]
+            The applied migrations.
+        """
+        await self.db_connection.execute("SELECT pg_advisory_lock(hashtext($1));", _LOCK_KEY)
+        try:
+            applied: list[Migration] = []
+            for migration in await self.pending():
+                if target is not None and migration.version > target:
+                    break
+                logger.info("Applying migration %d_%s.", migration.version, migration.name)
+                if migration.transactional:
+                    await self._apply_transactional(migration)
+                else:
+                    await self._apply_statements(migration)
+                applied.append(migration)
+            return applied
+        finally:
+            await self.db_connection.execute("SELECT pg_advisory_unlock(hashtext($1));", _LOCK_KEY)
+
+    async def _apply_transactional(self, migration: Migration) -> None:
+        async with self.db_connection.transaction():
+            await self.db_connection.execute(
+                "SELECT set_config('lock_timeout', $1, TRUE);",
+                f"{int(self.lock_timeout * 1000)}ms",
+            )
+            await self.db_connection.execute(migration.sql)
+            await self._record(migration)
+
+    async def _apply_statements(self, migration: Migration) -> None:
+        # A failed concurrent build leaves an invalid index behind, which
+        # ``IF NOT EXISTS`` would skip on the next attempt. We hold the lock, so
+        # these can't be in the middle of being built by another runner.
+        for index in migration.concurrent_indexes():
+            invalid: bool = await self.db_connection.fetchval(
+                """
+                SELECT EXISTS (
+                    SELECT 1
+                    FROM pg_index
+                    WHERE indexrelid = to_regclass($1) AND NOT indisvalid
+                );
+                """,
+                index,
+            )
+            if invalid:
+                logger.warning("Dropping invalid index %s left by a failed migration.", index)
+                await self.db_connection.execute(f"DROP INDEX CONCURRENTLY {index};")
+
+        for statement in migration.statements():
+            await self.db_connection.execute(statement)
+        await self._record(migration)
+
+    async def _record(self, migration: Migration) -> None:
+        await self.db_connection.execute(
+            "INSERT INTO schema_migrations (version, name, checksum) VALUES ($1, $2, $3);",
+            migration.version,
+            migration.name,
+            migration.checksum,
+        )
@@ -0,0 +1,188 @@
+import json
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any
+
+from asyncpg import Connection
+
+from app.utils.ids import uuid7
+
+__all__ = ("HOT_PATH_QUERIES", "HotPathQuery", "PlanCheck", "check_plan")
+
+
+@dataclass(frozen=True, slots=True)
+class HotPathQuery:
+    """A query the api runs, with the index it's supposed to use.
+
+    Attributes
+    ----------
+    name : :class:`str`
+        What the query is for.
+    sql : :class:`str`
+        The query, or the part of it that has to use the index.
+    index : :class:`str`
+        Name of the index.
+    args : :class:`tuple`
+        Example query arguments.
+    """
+
+    name: str
+    sql: str
+    index: str
+    args: tuple[object, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class PlanCheck:
+    """Result of checking the plan of a hot path query.
+
+    Attributes
+    ----------
+    query : :class:`HotPathQuery`
+        The query.
+    indexes : :class:`list`
+        Names of the indexes used by the plan.
+    """
+
+    query: HotPathQuery
+    indexes: list[str] = field(default_factory=list[str])
+
+    @property
+    def ok(self) -> bool:
+        """Whether the plan uses the expected index."""
+        return self.query.index in self.indexes
+
+
+HOT_PATH_QUERIES: tuple[HotPathQuery, ...] = (
+    HotPathQuery(
+        "card by id",
+        "SELECT id, name, front_content, back_content FROM cards WHERE id = $1;",
+        "cards_pkey",
+        (uuid7(),),
+    ),
+    HotPathQuery(
+        "decks of a card",
+        "SELECT deck_id FROM deck_cards WHERE card_id = $1;",
+        "deck_cards_card_id_index",
+        (uuid7(),),
+    ),
+    HotPathQuery(
+        "cards of a deck",
+        "SELECT card_id FROM deck_cards WHERE deck_id = $1;",
+        "deck_card_unique",
+        (uuid7(),),
+    ),
+    HotPathQuery(
+        "deck by name",
+        "SELECT id, name FROM decks WHERE name = $1;",
+        "deck_unique",
+        ("deck",),
+    ),
+    HotPathQuery(
+        "tags of a card",
+        "SELECT tag_id FROM card_tags WHERE card_id = $1;",
+        "card_tag_unique",
+        (uuid7(),),
+    ),
+    HotPathQuery(
+        "card already tagged",
+        "SELECT 1 FROM card_tags WHERE card_id = $1 AND tag_id = $2;",
+        "card_tag_unique",
+        (uuid7(), uuid7()),
+    ),
+    HotPathQuery(
+        "card tags of a tag",
+        "SELECT id FROM card_tags WHERE tag_id = $1 LIMIT 1000;",
+        "card_tags_tag_id_index",
+        (uuid7(),),
+    ),
+    HotPathQuery(
+        "tag by name",
+        "SELECT id, name FROM tags WHERE name = $1;",
+        "name_unique",
+        ("tag",),
+    ),
+    HotPathQuery(
+        "media of a card",
+        "SELECT id FROM card_media WHERE card_id = $1 ORDER BY created_at, id;",
+        "card_media_card_id_created_at_index",
+        (uuid7(),),
+    ),
+    HotPathQuery(
+        "referenced media blobs",
+        "SELECT DISTINCT sha256 FROM card_media WHERE sha256 = ANY($1::text[]);",
+        "card_media_sha256_index",
+        (["0" * 64],),
+    ),
+    HotPathQuery(
+        "claim a job",
+        """
+        SELECT id
+        FROM jobs
+        WHERE status = 'pending'
+            OR (status = 'running' AND updated_at < NOW() - $1::interval)
+        ORDER BY created_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED;
+        """,
+        "jobs_unfinished_created_at_index",
+        (timedelta(seconds=60),),
+    ),
+    HotPathQuery(
+        "newest jobs",
+        "SELECT id FROM jobs ORDER BY created_at DESC LIMIT $1;",
+        "jobs_created_at_index",
+        (100,),
+    ),
+    HotPathQuery(
+        "unfinished job of a target",
+        """
+        SELECT id
+        FROM jobs
+        WHERE kind = $1 AND target_id = $2 AND status IN ('pending', 'running');
+        """,
+        "jobs_unfinished_unique",
+        ("delete_deck", uuid7()),
+    ),
+    HotPathQuery(
+        "expired idempotency keys",
+        "SELECT ctid FROM idempotency_keys WHERE expires_at < NOW() LIMIT 1000;",
+        "idempotency_keys_expires_at_index",
+    ),
+)
+
+
+def _plan_indexes(plan: dict[str, Any]) -> Iterator[str]:
+    if "Index Name" in plan:
+        yield plan["Index Name"]
+    for sub_plan in plan.get("Plans", []):
+        yield from _plan_indexes(sub_plan)
+
+
+async def check_plan(db_connection: Connection, query: HotPathQuery) -> PlanCheck:
+    """Check whether the plan of a query uses its index.
+
+    Sequential scans are disabled while planning, small development databases
+    would otherwise always be scanned. So this checks the index is usable, not
+    that postgres prefers it for the current data.
+
+    Parameters
+    ----------
+    db_connection : Connection
+        Asyncpg database connection.
+    query : HotPathQuery
+        The query.
+
+    Returns
+    -------
+    PlanCheck
+        The indexes used by the plan.
+    """
+    async with db_connection.transaction(readonly=True):
+        await db_connection.execute("SET LOCAL enable_seqscan = off;")
+        plan: str = await db_connection.fetchval(
+            f"EXPLAIN (FORMAT JSON) {query.sql}",
+            *query.args,
+        )
+    return PlanCheck(query, list(_plan_indexes(json.loads(plan)[0]["Plan"])))
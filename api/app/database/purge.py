@@ -0,0 +1,81 @@
+import asyncio
+import contextlib
+import logging
+from typing import TYPE_CHECKING
+
+import asyncpg
+from asyncpg import Connection
+from asyncpg.pool import PoolConnectionProxy
+
+if TYPE_CHECKING:
+    from asyncpg import Pool
+
+__all__ = ("Purger",)
+
+logger = logging.getLogger(__name__)
+
+
+class Purger:
+    """Purges rows from the database in the background, in bounded batches.
+
+    Every ``interval`` seconds, :meth:`purge` is called until a batch isn't full.
+    A batch deletes at most ``batch_size`` rows, so purging never holds the
+    locks of many rows at once, which would block requests writing them.
+
+    Parameters
+    ----------
+    interval : float
+        Seconds between purges.
+    batch_size : int
+        Maximum amount of rows deleted by a batch.
+    """
+
+    purged: str = "rows"
+    """What is purged, for logs."""
+
+    def __init__(self, interval: float, batch_size: int = 1000) -> None:
+        self.interval: float = interval
+        self.batch_size: int = batch_size
+        self.db_pool: Pool | None = None
+        """Pool to purge with, set once it has been created."""
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        """Start purging in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop purging."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def purge(self, db_connection: Connection | PoolConnectionProxy) -> int:
+        """Purge a batch of at most ``batch_size`` rows.
+
+        Parameters
+        ----------
+        db_connection : Connection | PoolConnectionProxy
+            Asyncpg database connection.
+
+        Returns
+        -------
+        int
+            Amount of purged rows.
+        """
+        raise NotImplementedError
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.db_pool is None:
+                continue
+            try:
+                async with self.db_pool.acquire() as db_connection:
+                    while await self.purge(db_connection) >= self.batch_size:
+                        pass
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                logger.warning("Could not purge %s.", self.purged, exc_info=True)
@@ -0,0 +1,273 @@
+import asyncio
+import contextlib
+import logging
+import uuid
+from collections.abc import Awaitable, Callable, Generator, Sequence
+
+import asyncpg
+from asyncpg import Connection
+from asyncpg.pool import PoolConnectionProxy
+from pydantic import ValidationError
+
+from app.domain.cards.schemas import Change
+
+__all__ = (
+    "CHANGE_CHANNEL",
+    "MAX_PUBLISHED_CHANGES",
+    "ChangeFeed",
+    "ChangeSubscription",
+    "publish_change",
+    "publish_changes",
+)
+
+logger = logging.getLogger(__name__)
+
+CHANGE_CHANNEL = "pasf_changes"
+
+# Most changes a transaction should publish, subscribers buffer 256 of them. Bulk
+# writes publish larger amounts as deck reloads, or spread them over transactions.
+MAX_PUBLISHED_CHANGES = 64
+
+
+async def publish_change(db_connection: Connection | PoolConnectionProxy, change: Change) -> None:
+    """Publish a change to the change feeds of all workers.
+
+    Parameters
+    ----------
+    db_connection : Connection | PoolConnectionProxy
+        Asyncpg database connection, if it's in a transaction the change is
+        published on commit.
+    change : Change
+        The change.
+    """
+    await db_connection.execute(
+        "SELECT pg_notify($1, $2);", CHANGE_CHANNEL, change.model_dump_json(exclude_none=True)
+    )
+
+
+async def publish_changes(
+    db_connection: Connection | PoolConnectionProxy, changes: Sequence[Change]
+) -> None:
+    """Publish many changes in a single round trip, in order.
+
+    Parameters
+    ----------
+    db_connection : Connection | PoolConnectionProxy
+        Asyncpg database connection, if it's in a transaction the changes are
+        published on commit.
+    changes : Sequence[Change]
+        The changes.
+    """
+    await db_connection.execute(
+        "SELECT pg_notify($1, payload) FROM unnest($2::text[]) WITH ORDINALITY AS t(payload, i) "
+        "ORDER BY i;",
+        CHANGE_CHANNEL,
+        [change.model_dump_json(exclude_none=True) for change in changes],
+    )
+
+
+class ChangeSubscription:
+    """A subscriber's view of the change feed.
+
+    Changes are buffered in a bounded queue. When a subscriber falls behind and
+    the queue overflows, its backlog is dropped and the next :meth:`get` returns
+    ``None``, telling it to resync from the regular endpoints instead.
+
+    Parameters
+    ----------
+    deck_ids : frozenset[UUID] | None
+        Only receive changes affecting these decks, or all changes if ``None``.
+        Tag changes aren't scoped to a deck and are always received.
+    max_queue_size : int
+        Maximum amount of changes buffered before the subscriber is considered lagging.
+    """
+
+    def __init__(self, deck_ids: frozenset[uuid.UUID] | None, max_queue_size: int) -> None:
+        self.deck_ids: frozenset[uuid.UUID] | None = deck_ids
+        self._queue: asyncio.Queue[Change] = asyncio.Queue(max_queue_size)
+        self._lagging: bool = False
+
+    def matches(self, change: Change) -> bool:
+        """Whether the subscriber is interested in this change.
+
+        Returns
+        -------
+        bool
+            Whether the change should be sent to the subscriber.
+        """
+        if self.deck_ids is None or change.entity == "tag":
+            return True
+        return not self.deck_ids.isdisjoint(change.deck_ids)
+
+    def put(self, change: Change) -> None:
+        """Queue a change, marking the subscriber as lagging if it can't keep up."""
+        if self._lagging:
+            return
+        try:
+            self._queue.put_nowait(change)
+        except asyncio.QueueFull:
+            self.lag()
+
+    def lag(self) -> None:
+        """Mark the subscriber as lagging, it has to resync."""
+        self._lagging = True
+
+    async def get(self) -> Change | None:
+        """Wait for the next change.
+
+        Returns
+        -------
+        Change | None
+            The change, or ``None`` if changes were lost and the subscriber has to resync.
+        """
+        if self._lagging:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._lagging = False
+            return None
+        return await self._queue.get()
+
+
+class ChangeFeed:
+    """Fans out changes to cards, decks, tags and their relations.
+
+    Producers publish changes with postgres ``NOTIFY``, every worker process
+    ``LISTEN``s on a dedicated connection and passes them on to its own
+    subscribers. So subscribers see changes made through any worker.
+
+    Changes published while the listening connection is lost are missed, once it
+    is back subscribers are told to resync and resync listeners are awaited.
+
+    Parameters
+    ----------
+    dsn : str
+        Postgres dsn for the dedicated listening connection.
+    max_queue_size : int
+        Maximum amount of changes buffered per subscriber.
+    reconnect_interval : float
+        Seconds to wait before reconnecting after losing the listening connection.
+    """
+
+    def __init__(
+        self, dsn: str, max_queue_size: int = 256, reconnect_interval: float = 5.0
+    ) -> None:
+        self.dsn: str = dsn
+        self.max_queue_size: int = max_queue_size
+        self.reconnect_interval: float = reconnect_interval
+        self._subscriptions: set[ChangeSubscription] = set()
+        self._listeners: list[Callable[[Change], None]] = []
+        self._resync_listeners: list[Callable[[], Awaitable[None]]] = []
+        self._task: asyncio.Task[None] | None = None
+
+    def add_listener(self, listener: Callable[[Change], None]) -> None:
+        """Call a function for every change, used to keep in-memory state in sync.
+
+        Parameters
+        ----------
+        listener : Callable[[Change], None]
+            The function, it must not block.
+        """
+        self._listeners.append(listener)
+
+    def add_resync_listener(self, listener: Callable[[], Awaitable[None]]) -> None:
+        """Call a function after changes may have been missed, to reload in-memory state.
+
+        Parameters
+        ----------
+        listener : Callable[[], Awaitable[None]]
+            The function, called once changes are received again.
+        """
+        self._resync_listeners.append(listener)
+
+    @contextlib.contextmanager
+    def subscribe(self, deck_ids: frozenset[uuid.UUID] | None) -> Generator[ChangeSubscription]:
+        """Subscribe to changes for as long as the context is entered.
+
+        Parameters
+        ----------
+        deck_ids : frozenset[UUID] | None
+            Only receive changes affecting these decks, or all changes if ``None``.
+
+        Yields
+        ------
+        ChangeSubscription
+            The subscription.
+        """
+        subscription = ChangeSubscription(deck_ids, self.max_queue_size)
+        self._subscriptions.add(subscription)
+        try:
+            yield subscription
+        finally:
+            self._subscriptions.discard(subscription)
+
+    def start(self) -> None:
+        """Start listening in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Stop listening."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _listen(self) -> None:
+        missed_changes = False
+        while True:
+            try:
+                connection: Connection = await asyncpg.connect(self.dsn)
+            except (OSError, asyncpg.PostgresError):
+                logger.exception("Could not connect the change feed, retrying.")
+                missed_changes = True
+                await asyncio.sleep(self.reconnect_interval)
+                continue
+
+            try:
+                await self._listen_until_terminated(connection, resync=missed_changes)
+            finally:
+                await connection.close()
+
+            # Changes published while we weren't listening are lost.
+            logger.warning("Lost the change feed connection, reconnecting.")
+            missed_changes = True
+            for subscription in self._subscriptions:
+                subscription.lag()
+            await asyncio.sleep(self.reconnect_interval)
+
+    async def _listen_until_terminated(self, connection: Connection, *, resync: bool) -> None:
+        terminated = asyncio.Event()
+        connection.add_termination_listener(lambda _: terminated.set())
+        await connection.add_listener(CHANGE_CHANNEL, self._on_notification)
+        if resync:
+            # Only once listening again, so no change is missed while reloading.
+            await self._resync()
+        await terminated.wait()
+
+    async def _resync(self) -> None:
+        for listener in self._resync_listeners:
+            try:
+                await listener()
+            except Exception:
+                logger.exception("Could not resync after missing changes.")
+
+    def _on_notification(
+        self,
+        con_ref: Connection | PoolConnectionProxy,
+        pid: int,
+        channel: str,
+        payload: object,
+    ) -> None:
+        try:
+            change = Change.model_validate_json(str(payload))
+        except ValidationError:
+            logger.exception("Received a malformed change.")
+            return
+
+        for listener in self._listeners:
+            listener(change)
+
+        for subscription in self._subscriptions:
+            if subscription.matches(change):
+                subscription.put(change)
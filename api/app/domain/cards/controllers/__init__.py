@@ -1,9 +1,19 @@
+from app.domain.cards.controllers.batch_controller import BatchController
 from app.domain.cards.controllers.card_controller import CardController
+from app.domain.cards.controllers.change_controller import ChangeController
 from app.domain.cards.controllers.deck_controller import DeckController
+from app.domain.cards.controllers.media_controller import MediaController
+from app.domain.cards.controllers.study_controller import StudyController
+from app.domain.cards.controllers.sync_controller import SyncController
 from app.domain.cards.controllers.tag_controller import TagController
 
 __all__ = (
+    "BatchController",
     "CardController",
+    "ChangeController",
     "DeckController",
+    "MediaController",
+    "StudyController",
+    "SyncController",
     "TagController",
 )
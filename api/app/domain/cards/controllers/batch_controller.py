@@ -0,0 +1,86 @@
+from collections.abc import Sequence
+
+from litestar import Controller, MediaType, Response, post
+
+from app.domain.cards import urls
+from app.domain.cards.duplicate_index import DuplicateIndex
+from app.domain.cards.schemas import (
+    Batch,
+    BatchDeleteCard,
+    BatchFailure,
+    BatchResults,
+    BatchTagCard,
+    BatchUntagCard,
+    BatchUpdateTag,
+    Card,
+)
+from app.domain.cards.storage import CardStorage
+from app.domain.cards.tag_index import TagIndex
+from app.errors import BatchOperationError
+from app.middleware.idempotency import IDEMPOTENT_OPT_KEY
+
+
+class BatchController(Controller):
+    """Controller for batches of changes to cards, decks and tags."""
+
+    tags: Sequence[str] | None = ["Batch"]
+
+    @post(operation_id="ApplyBatch", path=urls.BATCH, opt={IDEMPOTENT_OPT_KEY: True})
+    async def apply_batch(
+        self,
+        storage: CardStorage,
+        tag_index: TagIndex,
+        duplicate_index: DuplicateIndex,
+        data: Batch,
+    ) -> Response[BatchResults | BatchFailure]:
+        """Apply a batch of card, deck and tag changes in a single transaction.
+
+        Operations are applied in order, either all of them or none. Consecutive
+        operations of the same kind are applied together, with a single
+        statement, so saving many edits costs one request and one commit.
+
+        Operations, by their ``op``:
+            update_card: card_id, and any of name, front_content and back_content
+            delete_card: card_id
+            update_deck: deck_id, name
+            update_tag: tag_id, name
+            tag_card: card_id, tag_id
+            untag_card: card_id, tag_id
+
+        Parameters
+        ----------
+        data : Batch
+            Json with the operations.
+
+        Returns
+        -------
+        Response[BatchResults | BatchFailure]
+            The result of every operation if succeeded, else the failed operation.
+        """
+        try:
+            results = await storage.apply_batch(data.operations)
+        # If any operation fails, nothing is applied and we error.
+        except BatchOperationError as e:
+            return Response(
+                BatchFailure(index=e.index, error=str(e)),
+                status_code=400,
+                media_type=MediaType.JSON,
+            )
+
+        for operation, result in zip(data.operations, results, strict=True):
+            match operation, result:
+                case _, Card() as card:
+                    duplicate_index.add_card(card.id, card.front_content)
+                case BatchDeleteCard(card_id=card_id), _:
+                    tag_index.remove_card(card_id)
+                    duplicate_index.remove_card(card_id)
+                case BatchUpdateTag(tag_id=tag_id, name=name), _:
+                    tag_index.rename_tag(tag_id, name)
+                case BatchTagCard(card_id=card_id, tag_id=tag_id), _:
+                    tag_index.tag_card(card_id, tag_id)
+                case BatchUntagCard(card_id=card_id, tag_id=tag_id), _:
+                    tag_index.untag_card(card_id, tag_id)
+                case _:
+                    pass
+
+        return Response(BatchResults(results=results), status_code=200, media_type=MediaType.JSON)
@@ -2,12 +2,28 @@
 from collections.abc import Sequence
 from typing import Annotated
 
-from asyncpg import Connection, Record
 from litestar import Controller, MediaType, Request, Response, delete, get, patch, post
+from litestar.di import Provide
+from litestar.openapi import ResponseSpec
 from litestar.params import Parameter
 
 from app.domain.cards import urls
-from app.domain.cards.schemas import Card, CardCreate, CardUpdate
+from app.domain.cards.dependencies import FieldSelection, provide_card_fields
+from app.domain.cards.duplicate_index import DuplicateIndex
+from app.domain.cards.schemas import (
+    Card,
+    CardAddTag,
+    CardCreate,
+    CardDuplicate,
+    CardQuery,
+    CardUpdate,
+)
+from app.domain.cards.storage import CardStorage
+from app.domain.cards.tag_index import TagIndex
+from app.errors import AlreadyExistsError, CardNotFoundError, TagNotFoundError
+from app.middleware.idempotency import IDEMPOTENT_OPT_KEY
+from app.utils.responses import SerialisedResponse
+from app.utils.singleflight import SingleFlight
 
 
 class CardController(Controller):
@@ -15,85 +31,217 @@ class CardController(Controller):
 
     tags: Sequence[str] | None = ["Cards"]
 
-    @get(operation_id="GetCard", path=urls.CARD_GET)
+    @get(
+        operation_id="GetCard",
+        path=urls.CARD_GET,
+        dependencies={"selection": Provide(provide_card_fields, sync_to_thread=False)},
+        responses={200: ResponseSpec(Card, description="The card.")},
+    )
     async def get_card(
         self,
         request: Request,
-        db_connection: Connection,
+        storage: CardStorage,
+        single_flight: SingleFlight[SerialisedResponse],
         card_id: Annotated[
             uuid.UUID, Parameter(title="Card ID", description="ID of the card to get.")
         ],
-    ) -> Response[Card | str]:
+        selection: FieldSelection,
+    ) -> Response[bytes]:
         """Retrieve a card.
 
+        Only the selected fields are read and sent, card contents can be cut
+        short to a preview. Concurrent requests for the same card share a single
+        query.
+
         Parameters
         ----------
         card_id : UUID
             ID of the card.
+        selection : FieldSelection
+            Fields to return.
 
         Returns
         -------
-        Response[Card | str]
+        Response[bytes]
             The card if found, else error.
         """
-        selection: list[Record] = await db_connection.fetch(
-            """
-            SELECT id, name, front_content, back_content
-            FROM cards
-            WHERE id = $1;
-            """,
-            card_id,
-        )
-        # If the card we're trying to get doesn't exist, we error.
-        if len(selection) == 0:
-            return Response(
-                "Card with id does not exist.",
-                status_code=400,
-                media_type=MediaType.JSON,
-            )
 
-        card: Record = selection[0]
+        async def fetch_card() -> SerialisedResponse:
+            card = await storage.get_card(card_id, selection)
+            # If the card we're trying to get doesn't exist, we error.
+            if card is None:
+                return SerialisedResponse.from_content(
+                    "Card with id does not exist.", status_code=400
+                )
 
-        return Response(
-            Card(id=card[0], name=card[1], front_content=card[2], back_content=card[3]),
-            status_code=200,
-            media_type=MediaType.JSON,
-        )
+            return SerialisedResponse(card)
+
+        response = await single_flight.do(("GetCard", card_id, selection), fetch_card)
+
+        return response.to_response()
 
-    @get(operation_id="ListCards", path=urls.CARD_LIST)
+    @get(
+        operation_id="ListCards",
+        path=urls.CARD_LIST,
+        dependencies={"selection": Provide(provide_card_fields, sync_to_thread=False)},
+        responses={200: ResponseSpec(list[Card], description="List with all the cards.")},
+    )
     async def list_cards(
-        self, request: Request, db_connection: Connection
-    ) -> Response[list[Card]]:
+        self,
+        request: Request,
+        storage: CardStorage,
+        single_flight: SingleFlight[SerialisedResponse],
+        selection: FieldSelection,
+    ) -> Response[bytes]:
         """Retrieve all the cards.
 
+        Only the selected fields are read and sent, card contents can be cut
+        short to a preview. Concurrent requests share a single query.
+
+        Parameters
+        ----------
+        selection : FieldSelection
+            Fields to return.
+
         Returns
         -------
-        list[Card]
+        Response[bytes]
             List with all the cards.
         """
-        selection: list[Record] = await db_connection.fetch(
-            """
-            SELECT id, name, front_content, back_content
-            FROM cards;
-            """
-        )
 
-        if len(selection) == 0:
-            cards: list[Card] = []
+        async def fetch_cards() -> SerialisedResponse:
+            return SerialisedResponse(await storage.list_cards(selection))
+
+        response = await single_flight.do(("ListCards", selection), fetch_cards)
+
+        return response.to_response()
+
+    @post(
+        operation_id="QueryCards",
+        path=urls.CARD_QUERY,
+        dependencies={"selection": Provide(provide_card_fields, sync_to_thread=False)},
+        responses={200: ResponseSpec(list[Card], description="List with the matching cards.")},
+    )
+    async def query_cards(
+        self,
+        storage: CardStorage,
+        tag_index: TagIndex,
+        data: CardQuery,
+        selection: FieldSelection,
+    ) -> Response[bytes]:
+        """Retrieve the cards matching a tag expression.
+
+        The expression is evaluated against the in-memory tag index, only the
+        matching page of cards is read from storage. While the index is still being
+        built, the expression is evaluated by the storage instead.
+
+        Parameters
+        ----------
+        data : CardQuery
+            Json with the tag expression, combining tags with and/or/not, and paging.
+        selection : FieldSelection
+            Fields to return.
+
+        Returns
+        -------
+        Response[bytes]
+            List with the matching cards.
+        """
+        if tag_index.ready:
+            await tag_index.refresh(storage)
+            card_ids: list[uuid.UUID] = tag_index.query(data.filter, data.limit, data.offset)
+            cards = await storage.get_cards(card_ids, selection)
         else:
-            cards: list[Card] = [
-                Card(id=card[0], name=card[1], front_content=card[2], back_content=card[3])
-                for card in selection
-            ]
+            cards = await storage.query_cards(data.filter, data.limit, data.offset, selection)
+
+        return SerialisedResponse(cards).to_response()
+
+    @get(operation_id="GetCardDuplicates", path=urls.CARD_DUPLICATES)
+    async def get_duplicates(
+        self,
+        storage: CardStorage,
+        duplicate_index: DuplicateIndex,
+        card_id: Annotated[
+            uuid.UUID,
+            Parameter(title="Card ID", description="ID of the card to find duplicates of."),
+        ],
+        similarity: Annotated[
+            float,
+            Parameter(
+                title="Similarity",
+                description="Minimum similarity of the front contents, from 0.6 to 1.",
+                ge=0.6,
+                le=1,
+            ),
+        ] = 0.8,
+        limit: Annotated[
+            int,
+            Parameter(
+                title="Limit", description="Maximum amount of duplicates to return.", ge=1, le=1000
+            ),
+        ] = 100,
+    ) -> Response[list[CardDuplicate] | str]:
+        """Find the near-duplicates of a card.
+
+        Front contents are compared case-insensitively, ignoring whitespace and
+        punctuation, and small edits lower the similarity only a little. Lookups
+        go through the in-memory duplicate index, so they don't compare the card
+        with every other card.
+
+        Parameters
+        ----------
+        card_id : UUID
+            ID of the card.
+        similarity : float
+            Minimum estimated jaccard similarity of the front contents' shingles.
+        limit : int
+            Maximum amount of duplicates to return.
 
-        return Response(cards, status_code=200, media_type=MediaType.JSON)
+        Returns
+        -------
+        Response[list[CardDuplicate] | str]
+            The duplicates, most similar first, else error.
+        """
+        if not duplicate_index.ready:
+            return Response(
+                "Duplicate index is still being built.",
+                status_code=503,
+                media_type=MediaType.JSON,
+            )
+
+        await duplicate_index.refresh(storage)
+        duplicates = duplicate_index.duplicates(card_id, similarity, limit)
+        # If the card we're trying to find duplicates of doesn't exist, we error.
+        if duplicates is None:
+            return Response(
+                "Card with id does not exist.",
+                status_code=400,
+                media_type=MediaType.JSON,
+            )
 
-    @post(operation_id="CreateCard", path=urls.CARD_CREATE)
+        return Response(
+            [
+                CardDuplicate(id=duplicate_id, similarity=score)
+                for duplicate_id, score in duplicates
+            ],
+            status_code=200,
+            media_type=MediaType.JSON,
+        )
+
+    @post(operation_id="CreateCard", path=urls.CARD_CREATE, opt={IDEMPOTENT_OPT_KEY: True})
     async def create_card(
-        self, request: Request, db_connection: Connection, data: CardCreate
+        self,
+        request: Request,
+        storage: CardStorage,
+        tag_index: TagIndex,
+        duplicate_index: DuplicateIndex,
+        data: CardCreate,
     ) -> Response[Card]:
         """Create a card.
 
+        Retries with the same ``Idempotency-Key`` header get the stored response,
+        without creating anything again.
+
         Parameters
         ----------
         data : CardCreate
@@ -104,23 +252,45 @@ async def create_card(
         Response[Card]
             The created card.
         """
-        selection: list[Record] = await db_connection.fetch(
-            """
-            INSERT INTO cards
-            VALUES ($1, $2, $3, $4)
-            ON CONFLICT DO NOTHING
-            RETURNING id, name, front_content, back_content;
-            """,
-            uuid.uuid4(),
-            data.name,
-            data.front_content,
-            data.back_content,
-        )
+        card = await storage.create_card(data)
+        tag_index.add_card(card.id)
+        duplicate_index.add_card(card.id, card.front_content)
 
-        card = selection[0]
+        return Response(card, status_code=200, media_type=MediaType.JSON)
+
+    @post(operation_id="AddTagToCard", path=urls.CARD_ADD_TAG)
+    async def add_tag(
+        self, storage: CardStorage, tag_index: TagIndex, data: CardAddTag
+    ) -> Response[str | None]:
+        """Add a tag to a card.
+
+        Parameters
+        ----------
+        data : CardAddTag
+            Json with the card and tag ids.
+
+        Returns
+        -------
+        Response[str | None]
+            A success code if succeeded, else error.
+        """
+        try:
+            await storage.tag_card(data.card_id, data.tag_id)
+        # If either the card or the tag doesn't exist, we error.
+        except (CardNotFoundError, TagNotFoundError):
+            return Response(
+                "Card or tag with id does not exist.",
+                status_code=400,
+                media_type=MediaType.JSON,
+            )
+        # If the card already has this tag, we also error.
+        except AlreadyExistsError as e:
+            return Response(str(e), status_code=400, media_type=MediaType.JSON)
+
+        tag_index.tag_card(data.card_id, data.tag_id)
 
         return Response(
-            Card(id=card[0], name=card[1], front_content=card[2], back_content=card[3]),
+            None,
             status_code=200,
             media_type=MediaType.JSON,
         )
@@ -129,7 +299,8 @@ async def create_card(
     async def update_card(
         self,
         request: Request,
-        db_connection: Connection,
+        storage: CardStorage,
+        duplicate_index: DuplicateIndex,
         data: CardUpdate,
         card_id: Annotated[
             uuid.UUID, Parameter(title="Card ID", description="ID of the card to update.")
@@ -154,63 +325,27 @@ async def update_card(
         Response[Card | str]
             The updated card if succeeded, else error.
         """
-        original_selection: list[Record] = await db_connection.fetch(
-            """
-            SELECT name, front_content, back_content
-            FROM cards
-            WHERE id = $1;
-            """,
-            card_id,
-        )
+        card = await storage.update_card(card_id, data)
 
         # If the card we're trying to update doesn't exist, we error.
-        if len(original_selection) == 0:
+        if card is None:
             return Response(
                 "Card with id does not exist.",
                 status_code=400,
                 media_type=MediaType.JSON,
             )
 
-        original_card_selection: Record = original_selection[0]
+        duplicate_index.add_card(card.id, card.front_content)
 
-        original_card: Card = Card(
-            id=card_id,
-            name=original_card_selection[0],
-            front_content=original_card_selection[1],
-            back_content=original_card_selection[2],
-        )
-
-        selection: list[Record] = await db_connection.fetch(
-            """
-            UPDATE cards
-            SET name = $2, front_content = $3, back_content = $4
-            WHERE id = $1
-            RETURNING id, name, front_content, back_content;
-            """,
-            card_id,
-            data.name if data.name is not None else original_card.name,
-            data.front_content if data.front_content is not None else original_card.front_content,
-            data.back_content if data.back_content is not None else original_card.back_content,
-        )
-
-        card_selection: Record = selection[0]
-
-        return Response(
-            Card(
-                id=card_selection[0],
-                name=card_selection[1],
-                front_content=card_selection[2],
-                back_content=card_selection[3],
-            ),
-            status_code=200,
-            media_type=MediaType.JSON,
-        )
+        return Response(card, status_code=200, media_type=MediaType.JSON)
 
     @delete(operation_id="DeleteCard", path=urls.CARD_DELETE)
     async def delete_card(
         self,
         request: Request,
-        db_connection: Connection,
+        storage: CardStorage,
+        tag_index: TagIndex,
+        duplicate_index: DuplicateIndex,
         card_id: Annotated[
             uuid.UUID, Parameter(title="Card ID", description="ID of the card to delete.")
         ],
@@ -227,13 +362,9 @@ async def delete_card(
         Response[None]
             A success code.
         """
-        await db_connection.execute(
-            """
-            DELETE FROM cards
-            WHERE id = $1;
-            """,
-            card_id,
-        )
+        await storage.delete_card(card_id)
+        tag_index.remove_card(card_id)
+        duplicate_index.remove_card(card_id)
 
         return Response(
             None,
@@ -0,0 +1,68 @@
+import asyncio
+import uuid
+from collections.abc import AsyncIterator, Sequence
+from typing import Annotated
+
+from litestar import Controller, get
+from litestar.params import Parameter
+from litestar.response import ServerSentEvent, ServerSentEventMessage
+
+from app.domain.cards import urls
+from app.domain.cards.change_feed import ChangeFeed
+from app.middleware.admission import ROUTE_CLASS_OPT_KEY
+
+KEEPALIVE_INTERVAL: float = 15.0
+
+
+class ChangeController(Controller):
+    """Controller for the change feed."""
+
+    tags: Sequence[str] | None = ["Changes"]
+
+    # Streams are long-lived and don't hold a database connection, so they don't
+    # count towards the admission limits.
+    @get(operation_id="ChangeFeed", path=urls.CHANGE_FEED, opt={ROUTE_CLASS_OPT_KEY: "exempt"})
+    async def change_feed(
+        self,
+        change_feed: ChangeFeed,
+        deck_id: Annotated[
+            list[uuid.UUID] | None,
+            Parameter(title="Deck IDs", description="Only send changes affecting these decks."),
+        ] = None,
+    ) -> ServerSentEvent:
+        """Stream changes to cards, decks, tags and deck memberships as server-sent events.
+
+        Every change is sent as a ``change`` event with the change as json data. A
+        ``resync`` event means changes were lost, e.g. because the client couldn't
+        keep up, and it should refetch what it's showing. A deck ``reload`` change
+        means the same for that deck.
+
+        Parameters
+        ----------
+        deck_id : list[UUID] | None
+            Only send changes affecting these decks, tag changes are always sent.
+
+        Returns
+        -------
+        ServerSentEvent
+            The event stream.
+        """
+        deck_ids = frozenset(deck_id) if deck_id is not None else None
+
+        async def stream() -> AsyncIterator[ServerSentEventMessage]:
+            with change_feed.subscribe(deck_ids) as subscription:
+                while True:
+                    try:
+                        change = await asyncio.wait_for(subscription.get(), KEEPALIVE_INTERVAL)
+                    except TimeoutError:
+                        yield ServerSentEventMessage(comment="keepalive")
+                        continue
+
+                    if change is None:
+                        yield ServerSentEventMessage(event="resync")
+                    else:
+                        yield ServerSentEventMessage(
+                            data=change.model_dump_json(exclude_none=True), event="change"
+                        )
+
+        return ServerSentEvent(stream())
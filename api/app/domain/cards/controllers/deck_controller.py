@@ -1,14 +1,38 @@
 import uuid
 from collections.abc import Sequence
-from typing import Annotated
+from typing import Annotated, Any
 
-from asyncpg import Connection, Record
 from litestar import Controller, MediaType, Request, Response, delete, get, patch, post
+from litestar.di import Provide
+from litestar.openapi import ResponseSpec
 from litestar.params import Parameter
 
 from app.domain.cards import urls
-from app.domain.cards.schemas import Deck, DeckCreate, DeckUpdate
-from app.errors import DeckNotFoundError
+from app.domain.cards.dependencies import (
+    FieldSelection,
+    Pagination,
+    provide_deck_card_fields,
+    provide_deck_fields,
+    provide_pagination,
+)
+from app.domain.cards.duplicate_index import DuplicateIndex
+from app.domain.cards.schemas import (
+    Deck,
+    DeckAddCard,
+    DeckClone,
+    DeckCreate,
+    DeckUpdate,
+    DeckWithCards,
+    DuplicateCluster,
+)
+from app.domain.cards.snapshots import DeckSnapshotStore
+from app.domain.cards.storage import CardStorage
+from app.domain.jobs.schemas import Job
+from app.errors import AlreadyExistsError, CardNotFoundError, DeckNotFoundError
+from app.middleware.idempotency import IDEMPOTENT_OPT_KEY
+from app.utils.http import accepts_encoding, etag_matches
+from app.utils.responses import SerialisedResponse
+from app.utils.singleflight import SingleFlight
 
 
 class DeckController(Controller):
@@ -16,53 +40,128 @@ class DeckController(Controller):
 
     tags: Sequence[str] | None = ["Decks"]
 
-    async def _get_deck_by_name(self, db_connection: Connection, name: str) -> Deck:
-        """Get a deck from its name.
+    @get(
+        operation_id="GetDeck",
+        path=urls.DECK_GET,
+        dependencies={"selection": Provide(provide_deck_fields, sync_to_thread=False)},
+        responses={200: ResponseSpec(Deck, description="The deck.")},
+    )
+    async def get_deck(
+        self,
+        request: Request,
+        storage: CardStorage,
+        single_flight: SingleFlight[SerialisedResponse],
+        deck_id: Annotated[
+            uuid.UUID, Parameter(title="Deck ID", description="ID of the deck to get.")
+        ],
+        selection: FieldSelection,
+    ) -> Response[bytes]:
+        """Retrieve a deck.
+
+        Only the selected fields are read and sent. Concurrent requests for the
+        same deck share a single query.
 
         Parameters
         ----------
-        db_connection : Connection
-            Asyncpg database connection.
-        name : str
-            Name of the deck.
+        deck_id : UUID
+            ID of the deck.
+        selection : FieldSelection
+            Fields to return.
 
         Returns
         -------
-        Deck
-            The deck.
+        Response[bytes]
+            The deck if found, else error.
+        """
+
+        async def fetch_deck() -> SerialisedResponse:
+            deck = await storage.get_deck(deck_id, selection)
+            # If the deck we're trying to get doesn't exist, we error.
+            if deck is None:
+                return SerialisedResponse.from_content(
+                    "Deck with id does not exist.", status_code=400
+                )
+
+            return SerialisedResponse(deck)
+
+        response = await single_flight.do(("GetDeck", deck_id, selection), fetch_deck)
+
+        return response.to_response()
+
+    @get(
+        operation_id="GetDeckWithCards",
+        path=urls.DECK_GET_WITH_CARDS,
+        dependencies={
+            "pagination": Provide(provide_pagination, sync_to_thread=False),
+            "selection": Provide(provide_deck_card_fields, sync_to_thread=False),
+        },
+        responses={200: ResponseSpec(DeckWithCards, description="The deck with its cards.")},
+    )
+    async def get_deck_with_cards(
+        self,
+        storage: CardStorage,
+        single_flight: SingleFlight[SerialisedResponse],
+        deck_id: Annotated[
+            uuid.UUID, Parameter(title="Deck ID", description="ID of the deck to get.")
+        ],
+        pagination: Pagination,
+        selection: FieldSelection,
+    ) -> Response[bytes]:
+        """Retrieve a deck together with a page of its cards and their tags.
+
+        Cards are ordered by name. Only the selected card fields are read, tags
+        are only read if selected. Concurrent requests for the same page share a
+        single query.
+
+        Parameters
+        ----------
+        deck_id : UUID
+            ID of the deck.
+        pagination : Pagination
+            Page of cards to return.
+        selection : FieldSelection
+            Fields of the cards to return.
 
-        Raises
-        ------
-        DeckNotFoundError
-            If deck with name does not exist.
+        Returns
+        -------
+        Response[bytes]
+            The deck with its cards if found, else error.
         """
-        selection: list[Record] = await db_connection.fetch(
-            """
-            SELECT id, name
-            FROM decks
-            WHERE name = $1;
-            """,
-            name,
-        )
 
-        if len(selection) == 0:
-            msg = "Deck with name does not exist."
-            raise DeckNotFoundError(msg)
+        async def fetch_deck_with_cards() -> SerialisedResponse:
+            deck = await storage.get_deck_with_cards(deck_id, pagination, selection)
+            # If the deck we're trying to get doesn't exist, we error.
+            if deck is None:
+                return SerialisedResponse.from_content(
+                    "Deck with id does not exist.", status_code=400
+                )
 
-        deck = selection[0]
+            return SerialisedResponse(deck)
 
-        return Deck(id=deck[0], name=deck[1])
+        response = await single_flight.do(
+            ("GetDeckWithCards", deck_id, pagination, selection), fetch_deck_with_cards
+        )
 
-    @get(operation_id="GetDeck", path=urls.DECK_GET)
-    async def get_deck(
+        return response.to_response()
+
+    @get(
+        operation_id="GetDeckSnapshot",
+        path=urls.DECK_SNAPSHOT,
+        responses={200: ResponseSpec(DeckWithCards, description="The deck with all its cards.")},
+    )
+    async def get_deck_snapshot(
         self,
-        request: Request,
-        db_connection: Connection,
+        request: Request[Any, Any, Any],
+        deck_snapshots: DeckSnapshotStore,
         deck_id: Annotated[
             uuid.UUID, Parameter(title="Deck ID", description="ID of the deck to get.")
         ],
-    ) -> Response[Deck | str]:
-        """Retrieve a deck.
+    ) -> Response[Any]:
+        """Retrieve a deck together with all of its cards and their tags.
+
+        Served from a snapshot that is serialised and gzip compressed once per
+        change to the deck, sent as is to clients accepting gzip. Supports
+        conditional requests with ``If-None-Match``.
 
         Parameters
         ----------
@@ -71,64 +170,144 @@ async def get_deck(
 
         Returns
         -------
-        Response[Deck | str]
-            The deck if found, else error.
+        Response[Any]
+            The deck with its cards or not modified if found, else error.
         """
-        selection: list[Record] = await db_connection.fetch(
-            """
-            SELECT id, name
-            FROM decks
-            WHERE id = $1;
-            """,
-            deck_id,
-        )
+        snapshot = await deck_snapshots.get(deck_id)
         # If the deck we're trying to get doesn't exist, we error.
-        if len(selection) == 0:
+        if snapshot is None:
+            return SerialisedResponse.from_content(
+                "Deck with id does not exist.", status_code=400
+            ).to_response()
+
+        compressed = accepts_encoding(request.headers.get("Accept-Encoding", ""), "gzip")
+        # Both encodings of the same snapshot are different representations.
+        etag = f'"{snapshot.digest}-gzip"' if compressed else f'"{snapshot.digest}"'
+        headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None and etag_matches(if_none_match, etag):
+            return Response(None, status_code=304, headers=headers)
+
+        if compressed:
+            headers["Content-Encoding"] = "gzip"
+            return Response(
+                snapshot.content, status_code=200, media_type=MediaType.JSON, headers=headers
+            )
+
+        return Response(
+            await deck_snapshots.decompress(snapshot),
+            status_code=200,
+            media_type=MediaType.JSON,
+            headers=headers,
+        )
+
+    @get(operation_id="GetDeckDuplicates", path=urls.DECK_DUPLICATES)
+    async def get_duplicates(
+        self,
+        storage: CardStorage,
+        duplicate_index: DuplicateIndex,
+        deck_id: Annotated[
+            uuid.UUID,
+            Parameter(title="Deck ID", description="ID of the deck to find duplicates in."),
+        ],
+        similarity: Annotated[
+            float,
+            Parameter(
+                title="Similarity",
+                description="Minimum similarity of the front contents, from 0.6 to 1.",
+                ge=0.6,
+                le=1,
+            ),
+        ] = 0.8,
+    ) -> Response[list[DuplicateCluster] | str]:
+        """Group the cards of a deck whose front contents are near-duplicates.
+
+        Only the ids of the deck's cards are read, they are grouped through the
+        in-memory duplicate index in time linear in the size of the deck.
+
+        Parameters
+        ----------
+        deck_id : UUID
+            ID of the deck.
+        similarity : float
+            Minimum estimated jaccard similarity of the front contents' shingles.
+
+        Returns
+        -------
+        Response[list[DuplicateCluster] | str]
+            The clusters of duplicates, largest first, else error.
+        """
+        if not duplicate_index.ready:
+            return Response(
+                "Duplicate index is still being built.",
+                status_code=503,
+                media_type=MediaType.JSON,
+            )
+
+        card_ids = await storage.get_deck_card_ids(deck_id)
+        # If the deck we're trying to find duplicates in doesn't exist, we error.
+        if card_ids is None:
             return Response(
                 "Deck with id does not exist.",
                 status_code=400,
                 media_type=MediaType.JSON,
             )
 
-        deck: Record = selection[0]
+        await duplicate_index.refresh(storage)
+        clusters = duplicate_index.clusters(card_ids, similarity)
 
         return Response(
-            Deck(id=deck[0], name=deck[1]),
+            [DuplicateCluster(card_ids=cluster) for cluster in clusters],
             status_code=200,
             media_type=MediaType.JSON,
         )
 
-    @get(operation_id="ListDecks", path=urls.DECK_LIST)
+    @get(
+        operation_id="ListDecks",
+        path=urls.DECK_LIST,
+        dependencies={"selection": Provide(provide_deck_fields, sync_to_thread=False)},
+        responses={200: ResponseSpec(list[Deck], description="List with all the decks.")},
+    )
     async def list_decks(
-        self, request: Request, db_connection: Connection
-    ) -> Response[list[Deck]]:
+        self,
+        request: Request,
+        storage: CardStorage,
+        single_flight: SingleFlight[SerialisedResponse],
+        selection: FieldSelection,
+    ) -> Response[bytes]:
         """Retrieve all the decks.
 
+        Only the selected fields are read and sent. Concurrent requests share a
+        single query.
+
+        Parameters
+        ----------
+        selection : FieldSelection
+            Fields to return.
+
         Returns
         -------
-        list[Deck]
+        Response[bytes]
             List with all the decks.
         """
-        selection: list[Record] = await db_connection.fetch(
-            """
-            SELECT id, name
-            FROM decks;
-            """
-        )
 
-        if len(selection) == 0:
-            decks: list[Deck] = []
-        else:
-            decks: list[Deck] = [Deck(id=deck[0], name=deck[1]) for deck in selection]
+        async def fetch_decks() -> SerialisedResponse:
+            return SerialisedResponse(await storage.list_decks(selection))
+
+        response = await single_flight.do(("ListDecks", selection), fetch_decks)
 
-        return Response(decks, status_code=200, media_type=MediaType.JSON)
+        return response.to_response()
 
-    @post(operation_id="CreateDeck", path=urls.DECK_CREATE)
+    @post(operation_id="CreateDeck", path=urls.DECK_CREATE, opt={IDEMPOTENT_OPT_KEY: True})
     async def create_deck(
-        self, request: Request, db_connection: Connection, data: DeckCreate
+        self, request: Request, storage: CardStorage, data: DeckCreate
     ) -> Response[Deck | str]:
         """Create a deck.
 
+        Retries with the same ``Idempotency-Key`` header get the stored response,
+        without creating anything again.
+
         Parameters
         ----------
         data : DeckCreate
@@ -139,29 +318,78 @@ async def create_deck(
         Response[Deck | str]
             The created deck if succeeded, else error.
         """
-        selection: list[Record] = await db_connection.fetch(
-            """
-            INSERT INTO decks
-            VALUES ($1, $2)
-            ON CONFLICT DO NOTHING
-            RETURNING id, name;
-            """,
-            uuid.uuid4(),
-            data.name,
-        )
-
         # If a deck with this name already exists, we error.
-        if len(selection) == 0:
+        try:
+            deck = await storage.create_deck(data.name)
+        except AlreadyExistsError as e:
+            return Response(str(e), status_code=400, media_type=MediaType.JSON)
+
+        return Response(deck, status_code=200, media_type=MediaType.JSON)
+
+    @post(operation_id="CloneDeck", path=urls.DECK_CLONE, opt={IDEMPOTENT_OPT_KEY: True})
+    async def clone_deck(
+        self,
+        storage: CardStorage,
+        deck_id: Annotated[
+            uuid.UUID, Parameter(title="Deck ID", description="ID of the deck to clone.")
+        ],
+        data: DeckClone,
+    ) -> Response[Deck | str]:
+        """Clone a deck, with copies of its cards, their tags and media.
+
+        Retries with the same ``Idempotency-Key`` header get the stored response,
+        without creating anything again.
+
+        Postgres makes the copy in a single statement, media included.
+
+        Parameters
+        ----------
+        deck_id : UUID
+            ID of the deck to clone.
+        data : DeckClone
+            Json with the name of the new deck.
+
+        Returns
+        -------
+        Response[Deck | str]
+            The new deck if succeeded, else error.
+        """
+        try:
+            deck = await storage.clone_deck(deck_id, data.name)
+        except (AlreadyExistsError, DeckNotFoundError) as e:
+            return Response(str(e), status_code=400, media_type=MediaType.JSON)
+
+        return Response(deck, status_code=200, media_type=MediaType.JSON)
+
+    @post(operation_id="AddCardToDeck", path=urls.DECK_ADD_CARD)
+    async def add_card(self, storage: CardStorage, data: DeckAddCard) -> Response[str | None]:
+        """Add a card to a deck.
+
+        Parameters
+        ----------
+        data : DeckAddCard
+            Json with the deck and card ids.
+
+        Returns
+        -------
+        Response[str | None]
+            A success code if succeeded, else error.
+        """
+        try:
+            await storage.add_card_to_deck(data.deck_id, data.card_id)
+        # If either the deck or the card doesn't exist, we error.
+        except (DeckNotFoundError, CardNotFoundError):
             return Response(
-                "Deck with name already exists.",
+                "Deck or card with id does not exist.",
                 status_code=400,
                 media_type=MediaType.JSON,
             )
-
-        deck: Record = selection[0]
+        # If the card is already in the deck, we also error.
+        except AlreadyExistsError as e:
+            return Response(str(e), status_code=400, media_type=MediaType.JSON)
 
         return Response(
-            Deck(id=deck[0], name=deck[1]),
+            None,
             status_code=200,
             media_type=MediaType.JSON,
         )
@@ -170,7 +398,7 @@ async def create_deck(
     async def update_deck(
         self,
         request: Request,
-        db_connection: Connection,
+        storage: CardStorage,
         data: DeckUpdate,
         deck_id: Annotated[
             uuid.UUID, Parameter(title="Deck ID", description="ID of the deck to update.")
@@ -193,76 +421,53 @@ async def update_deck(
         Response[Deck | str]
             The updated deck if succeeded, else error.
         """
-        # If a deck with the new name already exists, we error.
+        # If a deck with the new name already exists, or the deck we're trying to
+        # update doesn't, we error.
         try:
-            await self._get_deck_by_name(db_connection, data.name)
-        except DeckNotFoundError:
-            pass
-        else:
-            return Response(
-                "Deck with this name already exists, the name must be unique.",
-                status_code=400,
-                media_type=MediaType.JSON,
-            )
-
-        selection: list[Record] = await db_connection.fetch(
-            """
-            UPDATE decks
-            SET name = $2
-            WHERE id = $1
-            RETURNING id, name;
-            """,
-            deck_id,
-            data.name,
-        )
-
-        # If the deck we're trying to update doesn't exist, we also error.
-        if len(selection) == 0:
-            return Response(
-                "Deck with id does not exist.",
-                status_code=400,
-                media_type=MediaType.JSON,
-            )
+            deck = await storage.update_deck(deck_id, data.name)
+        except (AlreadyExistsError, DeckNotFoundError) as e:
+            return Response(str(e), status_code=400, media_type=MediaType.JSON)
 
-        deck = selection[0]
-
-        return Response(
-            Deck(id=deck[0], name=deck[1]),
-            status_code=200,
-            media_type=MediaType.JSON,
-        )
+        return Response(deck, status_code=200, media_type=MediaType.JSON)
 
-    @delete(operation_id="DeleteDeck", path=urls.DECK_DELETE)
+    @delete(operation_id="DeleteDeck", path=urls.DECK_DELETE, status_code=202)
     async def delete_deck(
         self,
-        request: Request,
-        db_connection: Connection,
+        storage: CardStorage,
         deck_id: Annotated[
             uuid.UUID, Parameter(title="Deck ID", description="ID of the deck to delete.")
         ],
-    ) -> Response[None]:
-        """Delete  a deck.
+        *,
+        delete_orphaned_cards: Annotated[
+            bool,
+            Parameter(
+                title="Delete orphaned cards",
+                description="Also delete the deck's cards that aren't in any other deck.",
+            ),
+        ] = False,
+    ) -> Response[Job | str]:
+        """Delete a deck in the background.
+
+        Large decks are removed in batches by a job, so this returns at once with
+        the job to follow its progress. The in-memory storage deletes at once, its
+        job has already succeeded.
 
         Parameters
         ----------
         deck_id : UUID
             ID of the deck.
+        delete_orphaned_cards : bool
+            Also delete the deck's cards that aren't in any other deck.
 
         Returns
         -------
-        Response[None]
-            A success code.
+        Response[Job | str]
+            The deletion job if the deck exists, else error.
         """
-        await db_connection.execute(
-            """
-            DELETE FROM decks
-            WHERE id = $1;
-            """,
-            deck_id,
-        )
+        job = await storage.delete_deck(deck_id, delete_orphaned_cards=delete_orphaned_cards)
+        if job is None:
+            return Response(
+                "Deck with id does not exist.", status_code=400, media_type=MediaType.JSON
+            )
 
-        return Response(
-            None,
-            status_code=200,
-            media_type=MediaType.JSON,
-        )
+        return Response(job, status_code=202, media_type=MediaType.JSON)
@@ -0,0 +1,293 @@
+import uuid
+from collections.abc import Sequence
+from typing import Annotated, Any
+
+from asyncpg import Connection, ForeignKeyViolationError, Pool, Record
+from litestar import Controller, MediaType, Request, Response, delete, get, post
+from litestar.di import Provide
+from litestar.params import Parameter
+from litestar.response import File, Stream
+
+from app.domain.cards import urls
+from app.domain.cards.dependencies import MediaUpload, provide_media_upload
+from app.domain.cards.media_store import MediaStore
+from app.domain.cards.schemas import CardMedia
+from app.errors import MediaTooLargeError
+from app.utils.http import etag_matches, parse_byte_range
+from app.utils.ids import uuid7
+
+# Attachments are never modified, so their content can be cached indefinitely.
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Media types that are served as uploaded and shown by the browser, everything
+# else is downloaded as opaque bytes. Types that can run scripts, like html and
+# svg, must never be in here.
+INLINE_MEDIA_TYPES = frozenset({
+    "audio/aac",
+    "audio/flac",
+    "audio/mp4",
+    "audio/mpeg",
+    "audio/ogg",
+    "audio/wav",
+    "audio/webm",
+    "image/avif",
+    "image/gif",
+    "image/jpeg",
+    "image/png",
+    "image/webp",
+    "video/mp4",
+    "video/ogg",
+    "video/webm",
+})
+
+
+class MediaController(Controller):
+    """Controller for media files attached to cards."""
+
+    tags: Sequence[str] | None = ["Media"]
+
+    @post(
+        operation_id="UploadCardMedia",
+        path=urls.CARD_MEDIA_UPLOAD,
+        dependencies={"upload": Provide(provide_media_upload, sync_to_thread=False)},
+    )
+    async def upload_media(
+        self,
+        db_pool: Pool,
+        media_store: MediaStore,
+        card_id: Annotated[
+            uuid.UUID, Parameter(title="Card ID", description="ID of the card to attach to.")
+        ],
+        upload: MediaUpload,
+    ) -> Response[CardMedia | str]:
+        """Attach a media file to a card.
+
+        The file is sent as the raw request body, with its media type as the
+        ``Content-Type``. It's streamed to storage, so it's never held in memory,
+        and no database connection is held while it is.
+
+        Parameters
+        ----------
+        card_id : UUID
+            ID of the card.
+
+        Returns
+        -------
+        Response[CardMedia | str]
+            The attachment if the card exists, else error.
+        """
+        # Checked before the upload is read, so no blob is written for missing cards.
+        async with db_pool.acquire() as db_connection:
+            card_exists: bool = await db_connection.fetchval(
+                "SELECT EXISTS (SELECT FROM cards WHERE id = $1);", card_id
+            )
+        if not card_exists:
+            return Response(
+                "Card with id does not exist.", status_code=400, media_type=MediaType.JSON
+            )
+
+        try:
+            sha256, size = await media_store.save(upload.chunks)
+        except MediaTooLargeError as e:
+            return Response(str(e), status_code=413, media_type=MediaType.JSON)
+
+        try:
+            async with db_pool.acquire() as db_connection:
+                selection: list[Record] = await db_connection.fetch(
+                    """
+                    INSERT INTO card_media (id, card_id, sha256, size, media_type, filename)
+                    VALUES ($1, $2, $3, $4, $5, $6)
+                    RETURNING id, card_id, sha256, size, media_type, filename, created_at;
+                    """,
+                    uuid7(),
+                    card_id,
+                    sha256,
+                    size,
+                    upload.media_type,
+                    upload.filename,
+                )
+        except ForeignKeyViolationError:
+            # Deleted while uploading, the blob is removed by the media sweeper.
+            return Response(
+                "Card with id does not exist.", status_code=400, media_type=MediaType.JSON
+            )
+
+        return Response(
+            CardMedia(**dict(selection[0])), status_code=201, media_type=MediaType.JSON
+        )
+
+    @get(operation_id="ListCardMedia", path=urls.CARD_MEDIA_LIST)
+    async def list_media(
+        self,
+        db_connection: Connection,
+        card_id: Annotated[
+            uuid.UUID,
+            Parameter(title="Card ID", description="ID of the card to list the media of."),
+        ],
+    ) -> Response[list[CardMedia]]:
+        """Retrieve the media files attached to a card.
+
+        Parameters
+        ----------
+        card_id : UUID
+            ID of the card.
+
+        Returns
+        -------
+        Response[list[CardMedia]]
+            List with the card's attachments.
+        """
+        selection: list[Record] = await db_connection.fetch(
+            """
+            SELECT id, card_id, sha256, size, media_type, filename, created_at
+            FROM card_media
+            WHERE card_id = $1
+            ORDER BY created_at, id;
+            """,
+            card_id,
+        )
+
+        return Response(
+            [CardMedia(**dict(media)) for media in selection],
+            status_code=200,
+            media_type=MediaType.JSON,
+        )
+
+    @get(operation_id="GetCardMedia", path=urls.CARD_MEDIA_GET)
+    async def get_media(
+        self,
+        request: Request[Any, Any, Any],
+        db_connection: Connection,
+        media_store: MediaStore,
+        media_id: Annotated[
+            uuid.UUID, Parameter(title="Media ID", description="ID of the attachment to get.")
+        ],
+    ) -> Response[Any]:
+        """Download a media file.
+
+        Supports conditional requests with ``If-None-Match``, and single byte
+        ranges with ``Range`` and ``If-Range``, e.g. for seeking in audio.
+
+        Only audio, images and video are shown inline with their uploaded media
+        type, anything else is downloaded as ``application/octet-stream``.
+
+        Parameters
+        ----------
+        media_id : UUID
+            ID of the attachment.
+
+        Returns
+        -------
+        Response[Any]
+            The file, part of it or not modified if found, else error.
+        """
+        selection: list[Record] = await db_connection.fetch(
+            """
+            SELECT sha256, size, media_type, filename
+            FROM card_media
+            WHERE id = $1;
+            """,
+            media_id,
+        )
+        if len(selection) == 0:
+            return Response(
+                "Media with id does not exist.", status_code=404, media_type=MediaType.JSON
+            )
+
+        sha256: str = selection[0][0]
+        size: int = selection[0][1]
+        media_type: str = selection[0][2]
+        filename: str | None = selection[0][3]
+
+        # The media type is chosen by the uploader, so it's only trusted for types
+        # browsers can't run scripts from.
+        inline = media_type.partition(";")[0].strip().lower() in INLINE_MEDIA_TYPES
+        if not inline:
+            media_type = "application/octet-stream"
+
+        # The content never changes, so its hash is a strong etag.
+        etag = f'"{sha256}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": CACHE_CONTROL,
+            "Accept-Ranges": "bytes",
+            "X-Content-Type-Options": "nosniff",
+            "Content-Security-Policy": "sandbox",
+        }
+
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None and etag_matches(if_none_match, etag):
+            return Response(None, status_code=304, headers=headers)
+
+        byte_range: tuple[int, int] | None = None
+        range_header = request.headers.get("Range")
+        if_range = request.headers.get("If-Range")
+        if range_header is not None and (if_range is None or if_range.strip() == etag):
+            try:
+                byte_range = parse_byte_range(range_header, size)
+            except ValueError:
+                return Response(
+                    "Range not satisfiable.",
+                    status_code=416,
+                    media_type=MediaType.JSON,
+                    headers={"Content-Range": f"bytes */{size}"},
+                )
+
+        if byte_range is None:
+            return File(
+                media_store.path(sha256),
+                filename=filename or sha256,
+                media_type=media_type,
+                content_disposition_type="inline" if inline else "attachment",
+                headers=headers,
+            )
+
+        start, end = byte_range
+        return Stream(
+            media_store.read(sha256, start, end),
+            status_code=206,
+            media_type=media_type,
+            headers={
+                **headers,
+                "Content-Range": f"bytes {start}-{end}/{size}",
+                "Content-Length": str(end - start + 1),
+            },
+        )
+
+    @delete(operation_id="DeleteCardMedia", path=urls.CARD_MEDIA_DELETE)
+    async def delete_media(
+        self,
+        db_connection: Connection,
+        media_id: Annotated[
+            uuid.UUID,
+            Parameter(title="Media ID", description="ID of the attachment to delete."),
+        ],
+    ) -> Response[None]:
+        """Detach a media file from its card.
+
+        The blob stays in storage, other attachments may share its content.
+        Once none do, it's removed by the media sweeper.
+
+        Parameters
+        ----------
+        media_id : UUID
+            ID of the attachment.
+
+        Returns
+        -------
+        Response[None]
+            A success code.
+        """
+        await db_connection.execute(
+            """
+            DELETE FROM card_media
+            WHERE id = $1;
+            """,
+            media_id,
+        )
+
+        return Response(
+            None,
+            status_code=200,
+            media_type=MediaType.JSON,
+        )
@@ -0,0 +1,173 @@
+import json
+import random
+import sys
+import uuid
+from collections.abc import Sequence
+from typing import Annotated
+
+from litestar import Controller, MediaType, Response, delete, post
+from litestar.di import Provide
+from litestar.openapi import ResponseSpec
+from litestar.params import Parameter
+from pydantic_core import to_json
+
+from app.domain.cards import urls
+from app.domain.cards.dependencies import FieldSelection, provide_card_fields
+from app.domain.cards.schemas import StudyCards, StudySession, StudySessionStart
+from app.domain.cards.storage import CardStorage
+from app.domain.cards.study import StudySessionStore, sample_matching_cards
+from app.domain.cards.tag_index import TagIndex
+from app.utils.responses import SerialisedResponse
+
+
+class StudyController(Controller):
+    """Controller for study sessions."""
+
+    tags: Sequence[str] | None = ["Study"]
+
+    @post(
+        operation_id="StartStudySession",
+        path=urls.STUDY_START,
+        dependencies={"selection": Provide(provide_card_fields, sync_to_thread=False)},
+    )
+    async def start_session(
+        self,
+        storage: CardStorage,
+        tag_index: TagIndex,
+        study_sessions: StudySessionStore,
+        data: StudySessionStart,
+        selection: FieldSelection,
+    ) -> Response[StudySession | str]:
+        """Start studying the cards of a deck, or the cards matching a tag expression.
+
+        The cards to study are queued once, shuffled unless asked otherwise. The
+        selected fields are the fields served by the session.
+
+        Parameters
+        ----------
+        data : StudySessionStart
+            Json with the deck or the tag expression, and the order of the cards.
+        selection : FieldSelection
+            Fields of the cards to serve.
+
+        Returns
+        -------
+        Response[StudySession | str]
+            The session if started, else error.
+        """
+        # Cards either come from a deck or a filter, not both.
+        card_ids: list[uuid.UUID] | None
+        if data.deck_id is not None and data.filter is None:
+            card_ids = await storage.get_deck_card_ids(data.deck_id)
+            # If the deck we're trying to study doesn't exist, we error.
+            if card_ids is None:
+                return Response(
+                    "Deck with id does not exist.",
+                    status_code=400,
+                    media_type=MediaType.JSON,
+                )
+        elif data.filter is not None and data.deck_id is None:
+            if tag_index.ready:
+                await tag_index.refresh(storage)
+                limit = sys.maxsize if data.shuffle else data.limit
+                card_ids = tag_index.query(data.filter, limit, 0)
+            elif data.shuffle:
+                # While the index is cold, the matches are sampled from storage.
+                card_ids = await sample_matching_cards(storage, data.filter, data.limit)
+            else:
+                cards = await storage.query_cards(
+                    data.filter, data.limit, 0, FieldSelection(("id",))
+                )
+                card_ids = [uuid.UUID(card["id"]) for card in json.loads(cards)]
+        else:
+            return Response(
+                "Either a deck id or a filter is required.",
+                status_code=400,
+                media_type=MediaType.JSON,
+            )
+
+        if data.shuffle:
+            random.shuffle(card_ids)
+        card_ids = card_ids[: data.limit]
+        session_id = study_sessions.start(card_ids, selection)
+
+        return Response(
+            StudySession(id=session_id, card_count=len(card_ids)),
+            status_code=200,
+            media_type=MediaType.JSON,
+        )
+
+    @post(
+        operation_id="NextStudyCards",
+        path=urls.STUDY_NEXT,
+        responses={200: ResponseSpec(StudyCards, description="The next cards.")},
+    )
+    async def next_cards(
+        self,
+        storage: CardStorage,
+        study_sessions: StudySessionStore,
+        session_id: Annotated[
+            uuid.UUID, Parameter(title="Session ID", description="ID of the study session.")
+        ],
+        count: Annotated[
+            int,
+            Parameter(
+                title="Count", description="Maximum amount of cards to return.", ge=1, le=100
+            ),
+        ] = 1,
+    ) -> Response[bytes]:
+        """Retrieve the next cards of a study session.
+
+        Cards are prefetched in batches, so most requests are served from memory
+        without reading storage. Cards deleted since the session started are
+        skipped. Sessions expire after an hour without requests.
+
+        Parameters
+        ----------
+        session_id : UUID
+            ID of the session.
+        count : int
+            Maximum amount of cards to return.
+
+        Returns
+        -------
+        Response[bytes]
+            The next cards and the amount of cards left, else error.
+        """
+        result = await study_sessions.next_cards(session_id, storage, count)
+        # If the session doesn't exist or has expired, we error.
+        if result is None:
+            return SerialisedResponse.from_content(
+                "Study session with id does not exist.", status_code=400
+            ).to_response()
+
+        cards, remaining = result
+        return SerialisedResponse(to_json({"cards": cards, "remaining": remaining})).to_response()
+
+    @delete(operation_id="EndStudySession", path=urls.STUDY_END)
+    async def end_session(
+        self,
+        study_sessions: StudySessionStore,
+        session_id: Annotated[
+            uuid.UUID, Parameter(title="Session ID", description="ID of the study session to end.")
+        ],
+    ) -> Response[None]:
+        """End a study session.
+
+        Parameters
+        ----------
+        session_id : UUID
+            ID of the session.
+
+        Returns
+        -------
+        Response[None]
+            A success code.
+        """
+        study_sessions.end(session_id)
+
+        return Response(
+            None,
+            status_code=200,
+            media_type=MediaType.JSON,
+        )
@@ -0,0 +1,65 @@
+from collections.abc import Sequence
+from typing import Annotated
+
+from asyncpg import Connection
+from litestar import Controller, MediaType, Response, get
+from litestar.params import Parameter
+
+from app.domain.cards import urls
+from app.domain.cards.schemas import SyncChanges
+from app.domain.cards.sync import SyncToken, fetch_changes
+from app.errors import SyncTokenExpiredError
+
+
+class SyncController(Controller):
+    """Controller for delta syncs of offline clients."""
+
+    tags: Sequence[str] | None = ["Sync"]
+
+    @get(operation_id="Sync", path=urls.SYNC)
+    async def sync(
+        self,
+        db_connection: Connection,
+        token: Annotated[
+            str | None,
+            Parameter(
+                title="Sync token",
+                description="Token from the previous sync, leave out to sync everything.",
+            ),
+        ] = None,
+        limit: Annotated[
+            int,
+            Parameter(
+                title="Limit", description="Maximum amount of changes to return.", ge=1, le=10000
+            ),
+        ] = 1000,
+    ) -> Response[SyncChanges | str]:
+        """Retrieve the cards, decks, tags and relations changed since the last sync.
+
+        Only the change log since the token is read, so a sync costs as much as
+        the amount of changes rather than the size of the collection. Deletes are
+        sent as tombstones. While ``has_more`` is set, sync again with the new
+        token right away. A 410 means the changes have been purged and the
+        client has to sync from scratch, without a token.
+
+        Parameters
+        ----------
+        token : str | None
+            Token from the previous sync.
+        limit : int
+            Maximum amount of changes to return.
+
+        Returns
+        -------
+        Response[SyncChanges | str]
+            The changes and the next token, else error.
+        """
+        try:
+            sync_token = SyncToken.decode(token) if token is not None else SyncToken()
+            changes = await fetch_changes(db_connection, sync_token, limit)
+        except ValueError as e:
+            return Response(str(e), status_code=400, media_type=MediaType.JSON)
+        except SyncTokenExpiredError as e:
+            return Response(str(e), status_code=410, media_type=MediaType.JSON)
+
+        return Response(changes, status_code=200, media_type=MediaType.JSON)
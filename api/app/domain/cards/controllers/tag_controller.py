@@ -2,13 +2,21 @@
 from collections.abc import Sequence
 from typing import Annotated
 
-from asyncpg import Connection, Record
 from litestar import Controller, MediaType, Request, Response, delete, get, patch, post
+from litestar.di import Provide
+from litestar.openapi import ResponseSpec
 from litestar.params import Parameter
 
 from app.domain.cards import urls
+from app.domain.cards.dependencies import FieldSelection, provide_tag_fields
 from app.domain.cards.schemas import Tag, TagCreate, TagUpdate
-from app.errors import TagNotFoundError
+from app.domain.cards.storage import CardStorage
+from app.domain.cards.tag_index import TagIndex
+from app.domain.jobs.schemas import Job
+from app.errors import AlreadyExistsError, TagNotFoundError
+from app.middleware.idempotency import IDEMPOTENT_OPT_KEY
+from app.utils.responses import SerialisedResponse
+from app.utils.singleflight import SingleFlight
 
 
 class TagController(Controller):
@@ -16,117 +24,99 @@ class TagController(Controller):
 
     tags: Sequence[str] | None = ["Card Tags"]
 
-    async def _get_tag_by_name(self, db_connection: Connection, name: str) -> Tag:
-        """Get a tag from its name.
-
-        Parameters
-        ----------
-        db_connection : Connection
-            Asyncpg database connection.
-        name : str
-            Name of the tag.
-
-        Returns
-        -------
-        Tag
-            The tag.
-
-        Raises
-        ------
-        TagNotFoundError
-            If tag with name does not exist.
-        """
-        selection: list[Record] = await db_connection.fetch(
-            """
-            SELECT id, name
-            FROM tags
-            WHERE name = $1;
-            """,
-            name,
-        )
-
-        if len(selection) == 0:
-            msg = "Tag with name does not exist."
-            raise TagNotFoundError(msg)
-
-        tag: Record = selection[0]
-
-        return Tag(id=tag[0], name=tag[1])
-
-    @get(operation_id="GetTag", path=urls.TAG_GET)
+    @get(
+        operation_id="GetTag",
+        path=urls.TAG_GET,
+        dependencies={"selection": Provide(provide_tag_fields, sync_to_thread=False)},
+        responses={200: ResponseSpec(Tag, description="The tag.")},
+    )
     async def get_tag(
         self,
         request: Request,
-        db_connection: Connection,
+        storage: CardStorage,
+        single_flight: SingleFlight[SerialisedResponse],
         tag_id: Annotated[
             uuid.UUID, Parameter(title="Tag ID", description="ID of the tag to get.")
         ],
-    ) -> Response[Tag | str]:
+        selection: FieldSelection,
+    ) -> Response[bytes]:
         """Retrieve a tag.
 
+        Only the selected fields are read and sent. Concurrent requests for the
+        same tag share a single query.
+
         Parameters
         ----------
         tag_id : UUID
             ID of the tag.
+        selection : FieldSelection
+            Fields to return.
 
         Returns
         -------
-        Response[Tag | str]
+        Response[bytes]
             The tag if found, else error.
         """
-        selection: list[Record] = await db_connection.fetch(
-            """
-            SELECT id, name
-            FROM tags
-            WHERE id = $1;
-            """,
-            tag_id,
-        )
-        # If the tag we're trying to get doesn't exist, we error.
-        if len(selection) == 0:
-            return Response(
-                "Tag with id does not exist.",
-                status_code=400,
-                media_type=MediaType.JSON,
-            )
 
-        tag: Record = selection[0]
+        async def fetch_tag() -> SerialisedResponse:
+            tag = await storage.get_tag(tag_id, selection)
+            # If the tag we're trying to get doesn't exist, we error.
+            if tag is None:
+                return SerialisedResponse.from_content(
+                    "Tag with id does not exist.", status_code=400
+                )
+
+            return SerialisedResponse(tag)
 
-        return Response(
-            Tag(id=tag[0], name=tag[1]),
-            status_code=200,
-            media_type=MediaType.JSON,
-        )
+        response = await single_flight.do(("GetTag", tag_id, selection), fetch_tag)
 
-    @get(operation_id="ListTags", path=urls.TAG_LIST)
-    async def list_tags(self, request: Request, db_connection: Connection) -> Response[list[Tag]]:
+        return response.to_response()
+
+    @get(
+        operation_id="ListTags",
+        path=urls.TAG_LIST,
+        dependencies={"selection": Provide(provide_tag_fields, sync_to_thread=False)},
+        responses={200: ResponseSpec(list[Tag], description="List with all the tags.")},
+    )
+    async def list_tags(
+        self,
+        request: Request,
+        storage: CardStorage,
+        single_flight: SingleFlight[SerialisedResponse],
+        selection: FieldSelection,
+    ) -> Response[bytes]:
         """Retrieve all the tags.
 
+        Only the selected fields are read and sent. Concurrent requests share a
+        single query.
+
+        Parameters
+        ----------
+        selection : FieldSelection
+            Fields to return.
+
         Returns
         -------
-        list[Tag]
+        Response[bytes]
             List with all the tags.
         """
-        selection: list[Record] = await db_connection.fetch(
-            """
-            SELECT id, name
-            FROM tags;
-            """
-        )
 
-        if len(selection) == 0:
-            tags: list[Tag] = []
-        else:
-            tags: list[Tag] = [Tag(id=tag[0], name=tag[1]) for tag in selection]
+        async def fetch_tags() -> SerialisedResponse:
+            return SerialisedResponse(await storage.list_tags(selection))
 
-        return Response(tags, status_code=200, media_type=MediaType.JSON)
+        response = await single_flight.do(("ListTags", selection), fetch_tags)
 
-    @post(operation_id="CreateTag", path=urls.TAG_CREATE)
+        return response.to_response()
+
+    @post(operation_id="CreateTag", path=urls.TAG_CREATE, opt={IDEMPOTENT_OPT_KEY: True})
     async def create_tag(
-        self, request: Request, db_connection: Connection, data: TagCreate
+        self, request: Request, storage: CardStorage, tag_index: TagIndex, data: TagCreate
     ) -> Response[Tag | str]:
         """Create a tag.
 
+        Retries with the same ``Idempotency-Key`` header get the stored response,
+        without creating anything again.
+
         Parameters
         ----------
         data : TagCreate
@@ -137,37 +127,22 @@ async def create_tag(
         Response[Tag | str]
             The created tag if succeeded, else error.
         """
-        selection: list[Record] = await db_connection.fetch(
-            """
-            INSERT INTO tags
-            VALUES ($1, $2)
-            ON CONFLICT DO NOTHING
-            RETURNING id, name;
-            """,
-            uuid.uuid4(),
-            data.name,
-        )
         # If a tag with this name already exists, we error.
-        if len(selection) == 0:
-            return Response(
-                "Tag with name already exists.",
-                status_code=400,
-                media_type=MediaType.JSON,
-            )
+        try:
+            tag = await storage.create_tag(data.name)
+        except AlreadyExistsError as e:
+            return Response(str(e), status_code=400, media_type=MediaType.JSON)
 
-        tag: Record = selection[0]
+        tag_index.add_tag(tag.id, tag.name)
 
-        return Response(
-            Tag(id=tag[0], name=tag[1]),
-            status_code=200,
-            media_type=MediaType.JSON,
-        )
+        return Response(tag, status_code=200, media_type=MediaType.JSON)
 
     @patch(operation_id="UpdateTag", path=urls.TAG_UPDATE)
     async def update_tag(
         self,
         request: Request,
-        db_connection: Connection,
+        storage: CardStorage,
+        tag_index: TagIndex,
         data: TagUpdate,
         tag_id: Annotated[
             uuid.UUID, Parameter(title="Tag ID", description="ID of the tag to update.")
@@ -190,55 +165,31 @@ async def update_tag(
         Response[Tag | str]
             The updated tag if succeeded, else error.
         """
-        # If a tag with the new name already exists, we error.
+        # If a tag with the new name already exists, or the tag we're trying to
+        # update doesn't, we error.
         try:
-            await self._get_tag_by_name(db_connection, data.name)
-        except TagNotFoundError:
-            pass
-        else:
-            return Response(
-                "Tag with this name already exists, the name must be unique.",
-                status_code=400,
-                media_type=MediaType.JSON,
-            )
-
-        selection: list[Record] = await db_connection.fetch(
-            """
-            UPDATE tags
-            SET name = $2
-            WHERE id = $1
-            RETURNING id, name;
-            """,
-            tag_id,
-            data.name,
-        )
-
-        # If the tag we're trying to update doesn't exist, we also error.
-        if len(selection) == 0:
-            return Response(
-                "Tag with id does not exist.",
-                status_code=400,
-                media_type=MediaType.JSON,
-            )
+            tag = await storage.update_tag(tag_id, data.name)
+        except (AlreadyExistsError, TagNotFoundError) as e:
+            return Response(str(e), status_code=400, media_type=MediaType.JSON)
 
-        tag: Record = selection[0]
+        tag_index.rename_tag(tag.id, tag.name)
 
-        return Response(
-            Tag(id=tag[0], name=tag[1]),
-            status_code=200,
-            media_type=MediaType.JSON,
-        )
+        return Response(tag, status_code=200, media_type=MediaType.JSON)
 
-    @delete(operation_id="DeleteTag", path=urls.TAG_DELETE)
+    @delete(operation_id="DeleteTag", path=urls.TAG_DELETE, status_code=202)
     async def delete_card(
         self,
         request: Request,
-        db_connection: Connection,
+        storage: CardStorage,
         tag_id: Annotated[
             uuid.UUID, Parameter(title="Tag ID", description="ID of the tag to delete.")
         ],
-    ) -> Response[None]:
-        """Delete  a tag.
+    ) -> Response[Job | str]:
+        """Delete a tag in the background.
+
+        The tag is removed from its cards in batches by a job, so this returns at
+        once with the job to follow its progress. The in-memory storage deletes at
+        once, its job has already succeeded.
 
         Parameters
         ----------
@@ -247,19 +198,13 @@ async def delete_card(
 
         Returns
         -------
-        Response[None]
-            A success code.
+        Response[Job | str]
+            The deletion job if the tag exists, else error.
         """
-        await db_connection.execute(
-            """
-            DELETE FROM tags
-            WHERE id = $1;
-            """,
-            tag_id,
-        )
-
-        return Response(
-            None,
-            status_code=200,
-            media_type=MediaType.JSON,
-        )
+        job = await storage.delete_tag(tag_id)
+        if job is None:
+            return Response(
+                "Tag with id does not exist.", status_code=400, media_type=MediaType.JSON
+            )
+
+        return Response(job, status_code=202, media_type=MediaType.JSON)
@@ -0,0 +1,335 @@
+from collections.abc import AsyncIterator, Mapping
+from dataclasses import dataclass
+from typing import Annotated, Any
+
+from litestar import Request
+from litestar.exceptions import ValidationException
+from litestar.params import Parameter
+
+__all__ = (
+    "CARD_FIELDS",
+    "DECK_CARD_FIELDS",
+    "DECK_FIELDS",
+    "TAG_FIELDS",
+    "FieldSelection",
+    "MediaUpload",
+    "Pagination",
+    "parse_fields",
+    "provide_card_fields",
+    "provide_deck_card_fields",
+    "provide_deck_fields",
+    "provide_media_upload",
+    "provide_pagination",
+    "provide_tag_fields",
+)
+
+CARD_FIELDS = ("id", "name", "front_content", "back_content")
+DECK_CARD_FIELDS = (*CARD_FIELDS, "tags")
+DECK_FIELDS = ("id", "name")
+TAG_FIELDS = ("id", "name")
+
+# Fields shortened to the preview length, if one is requested.
+_CONTENT_FIELDS = frozenset({"front_content", "back_content"})
+
+
+@dataclass(frozen=True, slots=True)
+class Pagination:
+    """Limit/offset pagination of a list of cards.
+
+    Attributes
+    ----------
+    limit : :class:`int`
+        Maximum amount of cards to return.
+    offset : :class:`int`
+        Amount of cards to skip.
+    """
+
+    limit: int
+    offset: int
+
+
+def provide_pagination(
+    limit: Annotated[
+        int,
+        Parameter(title="Limit", description="Maximum amount of cards to return.", ge=1, le=1000),
+    ] = 100,
+    offset: Annotated[
+        int, Parameter(title="Offset", description="Amount of cards to skip.", ge=0)
+    ] = 0,
+) -> Pagination:
+    """Provide the pagination from the query parameters.
+
+    Parameters
+    ----------
+    limit : int
+        Maximum amount of cards to return.
+    offset : int
+        Amount of cards to skip.
+
+    Returns
+    -------
+    Pagination
+        The pagination.
+    """
+    return Pagination(limit=limit, offset=offset)
+
+
+@dataclass(frozen=True, slots=True)
+class MediaUpload:
+    """A media file being uploaded as the raw request body.
+
+    Attributes
+    ----------
+    filename : :class:`str` | None
+        Original name of the file.
+    media_type : :class:`str`
+        Media type of the file, from the ``Content-Type`` header.
+    chunks : :class:`AsyncIterator` [:class:`bytes`]
+        Content of the file, streamed from the request.
+    """
+
+    filename: str | None
+    media_type: str
+    chunks: AsyncIterator[bytes]
+
+
+def provide_media_upload(
+    request: Request[Any, Any, Any],
+    filename: Annotated[
+        str | None,
+        Parameter(title="Filename", description="Original name of the file.", max_length=255),
+    ] = None,
+) -> MediaUpload:
+    """Provide the uploaded media file from the request.
+
+    Parameters
+    ----------
+    filename : str | None
+        Original name of the file.
+
+    Returns
+    -------
+    MediaUpload
+        The uploaded file, its content isn't read yet.
+    """
+    return MediaUpload(
+        filename=filename,
+        media_type=request.headers.get("Content-Type", "application/octet-stream"),
+        chunks=request.stream(),
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class FieldSelection:
+    """Fields of cards, decks or tags to return, so only those are read and sent.
+
+    Attributes
+    ----------
+    fields : :class:`tuple` [:class:`str`]
+        Names of the fields, in response order. Always includes ``id``.
+    preview : :class:`int` | None
+        Maximum amount of characters of card contents to return, or ``None``
+        for all of it.
+    """
+
+    fields: tuple[str, ...]
+    preview: int | None = None
+
+    def json_object(self, alias: str, computed: Mapping[str, str] | None = None) -> str:
+        """Build the sql expression turning a row into a json object with the fields.
+
+        Only whitelisted field names end up in the sql, see :func:`parse_fields`.
+
+        Parameters
+        ----------
+        alias : str
+            Alias of the table the columns are selected from.
+        computed : Mapping[str, str] | None
+            Sql expressions of fields that aren't columns of the table.
+
+        Returns
+        -------
+        str
+            The sql expression.
+        """
+        arguments: list[str] = []
+        for field in self.fields:
+            if computed is not None and field in computed:
+                expression = computed[field]
+            elif self.preview is not None and field in _CONTENT_FIELDS:
+                expression = f"left({alias}.{field}, {self.preview})"
+            else:
+                expression = f"{alias}.{field}"
+            arguments.append(f"'{field}', {expression}")
+        return f"json_build_object({', '.join(arguments)})"
+
+    def pick(self, row: Mapping[str, Any]) -> dict[str, Any]:
+        """Pick the fields from a row, the in-memory counterpart of :meth:`json_object`.
+
+        Parameters
+        ----------
+        row : Mapping[str, Any]
+            All fields of the row, by name.
+
+        Returns
+        -------
+        dict[str, Any]
+            The selected fields, in response order.
+        """
+        picked: dict[str, Any] = {}
+        for field in self.fields:
+            value = row[field]
+            if self.preview is not None and field in _CONTENT_FIELDS and value is not None:
+                value = value[: self.preview]
+            picked[field] = value
+        return picked
+
+
+def parse_fields(fields: str | None, allowed: tuple[str, ...]) -> tuple[str, ...]:
+    """Parse a comma separated ``fields`` query parameter.
+
+    Parameters
+    ----------
+    fields : str | None
+        The parameter, or ``None`` for all fields.
+    allowed : tuple[str, ...]
+        The fields that can be selected, in response order.
+
+    Returns
+    -------
+    tuple[str, ...]
+        The selected fields in response order, including ``id``.
+
+    Raises
+    ------
+    ValidationException
+        If an unknown field is selected.
+    """
+    if fields is None:
+        return allowed
+
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    if unknown := selected.difference(allowed):
+        msg = f"Unknown fields {', '.join(sorted(unknown))}, expected any of {', '.join(allowed)}."
+        raise ValidationException(msg)
+    selected.add("id")
+    return tuple(field for field in allowed if field in selected)
+
+
+def provide_card_fields(
+    fields: Annotated[
+        str | None,
+        Parameter(
+            title="Fields",
+            description=f"Comma separated card fields to return, any of {', '.join(CARD_FIELDS)}.",
+        ),
+    ] = None,
+    preview: Annotated[
+        int | None,
+        Parameter(
+            title="Preview",
+            description="Maximum amount of characters of card contents to return.",
+            ge=0,
+        ),
+    ] = None,
+) -> FieldSelection:
+    """Provide the card fields to return from the query parameters.
+
+    Parameters
+    ----------
+    fields : str | None
+        Comma separated card fields.
+    preview : int | None
+        Maximum amount of characters of card contents.
+
+    Returns
+    -------
+    FieldSelection
+        The selected fields.
+    """
+    return FieldSelection(parse_fields(fields, CARD_FIELDS), preview)
+
+
+def provide_deck_card_fields(
+    fields: Annotated[
+        str | None,
+        Parameter(
+            title="Fields",
+            description=(
+                f"Comma separated fields of the deck's cards to return, any of "
+                f"{', '.join(DECK_CARD_FIELDS)}."
+            ),
+        ),
+    ] = None,
+    preview: Annotated[
+        int | None,
+        Parameter(
+            title="Preview",
+            description="Maximum amount of characters of card contents to return.",
+            ge=0,
+        ),
+    ] = None,
+) -> FieldSelection:
+    """Provide the fields of a deck's cards to return from the query parameters.
+
+    Parameters
+    ----------
+    fields : str | None
+        Comma separated card fields.
+    preview : int | None
+        Maximum amount of characters of card contents.
+
+    Returns
+    -------
+    FieldSelection
+        The selected fields.
+    """
+    return FieldSelection(parse_fields(fields, DECK_CARD_FIELDS), preview)
+
+
+def provide_deck_fields(
+    fields: Annotated[
+        str | None,
+        Parameter(
+            title="Fields",
+            description=f"Comma separated deck fields to return, any of {', '.join(DECK_FIELDS)}.",
+        ),
+    ] = None,
+) -> FieldSelection:
+    """Provide the deck fields to return from the query parameters.
+
+    Parameters
+    ----------
+    fields : str | None
+        Comma separated deck fields.
+
+    Returns
+    -------
+    FieldSelection
+        The selected fields.
+    """
+    return FieldSelection(parse_fields(fields, DECK_FIELDS))
+
+
+def provide_tag_fields(
+    fields: Annotated[
+        str | None,
+        Parameter(
+            title="Fields",
+            description=f"Comma separated tag fields to return, any of {', '.join(TAG_FIELDS)}.",
+        ),
+    ] = None,
+) -> FieldSelection:
+    """Provide the tag fields to return from the query parameters.
+
+    Parameters
+    ----------
+    fields : str | None
+        Comma separated tag fields.
+
+    Returns
+    -------
+    FieldSelection
+        The selected fields.
+    """
+    return FieldSelection(parse_fields(fields, TAG_FIELDS))
@@ -0,0 +1,300 @@
+import logging
+import operator
+import random
+import re
+import unicodedata
+import uuid
+from array import array
+from typing import TYPE_CHECKING
+
+from app.domain.cards.schemas import Change
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from app.domain.cards.storage.base import CardStorage
+
+__all__ = ("DuplicateIndex", "normalise_content")
+
+logger = logging.getLogger(__name__)
+
+# Signatures have BANDS * ROWS values. Cards whose signatures agree on every row of
+# any band become candidates, the chance of which rises steeply around
+# (1 / BANDS) ** (1 / ROWS) = 0.5 similarity, pairs above 0.7 are found almost
+# surely. Candidates are then checked against the asked similarity.
+BANDS = 16
+ROWS = 4
+# Card fronts are short, so shingles are short too, or a single typo would change
+# most of them.
+SHINGLE_SIZE = 3
+
+_MASK = (1 << 64) - 1
+_NOT_WORDS = re.compile(r"[\W_]+")
+
+
+def normalise_content(content: str) -> str:
+    """Normalise card content, so formatting differences don't count as edits.
+
+    Parameters
+    ----------
+    content : str
+        The content.
+
+    Returns
+    -------
+    str
+        The content case folded, without punctuation, and with single spaces.
+    """
+    content = unicodedata.normalize("NFKC", content).casefold()
+    return _NOT_WORDS.sub(" ", content).strip()
+
+
+class DuplicateIndex:
+    """In-memory MinHash/LSH index of the cards' front content, to find near-duplicates.
+
+    The normalised front content of every card is cut into overlapping character
+    shingles, and summarised by a MinHash signature: the minimum of every salted
+    hash over its shingles. Two signatures agree on a value with the probability
+    of the jaccard similarity of their shingles. Signatures are split into bands
+    that are bucketed, so candidates are found with a few dict lookups instead of
+    comparing every pair.
+
+    Hashes are salted per process, like the index itself, which is cold until
+    :meth:`rebuild` has loaded it from storage. Changes from other workers only
+    say that a card changed, so such cards are marked stale and their content is
+    read again by :meth:`refresh` before the next lookup. So are the cards of
+    reloaded decks.
+    """
+
+    def __init__(self) -> None:
+        self._ready: bool = False
+        self._rebuilding: bool = False
+
+        salts = random.Random()  # noqa: S311
+        self._salts: list[int] = [salts.getrandbits(64) for _ in range(BANDS * ROWS)]
+        self._signatures: dict[uuid.UUID, array[int]] = {}
+        self._buckets: list[dict[bytes, list[uuid.UUID]]] = [{} for _ in range(BANDS)]
+        self._stale: set[uuid.UUID] = set()
+        self._stale_decks: set[uuid.UUID] = set()
+
+    @property
+    def ready(self) -> bool:
+        """Whether the index has been loaded and can serve lookups."""
+        return self._ready
+
+    def _signature(self, content: str) -> array[int]:
+        text = normalise_content(content)
+        shingles = {text[i : i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+        hashes = [hash(shingle) & _MASK for shingle in shingles or {text}]
+        # Xor-ing with a salt and taking the minimum runs in C.
+        return array("Q", [min(map(salt.__xor__, hashes)) for salt in self._salts])
+
+    @staticmethod
+    def _band_keys(signature: array[int]) -> list[bytes]:
+        return [signature[band * ROWS : (band + 1) * ROWS].tobytes() for band in range(BANDS)]
+
+    def _insert(self, card_id: uuid.UUID, content: str) -> None:
+        self._delete(card_id)
+        signature = self._signature(content)
+        self._signatures[card_id] = signature
+        for buckets, key in zip(self._buckets, self._band_keys(signature), strict=True):
+            buckets.setdefault(key, []).append(card_id)
+
+    def _delete(self, card_id: uuid.UUID) -> None:
+        signature = self._signatures.pop(card_id, None)
+        if signature is None:
+            return
+        for buckets, key in zip(self._buckets, self._band_keys(signature), strict=True):
+            bucket = buckets[key]
+            bucket.remove(card_id)
+            if not bucket:
+                del buckets[key]
+
+    async def rebuild(self, storage: "CardStorage", batch_size: int = 1000) -> None:
+        """(Re)build the index from storage, reading the cards in batches.
+
+        Cards changed while the storage is being read are marked stale and read
+        again by the next :meth:`refresh`.
+
+        Parameters
+        ----------
+        storage : CardStorage
+            Storage of the cards.
+        batch_size : int
+            Amount of cards to read at once.
+        """
+        # Lookups wait until it's loaded, instead of missing the cards not read yet.
+        self._ready = False
+        self._rebuilding = True
+        self._signatures = {}
+        self._buckets = [{} for _ in range(BANDS)]
+        try:
+            after: uuid.UUID | None = None
+            while cards := await storage.scan_card_fronts(after, batch_size):
+                for card_id, content in cards:
+                    self._insert(card_id, content)
+                after = cards[-1][0]
+        finally:
+            self._rebuilding = False
+
+        self._ready = True
+        logger.info("Duplicate index built with %d cards.", len(self._signatures))
+
+    async def refresh(self, storage: "CardStorage") -> None:
+        """Read the content of the stale cards again.
+
+        Parameters
+        ----------
+        storage : CardStorage
+            Storage of the cards.
+        """
+        if self._rebuilding:
+            return
+
+        deck_ids, self._stale_decks = self._stale_decks, set()
+        for deck_id in deck_ids:
+            self._stale.update(await storage.get_deck_card_ids(deck_id) or ())
+        if not self._stale:
+            return
+
+        card_ids, self._stale = self._stale, set()
+        cards = await storage.get_card_fronts(list(card_ids))
+        for card_id, content in cards:
+            self._insert(card_id, content)
+        # Cards that weren't read have been deleted since.
+        for card_id in card_ids.difference(card_id for card_id, _ in cards):
+            self._delete(card_id)
+
+    def add_card(self, card_id: uuid.UUID, front_content: str) -> None:
+        """Index a created or updated card.
+
+        Parameters
+        ----------
+        card_id : UUID
+            ID of the card.
+        front_content : str
+            Its front content.
+        """
+        if self._rebuilding:
+            self._stale.add(card_id)
+            return
+        self._stale.discard(card_id)
+        self._insert(card_id, front_content)
+
+    def remove_card(self, card_id: uuid.UUID) -> None:
+        """Drop a deleted card."""
+        if self._rebuilding:
+            self._stale.add(card_id)
+            return
+        self._stale.discard(card_id)
+        self._delete(card_id)
+
+    def apply_change(self, change: Change) -> None:
+        """Apply a change from the change feed, made by this or another worker.
+
+        Parameters
+        ----------
+        change : Change
+            The change.
+        """
+        match change:
+            case Change(entity="card", operation="create" | "update"):
+                self._stale.add(change.id)
+            case Change(entity="card", operation="delete"):
+                self.remove_card(change.id)
+            case Change(entity="deck", operation="reload"):
+                self._stale_decks.add(change.id)
+            case _:
+                pass
+
+    def _similarity(self, card_id: uuid.UUID, other_id: uuid.UUID) -> float:
+        agreeing = sum(map(operator.eq, self._signatures[card_id], self._signatures[other_id]))
+        return agreeing / len(self._salts)
+
+    def duplicates(
+        self, card_id: uuid.UUID, similarity: float, limit: int
+    ) -> list[tuple[uuid.UUID, float]] | None:
+        """Find the near-duplicates of a card.
+
+        Parameters
+        ----------
+        card_id : UUID
+            ID of the card.
+        similarity : float
+            Minimum estimated jaccard similarity of the duplicates.
+        limit : int
+            Maximum amount of duplicates to return.
+
+        Returns
+        -------
+        list[tuple[UUID, float]] | None
+            IDs of the duplicates with their similarity, most similar first, or
+            ``None`` if the card isn't indexed.
+        """
+        signature = self._signatures.get(card_id)
+        if signature is None:
+            return None
+
+        candidates: set[uuid.UUID] = set()
+        for buckets, key in zip(self._buckets, self._band_keys(signature), strict=True):
+            candidates.update(buckets[key])
+        candidates.discard(card_id)
+
+        duplicates = [
+            (candidate, estimate)
+            for candidate in candidates
+            if (estimate := self._similarity(card_id, candidate)) >= similarity
+        ]
+        duplicates.sort(key=lambda duplicate: (-duplicate[1], duplicate[0]))
+        return duplicates[:limit]
+
+    def clusters(
+        self, card_ids: "Iterable[uuid.UUID]", similarity: float
+    ) -> list[list[uuid.UUID]]:
+        """Group near-duplicate cards among some cards, like the cards of a deck.
+
+        Cards are only compared with the first card of every band bucket they
+        fall in, so grouping is linear in the amount of cards. A cluster therefore
+        holds the cards similar enough to one of its cards, not to every card.
+
+        Parameters
+        ----------
+        card_ids : Iterable[UUID]
+            IDs of the cards, cards that aren't indexed are skipped.
+        similarity : float
+            Minimum estimated jaccard similarity of duplicates.
+
+        Returns
+        -------
+        list[list[UUID]]
+            The clusters of at least two cards, largest first.
+        """
+        signatures = {
+            card_id: signature
+            for card_id in card_ids
+            if (signature := self._signatures.get(card_id)) is not None
+        }
+        parents: dict[uuid.UUID, uuid.UUID] = {card_id: card_id for card_id in signatures}
+
+        def find(card_id: uuid.UUID) -> uuid.UUID:
+            while (parent := parents[card_id]) != card_id:
+                parents[card_id] = card_id = parents[parent]
+            return card_id
+
+        for band in range(BANDS):
+            first_cards: dict[bytes, uuid.UUID] = {}
+            for card_id, signature in signatures.items():
+                key = signature[band * ROWS : (band + 1) * ROWS].tobytes()
+                first_card = first_cards.setdefault(key, card_id)
+                if first_card == card_id:
+                    continue
+                root, first_root = find(card_id), find(first_card)
+                if root != first_root and self._similarity(card_id, first_card) >= similarity:
+                    parents[root] = first_root
+
+        groups: dict[uuid.UUID, list[uuid.UUID]] = {}
+        for card_id in signatures:
+            groups.setdefault(find(card_id), []).append(card_id)
+        clusters = [sorted(group) for group in groups.values() if len(group) > 1]
+        clusters.sort(key=lambda cluster: (-len(cluster), cluster[0]))
+        return clusters
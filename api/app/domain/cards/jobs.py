@@ -0,0 +1,148 @@
+from typing import TYPE_CHECKING
+
+from app.domain.cards.change_feed import MAX_PUBLISHED_CHANGES, publish_change, publish_changes
+from app.domain.cards.schemas import Change
+from app.domain.jobs.runner import JobContext
+
+if TYPE_CHECKING:
+    import uuid
+
+    from asyncpg import Record
+
+__all__ = (
+    "delete_deck",
+    "delete_tag",
+)
+
+
+async def delete_deck(context: JobContext) -> None:
+    """Delete a deck, removing its cards from it in batches.
+
+    With the ``delete_orphaned_cards`` option, cards that end up in no deck at
+    all are deleted as well. Each of them is published to the change feed, so the
+    batches are smaller then, not to overflow its subscribers.
+
+    Parameters
+    ----------
+    context : JobContext
+        The job's context, its target is the deck.
+    """
+    deck_id = context.job.target_id
+    delete_orphaned_cards = bool(context.job.options.get("delete_orphaned_cards", False))
+    batch_size = (
+        min(context.batch_size, MAX_PUBLISHED_CHANGES)
+        if delete_orphaned_cards
+        else context.batch_size
+    )
+
+    async with context.db_pool.acquire() as db_connection:
+        total: int = await db_connection.fetchval(
+            "SELECT count(*) FROM deck_cards WHERE deck_id = $1;", deck_id
+        )
+        await context.set_total(db_connection, total)
+
+    while True:
+        async with context.db_pool.acquire() as db_connection, db_connection.transaction():
+            card_ids: list[uuid.UUID] = await db_connection.fetchval(
+                """
+                WITH batch AS (
+                    DELETE FROM deck_cards
+                    WHERE id IN (
+                        SELECT id
+                        FROM deck_cards
+                        WHERE deck_id = $1
+                        LIMIT $2
+                    )
+                    RETURNING card_id
+                )
+                SELECT ARRAY(SELECT card_id FROM batch);
+                """,
+                deck_id,
+                batch_size,
+            )
+            if len(card_ids) == 0:
+                break
+
+            if delete_orphaned_cards:
+                orphaned_card_ids: list[uuid.UUID] = await db_connection.fetchval(
+                    """
+                    WITH orphaned AS (
+                        DELETE FROM cards
+                        WHERE id = ANY($1::uuid[])
+                            AND NOT EXISTS (SELECT 1 FROM deck_cards WHERE card_id = cards.id)
+                        RETURNING id
+                    )
+                    SELECT ARRAY(SELECT id FROM orphaned);
+                    """,
+                    card_ids,
+                )
+                await publish_changes(
+                    db_connection,
+                    [
+                        Change(entity="card", operation="delete", id=card_id, deck_ids=[deck_id])
+                        for card_id in orphaned_card_ids
+                    ],
+                )
+
+            await context.advance(db_connection, len(card_ids))
+
+    # With its cards gone, the cascade of deleting the deck itself is cheap.
+    async with context.db_pool.acquire() as db_connection, db_connection.transaction():
+        selection: list[Record] = await db_connection.fetch(
+            "DELETE FROM decks WHERE id = $1 RETURNING id;", deck_id
+        )
+        if len(selection) != 0:
+            await publish_change(
+                db_connection,
+                Change(entity="deck", operation="delete", id=deck_id, deck_ids=[deck_id]),
+            )
+
+
+async def delete_tag(context: JobContext) -> None:
+    """Delete a tag, removing it from its cards in batches.
+
+    Parameters
+    ----------
+    context : JobContext
+        The job's context, its target is the tag.
+    """
+    tag_id = context.job.target_id
+
+    async with context.db_pool.acquire() as db_connection:
+        total: int = await db_connection.fetchval(
+            "SELECT count(*) FROM card_tags WHERE tag_id = $1;", tag_id
+        )
+        await context.set_total(db_connection, total)
+
+    while True:
+        async with context.db_pool.acquire() as db_connection, db_connection.transaction():
+            deleted: int = await db_connection.fetchval(
+                """
+                WITH batch AS (
+                    DELETE FROM card_tags
+                    WHERE id IN (
+                        SELECT id
+                        FROM card_tags
+                        WHERE tag_id = $1
+                        LIMIT $2
+                    )
+                    RETURNING id
+                )
+                SELECT count(*) FROM batch;
+                """,
+                tag_id,
+                context.batch_size,
+            )
+            if deleted == 0:
+                break
+
+            await context.advance(db_connection, deleted)
+
+    async with context.db_pool.acquire() as db_connection, db_connection.transaction():
+        selection: list[Record] = await db_connection.fetch(
+            "DELETE FROM tags WHERE id = $1 RETURNING id;", tag_id
+        )
+        if len(selection) != 0:
+            await publish_change(
+                db_connection, Change(entity="tag", operation="delete", id=tag_id)
+            )
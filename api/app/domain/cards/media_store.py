@@ -0,0 +1,259 @@
+import asyncio
+import contextlib
+import hashlib
+import logging
+import time
+import uuid
+from collections.abc import AsyncIterable, AsyncIterator
+from datetime import timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import anyio
+import anyio.to_thread
+import asyncpg
+
+from app.errors import MediaTooLargeError
+
+if TYPE_CHECKING:
+    from asyncpg import Pool
+
+__all__ = ("MediaStore", "MediaSweeper")
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# Blobs checked for references at once.
+SWEEP_BATCH_SIZE = 1000
+
+
+class MediaStore:
+    """Content-addressed store of media blobs on the local filesystem.
+
+    Blobs are named by the sha256 of their content, so uploading the same file
+    twice stores it once. Blobs never change once written, which makes them
+    safe to cache forever.
+
+    Parameters
+    ----------
+    root : Path
+        Directory the blobs are stored in.
+    max_size : int
+        Maximum size of a blob in bytes.
+    """
+
+    def __init__(self, root: Path, max_size: int) -> None:
+        self.root: Path = root
+        self.max_size: int = max_size
+
+    def path(self, sha256: str) -> Path:
+        """Get the path of a blob.
+
+        Parameters
+        ----------
+        sha256 : str
+            Hex digest of the blob's content.
+
+        Returns
+        -------
+        Path
+            Path of the blob, fanned out over subdirectories by digest prefix.
+        """
+        return self.root / sha256[:2] / sha256
+
+    async def save(self, chunks: AsyncIterable[bytes]) -> tuple[str, int]:
+        """Stream a blob into the store, without holding it in memory.
+
+        Parameters
+        ----------
+        chunks : AsyncIterable[bytes]
+            Content of the blob.
+
+        Returns
+        -------
+        tuple[str, int]
+            Hex sha256 digest and size of the blob.
+
+        Raises
+        ------
+        MediaTooLargeError
+            If the blob exceeds the maximum size.
+        """
+        temp_directory = self.root / "tmp"
+        await anyio.to_thread.run_sync(lambda: temp_directory.mkdir(parents=True, exist_ok=True))
+        temp_path = temp_directory / uuid.uuid4().hex
+
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async with await anyio.open_file(temp_path, "wb") as file:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_size:
+                        msg = f"Media can be at most {self.max_size} bytes."
+                        raise MediaTooLargeError(msg)
+                    digest.update(chunk)
+                    await file.write(chunk)
+
+            sha256 = digest.hexdigest()
+            await anyio.to_thread.run_sync(self._commit, temp_path, self.path(sha256))
+        finally:
+            # Left behind if the upload failed, otherwise already moved or removed.
+            temp_path.unlink(missing_ok=True)
+
+        return sha256, size
+
+    @staticmethod
+    def _commit(temp_path: Path, path: Path) -> None:
+        if path.exists():
+            # Reused by this upload, so it isn't swept before it's referenced.
+            path.touch()
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Atomic, so readers never see a partially written blob.
+        temp_path.replace(path)
+
+    async def read(self, sha256: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """Stream a byte range of a blob.
+
+        Parameters
+        ----------
+        sha256 : str
+            Hex digest of the blob's content.
+        start : int
+            First byte to read.
+        end : int
+            Last byte to read, inclusive.
+
+        Yields
+        ------
+        bytes
+            Chunks of the range.
+        """
+        async with await anyio.open_file(self.path(sha256), "rb") as file:
+            await file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                yield chunk
+
+    def files_older_than(self, older_than: float) -> list[Path]:
+        """List blobs and leftover temporary files last written before a time.
+
+        Parameters
+        ----------
+        older_than : float
+            Timestamp, files modified since are skipped.
+
+        Returns
+        -------
+        list[Path]
+            Paths of the files.
+        """
+        return [
+            path
+            for path in self.root.glob("*/*")
+            if path.is_file() and path.stat().st_mtime < older_than
+        ]
+
+
+def _unlink_unless_modified(paths: list[Path], older_than: float) -> int:
+    removed = 0
+    for path in paths:
+        with contextlib.suppress(FileNotFoundError):
+            # Reused by an upload since it was listed.
+            if path.stat().st_mtime >= older_than:
+                continue
+            path.unlink()
+            removed += 1
+    return removed
+
+
+class MediaSweeper:
+    """Removes blobs no attachment refers to anymore, in the background.
+
+    Blobs are shared by content, so they're left in storage when attachments
+    are deleted, directly or with their card. Uploads write their blob before
+    the attachment is inserted, only files that haven't been written for the
+    grace period are removed.
+
+    Parameters
+    ----------
+    media_store : MediaStore
+        Store of the blobs.
+    grace : timedelta
+        How long blobs and temporary files are kept, before they're removed if
+        unreferenced.
+    interval : float
+        Seconds between sweeps.
+    """
+
+    def __init__(
+        self,
+        media_store: MediaStore,
+        grace: timedelta = timedelta(hours=1),
+        interval: float = 3600.0,
+    ) -> None:
+        self.media_store: MediaStore = media_store
+        self.grace: timedelta = grace
+        self.interval: float = interval
+        self.db_pool: Pool | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        """Start sweeping blobs in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop sweeping blobs."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def sweep(self) -> int:
+        """Remove the unreferenced blobs and temporary files older than the grace period.
+
+        Returns
+        -------
+        int
+            Amount of removed files.
+        """
+        if self.db_pool is None:
+            return 0
+
+        older_than = time.time() - self.grace.total_seconds()
+        candidates = await anyio.to_thread.run_sync(self.media_store.files_older_than, older_than)
+
+        removed = 0
+        for i in range(0, len(candidates), SWEEP_BATCH_SIZE):
+            batch = candidates[i : i + SWEEP_BATCH_SIZE]
+            async with self.db_pool.acquire() as db_connection:
+                referenced: set[str] = {
+                    record[0]
+                    for record in await db_connection.fetch(
+                        "SELECT DISTINCT sha256 FROM card_media WHERE sha256 = ANY($1::text[]);",
+                        [path.name for path in batch],
+                    )
+                }
+            unreferenced = [path for path in batch if path.name not in referenced]
+            removed += await anyio.to_thread.run_sync(
+                _unlink_unless_modified, unreferenced, older_than
+            )
+        return removed
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                removed = await self.sweep()
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                logger.warning("Could not sweep media.", exc_info=True)
+            else:
+                if removed > 0:
+                    logger.info("Removed %d unreferenced media files.", removed)
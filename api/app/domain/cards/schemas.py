@@ -1,6 +1,8 @@
+from datetime import datetime
+from typing import Annotated, Literal
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class Deck(BaseModel):
@@ -22,6 +24,19 @@ class DeckUpdate(BaseModel):
     name: str
 
 
+class DeckClone(BaseModel):
+    """Data in the decks/clone endpoint."""
+
+    name: str
+
+
+class DeckAddCard(BaseModel):
+    """Data in the decks/add_card endpoint."""
+
+    deck_id: UUID
+    card_id: UUID
+
+
 class Card(BaseModel):
     """Represents a card."""
 
@@ -47,6 +62,43 @@ class CardUpdate(BaseModel):
     back_content: str | None = None
 
 
+class CardAddTag(BaseModel):
+    """Data in the cards/add_tag endpoint."""
+
+    card_id: UUID
+    tag_id: UUID
+
+
+class CardMedia(BaseModel):
+    """Represents a media file attached to a card.
+
+    Attributes
+    ----------
+    id : :class:`UUID`
+        ID of the attachment.
+    card_id : :class:`UUID`
+        The card the file is attached to.
+    sha256 : :class:`str`
+        Hex digest of the content, files with the same content share storage.
+    size : :class:`int`
+        Size of the file in bytes.
+    media_type : :class:`str`
+        Media type of the file, e.g. ``image/png``.
+    filename : :class:`str` | None
+        Original name of the file.
+    created_at : :class:`datetime`
+        When the file was uploaded.
+    """
+
+    id: UUID
+    card_id: UUID
+    sha256: str
+    size: int
+    media_type: str
+    filename: str | None
+    created_at: datetime
+
+
 class Tag(BaseModel):
     """Represents a tag."""
 
@@ -64,3 +116,370 @@ class TagUpdate(BaseModel):
     """Data in the tags/update endpoint."""
 
     name: str
+
+
+class CardWithTags(Card):
+    """Represents a card together with its tags."""
+
+    tags: list[Tag]
+
+
+class DeckWithCards(Deck):
+    """Represents a deck together with a page of its cards.
+
+    Attributes
+    ----------
+    card_count : :class:`int`
+        Total amount of cards in the deck, regardless of pagination.
+    cards : :class:`list[CardWithTags]`
+        The requested page of cards, each with its tags.
+    """
+
+    card_count: int
+    cards: list[CardWithTags]
+
+
+type TagExpression = TagFilterTag | TagFilterAnd | TagFilterOr | TagFilterNot
+
+
+class TagFilterTag(BaseModel):
+    """Matches cards that have the tag with this name."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    tag: str
+
+
+class TagFilterAnd(BaseModel):
+    """Matches cards that match all of the sub-expressions."""
+
+    model_config = ConfigDict(extra="forbid", populate_by_name=True)
+
+    and_: list[TagExpression] = Field(alias="and")
+
+
+class TagFilterOr(BaseModel):
+    """Matches cards that match any of the sub-expressions."""
+
+    model_config = ConfigDict(extra="forbid", populate_by_name=True)
+
+    or_: list[TagExpression] = Field(alias="or")
+
+
+class TagFilterNot(BaseModel):
+    """Matches cards that do not match the sub-expression."""
+
+    model_config = ConfigDict(extra="forbid", populate_by_name=True)
+
+    not_: TagExpression = Field(alias="not")
+
+
+class CardQuery(BaseModel):
+    """Data in the cards/query endpoint.
+
+    Attributes
+    ----------
+    filter : :type:`TagExpression`
+        Tag expression the cards have to match.
+    limit : :class:`int`
+        Maximum amount of cards to return.
+    offset : :class:`int`
+        Amount of matching cards to skip.
+
+    Example filter, for cards tagged ``verbs`` and ``chapter-3`` but not ``mastered``::
+
+        {
+            "and": [
+                {"tag": "verbs"},
+                {"tag": "chapter-3"},
+                {"not": {"tag": "mastered"}},
+            ]
+        }
+    """
+
+    filter: TagExpression
+    limit: int = Field(default=100, ge=1, le=1000)
+    offset: int = Field(default=0, ge=0)
+
+
+class CardDuplicate(BaseModel):
+    """A near-duplicate of a card.
+
+    Attributes
+    ----------
+    id : :class:`UUID`
+        ID of the duplicate card.
+    similarity : :class:`float`
+        Estimated jaccard similarity of the normalised front contents.
+    """
+
+    id: UUID
+    similarity: float
+
+
+class DuplicateCluster(BaseModel):
+    """Cards whose front contents are near-duplicates.
+
+    Attributes
+    ----------
+    card_ids : :class:`list[UUID]`
+        IDs of the cards, in ascending order.
+    """
+
+    card_ids: list[UUID]
+
+
+class StudySessionStart(BaseModel):
+    """Data in the study/start endpoint, either a deck or a tag filter.
+
+    Attributes
+    ----------
+    deck_id : :class:`UUID` | None
+        Deck to study the cards of.
+    filter : :type:`TagExpression` | None
+        Tag expression the cards to study have to match.
+    shuffle : :class:`bool`
+        Whether to study the cards in random order, else in deck or id order.
+    limit : :class:`int`
+        Maximum amount of cards to study.
+    """
+
+    deck_id: UUID | None = None
+    filter: TagExpression | None = None
+    shuffle: bool = True
+    limit: int = Field(default=1000, ge=1, le=10000)
+
+
+class StudySession(BaseModel):
+    """A started study session.
+
+    Attributes
+    ----------
+    id : :class:`UUID`
+        ID of the session.
+    card_count : :class:`int`
+        Amount of cards to study.
+    """
+
+    id: UUID
+    card_count: int
+
+
+class StudyCards(BaseModel):
+    """The next cards of a study session.
+
+    Attributes
+    ----------
+    cards : :class:`list[Card]`
+        The cards, with the fields selected when the session started.
+    remaining : :class:`int`
+        Amount of cards left after these, counting cards deleted since the session
+        started until they are skipped.
+    """
+
+    cards: list[Card]
+    remaining: int
+
+
+class BatchUpdateCard(BaseModel):
+    """Updates the given fields of a card, in a batch."""
+
+    op: Literal["update_card"]
+    card_id: UUID
+    name: str | None = None
+    front_content: str | None = None
+    back_content: str | None = None
+
+
+class BatchDeleteCard(BaseModel):
+    """Deletes a card, if it exists, in a batch."""
+
+    op: Literal["delete_card"]
+    card_id: UUID
+
+
+class BatchUpdateDeck(BaseModel):
+    """Renames a deck, in a batch."""
+
+    op: Literal["update_deck"]
+    deck_id: UUID
+    name: str
+
+
+class BatchUpdateTag(BaseModel):
+    """Renames a tag, in a batch."""
+
+    op: Literal["update_tag"]
+    tag_id: UUID
+    name: str
+
+
+class BatchTagCard(BaseModel):
+    """Tags a card, in a batch."""
+
+    op: Literal["tag_card"]
+    card_id: UUID
+    tag_id: UUID
+
+
+class BatchUntagCard(BaseModel):
+    """Removes a tag from a card, if it has it, in a batch."""
+
+    op: Literal["untag_card"]
+    card_id: UUID
+    tag_id: UUID
+
+
+type BatchOperation = Annotated[
+    BatchUpdateCard
+    | BatchDeleteCard
+    | BatchUpdateDeck
+    | BatchUpdateTag
+    | BatchTagCard
+    | BatchUntagCard,
+    Field(discriminator="op"),
+]
+
+
+class Batch(BaseModel):
+    """Data in the batch endpoint.
+
+    Attributes
+    ----------
+    operations : :class:`list` [:type:`BatchOperation`]
+        Operations to apply in order, distinguished by their ``op``. At most 256,
+        the changes a change feed subscriber buffers, as card deletes and tag
+        renames are published one by one even in large batches.
+    """
+
+    operations: list[BatchOperation] = Field(min_length=1, max_length=256)
+
+
+type BatchResult = Card | Deck | Tag | None
+
+
+class BatchResults(BaseModel):
+    """Results of an applied batch.
+
+    Attributes
+    ----------
+    results : :class:`list` [:type:`BatchResult`]
+        Result of every operation in order, the updated card, deck or tag, or
+        ``None`` for deletes and tagging.
+    """
+
+    results: list[BatchResult]
+
+
+class BatchFailure(BaseModel):
+    """Why a batch wasn't applied.
+
+    Attributes
+    ----------
+    index : :class:`int`
+        Position of the failed operation.
+    error : :class:`str`
+        What went wrong.
+    """
+
+    index: int
+    error: str
+
+
+type ChangeEntity = Literal["card", "deck", "tag", "deck_card", "card_tag"]
+type ChangeOperation = Literal["create", "update", "delete", "reload"]
+
+
+class Change(BaseModel):
+    """A change to a card, deck, tag or one of their relations.
+
+    Attributes
+    ----------
+    entity : :type:`ChangeEntity`
+        Kind of the changed row.
+    operation : :type:`ChangeOperation`
+        What happened to it. A deck is ``reload``-ed when its cards and their tags
+        changed in bulk, instead of a change for every row, so they're read again.
+    id : :class:`UUID`
+        ID of the changed card, deck or tag, or of the relation.
+    deck_ids : :class:`list[UUID]`
+        Decks affected by the change.
+    card_id : :class:`UUID` | None
+        The card, for relation changes.
+    tag_id : :class:`UUID` | None
+        The tag, for card tag changes.
+    name : :class:`str` | None
+        The new name, for created or updated tags.
+    """
+
+    entity: ChangeEntity
+    operation: ChangeOperation
+    id: UUID
+    deck_ids: list[UUID] = Field(default_factory=list[UUID])
+    card_id: UUID | None = None
+    tag_id: UUID | None = None
+    name: str | None = None
+
+
+class DeckCard(BaseModel):
+    """Represents a card being in a deck."""
+
+    id: UUID
+    deck_id: UUID
+    card_id: UUID
+
+
+class CardTag(BaseModel):
+    """Represents a card being tagged."""
+
+    id: UUID
+    card_id: UUID
+    tag_id: UUID
+
+
+class Tombstone(BaseModel):
+    """Marks a deleted card, deck, tag or relation.
+
+    Attributes
+    ----------
+    entity : :type:`ChangeEntity`
+        Kind of the deleted row.
+    id : :class:`UUID`
+        ID of the deleted row.
+    """
+
+    entity: ChangeEntity
+    id: UUID
+
+
+class SyncChanges(BaseModel):
+    """Rows created, updated or deleted since a sync token.
+
+    Attributes
+    ----------
+    token : :class:`str`
+        Token to pass to the next sync.
+    has_more : :class:`bool`
+        Whether there are more changes, fetch them right away with the token.
+    decks : :class:`list[Deck]`
+        Created or updated decks.
+    cards : :class:`list[Card]`
+        Created or updated cards.
+    tags : :class:`list[Tag]`
+        Created or updated tags.
+    deck_cards : :class:`list[DeckCard]`
+        Cards added to decks.
+    card_tags : :class:`list[CardTag]`
+        Tags added to cards.
+    deleted : :class:`list[Tombstone]`
+        Deleted rows.
+    """
+
+    token: str
+    has_more: bool
+    decks: list[Deck] = Field(default_factory=list[Deck])
+    cards: list[Card] = Field(default_factory=list[Card])
+    tags: list[Tag] = Field(default_factory=list[Tag])
+    deck_cards: list[DeckCard] = Field(default_factory=list[DeckCard])
+    card_tags: list[CardTag] = Field(default_factory=list[CardTag])
+    deleted: list[Tombstone] = Field(default_factory=list[Tombstone])
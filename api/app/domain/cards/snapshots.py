@@ -0,0 +1,387 @@
+import asyncio
+import functools
+import gzip
+import hashlib
+import logging
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, TYPE_CHECKING
+
+import anyio.to_thread
+
+from app.domain.cards.dependencies import DECK_CARD_FIELDS, FieldSelection, Pagination
+
+if sys.platform == "win32":
+    fcntl = None
+else:
+    import fcntl
+
+if TYPE_CHECKING:
+    from app.domain.cards.schemas import Change
+    from app.domain.cards.storage.base import CardStorage
+
+__all__ = ("DeckSnapshot", "DeckSnapshotStore")
+
+logger = logging.getLogger(__name__)
+
+# Held by the worker a snapshot directory belongs to, for as long as it runs.
+_LOCK_NAME = ".lock"
+
+# A snapshot holds every card of the deck, with every field.
+_ALL_CARDS = Pagination(limit=sys.maxsize, offset=0)
+_ALL_FIELDS = FieldSelection(DECK_CARD_FIELDS)
+
+
+@dataclass(frozen=True, slots=True)
+class DeckSnapshot:
+    """A deck with all of its cards and their tags, serialised and gzip compressed.
+
+    Attributes
+    ----------
+    content : :class:`bytes`
+        The compressed json.
+    digest : :class:`str`
+        Hex hash of the json, the same for the same deck in every worker.
+    version : :class:`int`
+        Version of the deck the snapshot was built from.
+    """
+
+    content: bytes
+    digest: str
+    version: int
+
+
+@dataclass(frozen=True, slots=True)
+class _DiskEntry:
+    digest: str
+    version: int
+    size: int
+
+
+def _compress(deck: bytes) -> tuple[bytes, str]:
+    # Without a timestamp, the same deck compresses to the same bytes.
+    return gzip.compress(deck, mtime=0), hashlib.blake2b(deck, digest_size=16).hexdigest()
+
+
+def _unlink(paths: Iterable[Path]) -> None:
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+def _lock(directory: Path) -> IO[bytes]:
+    lock = (directory / _LOCK_NAME).open("wb")
+    if fcntl is not None:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    return lock
+
+
+def _is_abandoned(directory: Path) -> bool:
+    """Whether the worker a snapshot directory belongs to has exited.
+
+    Returns
+    -------
+    bool
+        ``True`` if no worker holds the directory's lock.
+    """
+    lock_path = directory / _LOCK_NAME
+    try:
+        if fcntl is None:
+            # A file that's open can't be removed, until its worker exits.
+            lock_path.unlink()
+        else:
+            with lock_path.open("rb") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except FileNotFoundError:
+        # Either just created and not locked yet, or left by a worker that
+        # crashed in between, which is only told apart by age.
+        try:
+            return directory.stat().st_mtime < time.time() - 60
+        except FileNotFoundError:
+            return False
+    except OSError:
+        return False
+    return True
+
+
+class DeckSnapshotStore:
+    """Keeps serialised and compressed snapshots of whole decks, for hot deck reads.
+
+    A deck's snapshot is built on its first read, kept in memory and written to
+    disk. Every change to a deck, its cards or their tags bumps the deck's
+    version, which makes its snapshot stale. Snapshots in memory are rebuilt in
+    the background at once, so decks that are read often stay warm, the ones
+    only left on disk are rebuilt on their next read. Both tiers are bounded
+    by size, evicting the least recently read snapshots first.
+
+    Snapshots are kept per worker, on disk in a directory of their own that is
+    removed when stopped. Directories left by workers that didn't stop, e.g.
+    because they were killed, are removed by the next worker that starts. Until
+    started, snapshots are only kept in memory.
+
+    Parameters
+    ----------
+    root : Path
+        Directory the snapshot directories are created in.
+    max_memory_size : int
+        Maximum size of the snapshots kept in memory, in bytes.
+    max_disk_size : int
+        Maximum size of the snapshots kept on disk, in bytes.
+    max_concurrent_builds : int
+        Maximum amount of snapshots read from storage at once.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        max_memory_size: int = 64 * 1024 * 1024,
+        max_disk_size: int = 512 * 1024 * 1024,
+        max_concurrent_builds: int = 4,
+    ) -> None:
+        self.root: Path = root
+        self.max_memory_size: int = max_memory_size
+        self.max_disk_size: int = max_disk_size
+        # Storage snapshots are built from, set once it has been configured.
+        self.storage: CardStorage | None = None
+        # Versions of the decks that have a snapshot or are being built.
+        self._versions: dict[uuid.UUID, int] = {}
+        self._memory: OrderedDict[uuid.UUID, DeckSnapshot] = OrderedDict()
+        self._memory_size: int = 0
+        self._disk: OrderedDict[uuid.UUID, _DiskEntry] = OrderedDict()
+        self._disk_size: int = 0
+        self._directory: Path | None = None
+        self._lock: IO[bytes] | None = None
+        self._builds: dict[uuid.UUID, asyncio.Task[DeckSnapshot | None]] = {}
+        self._build_slots: asyncio.Semaphore = asyncio.Semaphore(max_concurrent_builds)
+
+    def start(self) -> None:
+        """Create the directory snapshots are written to, removing abandoned ones."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        for directory in self.root.glob("decks-*"):
+            if directory.is_dir() and _is_abandoned(directory):
+                shutil.rmtree(directory, ignore_errors=True)
+
+        directory = Path(tempfile.mkdtemp(prefix="decks-", dir=self.root))
+        self._lock = _lock(directory)
+        self._directory = directory
+
+    async def stop(self) -> None:
+        """Stop building snapshots, and remove the ones on disk."""
+        for task in list(self._builds.values()):
+            task.cancel()
+        directory, self._directory = self._directory, None
+        self._disk.clear()
+        self._disk_size = 0
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+        if directory is not None:
+            await anyio.to_thread.run_sync(lambda: shutil.rmtree(directory, ignore_errors=True))
+
+    def _path(self, directory: Path, deck_id: uuid.UUID, version: int) -> Path:
+        return directory / f"{deck_id}-{version}.json.gz"
+
+    def _forget_if_unused(self, deck_id: uuid.UUID) -> None:
+        if (
+            deck_id not in self._memory
+            and deck_id not in self._disk
+            and deck_id not in self._builds
+        ):
+            self._versions.pop(deck_id, None)
+
+    def _remember(self, deck_id: uuid.UUID, snapshot: DeckSnapshot) -> None:
+        previous = self._memory.pop(deck_id, None)
+        if previous is not None:
+            self._memory_size -= len(previous.content)
+        if len(snapshot.content) > self.max_memory_size:
+            return
+
+        self._memory[deck_id] = snapshot
+        self._memory_size += len(snapshot.content)
+        while self._memory_size > self.max_memory_size:
+            evicted_id, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted.content)
+            self._forget_if_unused(evicted_id)
+
+    async def _persist(self, deck_id: uuid.UUID, snapshot: DeckSnapshot) -> None:
+        directory = self._directory
+        size = len(snapshot.content)
+        if directory is None or size > self.max_disk_size:
+            return
+
+        # Files are named by version and only indexed once written, so a file
+        # that's being read is never overwritten.
+        path = self._path(directory, deck_id, snapshot.version)
+        await anyio.to_thread.run_sync(path.write_bytes, snapshot.content)
+
+        stale: list[Path] = []
+        if self._versions.get(deck_id) != snapshot.version or directory != self._directory:
+            # The deck changed while writing, or the store was stopped.
+            stale.append(path)
+        else:
+            previous = self._disk.pop(deck_id, None)
+            if previous is not None:
+                self._disk_size -= previous.size
+                if previous.version != snapshot.version:
+                    stale.append(self._path(directory, deck_id, previous.version))
+            self._disk[deck_id] = _DiskEntry(snapshot.digest, snapshot.version, size)
+            self._disk_size += size
+            while self._disk_size > self.max_disk_size:
+                evicted_id, evicted = self._disk.popitem(last=False)
+                self._disk_size -= evicted.size
+                stale.append(self._path(directory, evicted_id, evicted.version))
+                self._forget_if_unused(evicted_id)
+        await anyio.to_thread.run_sync(_unlink, stale)
+
+    async def _load(self, deck_id: uuid.UUID) -> DeckSnapshot | None:
+        directory = self._directory
+        entry = self._disk.get(deck_id)
+        if directory is None or entry is None or entry.version != self._versions.get(deck_id):
+            return None
+
+        self._disk.move_to_end(deck_id)
+        # It may have been evicted since, then it's built again.
+        try:
+            content = await anyio.to_thread.run_sync(
+                self._path(directory, deck_id, entry.version).read_bytes
+            )
+        except FileNotFoundError:
+            return None
+
+        snapshot = DeckSnapshot(content, entry.digest, entry.version)
+        if self._versions.get(deck_id) == entry.version:
+            self._remember(deck_id, snapshot)
+        return snapshot
+
+    async def _build(self, deck_id: uuid.UUID, version: int) -> DeckSnapshot | None:
+        if self.storage is None:
+            msg = "Snapshots can't be built before the storage is set."
+            raise RuntimeError(msg)
+
+        async with self._build_slots:
+            deck = await self.storage.get_deck_with_cards(deck_id, _ALL_CARDS, _ALL_FIELDS)
+        if deck is None:
+            return None
+        content, digest = await anyio.to_thread.run_sync(_compress, deck)
+        return DeckSnapshot(content, digest, version)
+
+    async def _rebuild(self, deck_id: uuid.UUID) -> DeckSnapshot | None:
+        # Build until the snapshot is of the deck's latest version, changes made
+        # while building are picked up by building again.
+        while True:
+            version = self._versions[deck_id]
+            snapshot = await self._build(deck_id, version)
+            if self._versions[deck_id] != version:
+                continue
+
+            if snapshot is None:
+                # The deck has been deleted.
+                previous = self._memory.pop(deck_id, None)
+                if previous is not None:
+                    self._memory_size -= len(previous.content)
+                entry = self._disk.pop(deck_id, None)
+                if entry is not None:
+                    self._disk_size -= entry.size
+                    if self._directory is not None:
+                        path = self._path(self._directory, deck_id, entry.version)
+                        await anyio.to_thread.run_sync(_unlink, [path])
+                return None
+
+            self._remember(deck_id, snapshot)
+            await self._persist(deck_id, snapshot)
+            if self._versions[deck_id] == version:
+                return snapshot
+
+    def _build_done(self, deck_id: uuid.UUID, task: "asyncio.Task[DeckSnapshot | None]") -> None:
+        del self._builds[deck_id]
+        self._forget_if_unused(deck_id)
+        if not task.cancelled() and (error := task.exception()) is not None:
+            logger.error("Could not build the snapshot of a deck.", exc_info=error)
+
+    def _schedule(self, deck_id: uuid.UUID) -> "asyncio.Task[DeckSnapshot | None]":
+        task = self._builds.get(deck_id)
+        if task is None:
+            task = asyncio.create_task(self._rebuild(deck_id))
+            self._builds[deck_id] = task
+            task.add_done_callback(functools.partial(self._build_done, deck_id))
+        return task
+
+    def apply_change(self, change: "Change") -> None:
+        """Make the snapshots of the decks affected by a change stale.
+
+        Parameters
+        ----------
+        change : Change
+            The change.
+        """
+        if change.entity == "tag":
+            # Renamed or deleted tags could be on the cards of any deck.
+            if change.operation == "create":
+                return
+            deck_ids = list(self._versions)
+        else:
+            deck_ids = [deck_id for deck_id in change.deck_ids if deck_id in self._versions]
+
+        for deck_id in deck_ids:
+            self._versions[deck_id] += 1
+            snapshot = self._memory.pop(deck_id, None)
+            if snapshot is not None:
+                self._memory_size -= len(snapshot.content)
+                self._schedule(deck_id)
+
+    def clear(self) -> None:
+        """Make every snapshot stale, when changes to the decks may have been missed."""
+        for deck_id in self._versions:
+            self._versions[deck_id] += 1
+        self._memory.clear()
+        self._memory_size = 0
+        for deck_id in list(self._versions):
+            self._forget_if_unused(deck_id)
+
+    async def decompress(self, snapshot: DeckSnapshot) -> bytes:
+        """Decompress a snapshot, for clients that don't accept gzip.
+
+        Parameters
+        ----------
+        snapshot : DeckSnapshot
+            The snapshot.
+
+        Returns
+        -------
+        bytes
+            The json of the deck.
+        """
+        # Large decks take a while, which would block the event loop.
+        return await anyio.to_thread.run_sync(gzip.decompress, snapshot.content)
+
+    async def get(self, deck_id: uuid.UUID) -> DeckSnapshot | None:
+        """Get the latest snapshot of a deck, building it if there isn't one.
+
+        Parameters
+        ----------
+        deck_id : UUID
+            ID of the deck.
+
+        Returns
+        -------
+        DeckSnapshot | None
+            The snapshot, or ``None`` if the deck doesn't exist.
+        """
+        snapshot = self._memory.get(deck_id)
+        if snapshot is not None:
+            self._memory.move_to_end(deck_id)
+            return snapshot
+
+        snapshot = await self._load(deck_id)
+        if snapshot is not None:
+            return snapshot
+
+        # Concurrent reads share the build, and don't cancel it if one gives up.
+        self._versions.setdefault(deck_id, 0)
+        return await asyncio.shield(self._schedule(deck_id))
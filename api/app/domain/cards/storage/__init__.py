@@ -0,0 +1,10 @@
+from app.domain.cards.storage.base import CardStorage, TagSnapshot
+from app.domain.cards.storage.memory import MemoryCardStorage
+from app.domain.cards.storage.postgres import PostgresCardStorage
+
+__all__ = (
+    "CardStorage",
+    "MemoryCardStorage",
+    "PostgresCardStorage",
+    "TagSnapshot",
+)
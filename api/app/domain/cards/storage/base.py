@@ -0,0 +1,192 @@
+import uuid
+from dataclasses import dataclass, field
+from typing import Protocol, runtime_checkable
+
+from app.domain.cards.dependencies import FieldSelection, Pagination
+from app.domain.cards.schemas import (
+    BatchOperation,
+    BatchResult,
+    Card,
+    CardCreate,
+    CardUpdate,
+    Deck,
+    Tag,
+    TagExpression,
+)
+from app.domain.jobs.schemas import Job
+
+__all__ = ("CardStorage", "TagSnapshot")
+
+
+@dataclass(frozen=True, slots=True)
+class TagSnapshot:
+    """Consistent snapshot of the cards and their tags, to build the tag index from.
+
+    Attributes
+    ----------
+    card_ids : :class:`list` [:class:`UUID`]
+        IDs of all cards, in ascending order.
+    tags : :class:`list` [:class:`tuple`]
+        ID and name of all tags.
+    card_tags : :class:`list` [:class:`tuple`]
+        Card and tag id of every tagged card.
+    """
+
+    card_ids: list[uuid.UUID] = field(default_factory=list[uuid.UUID])
+    tags: list[tuple[uuid.UUID, str]] = field(default_factory=list[tuple[uuid.UUID, str]])
+    card_tags: list[tuple[uuid.UUID, uuid.UUID]] = field(
+        default_factory=list[tuple[uuid.UUID, uuid.UUID]]
+    )
+
+
+@runtime_checkable  # noqa: PLR0904
+class CardStorage(Protocol):
+    """Where cards, decks, tags and their relations are stored.
+
+    Reads return serialised json, so backends that can build it themselves, like
+    postgres, pass it on as is. Writes publish their changes, so the tag index and
+    other listeners stay in sync with every worker.
+    """
+
+    async def snapshot_tags(self, deck_id: uuid.UUID | None = None) -> TagSnapshot:
+        """Read the cards and their tags, to build the tag index from.
+
+        Only the cards of the deck and their tags if a deck is given, to reload it.
+        """
+        ...
+
+    async def scan_card_fronts(
+        self, after: uuid.UUID | None, limit: int
+    ) -> list[tuple[uuid.UUID, str]]:
+        """Get the id and front content of a batch of cards, ordered by id, after a card."""
+        ...
+
+    async def get_card_fronts(self, card_ids: list[uuid.UUID]) -> list[tuple[uuid.UUID, str]]:
+        """Get the id and front content of the existing cards among ids."""
+        ...
+
+    async def get_card(self, card_id: uuid.UUID, selection: FieldSelection) -> bytes | None:
+        """Get the selected fields of a card, or ``None`` if it doesn't exist."""
+        ...
+
+    async def list_cards(self, selection: FieldSelection) -> bytes:
+        """Get the selected fields of all cards."""
+        ...
+
+    async def get_cards(self, card_ids: list[uuid.UUID], selection: FieldSelection) -> bytes:
+        """Get the selected fields of the existing cards among ids, in the order of the ids."""
+        ...
+
+    async def query_cards(
+        self, expression: TagExpression, limit: int, offset: int, selection: FieldSelection
+    ) -> bytes:
+        """Get a page of the cards matching a tag expression, ordered by id."""
+        ...
+
+    async def create_card(self, data: CardCreate) -> Card:
+        """Create a card."""
+        ...
+
+    async def update_card(self, card_id: uuid.UUID, data: CardUpdate) -> Card | None:
+        """Update the given fields of a card, or get ``None`` if it doesn't exist."""
+        ...
+
+    async def delete_card(self, card_id: uuid.UUID) -> None:
+        """Delete a card, if it exists."""
+        ...
+
+    async def tag_card(self, card_id: uuid.UUID, tag_id: uuid.UUID) -> None:
+        """Tag a card.
+
+        Raises ``CardNotFoundError`` or ``TagNotFoundError`` if either doesn't exist,
+        and ``AlreadyExistsError`` if the card already has the tag.
+        """
+        ...
+
+    async def get_deck(self, deck_id: uuid.UUID, selection: FieldSelection) -> bytes | None:
+        """Get the selected fields of a deck, or ``None`` if it doesn't exist."""
+        ...
+
+    async def get_deck_with_cards(
+        self, deck_id: uuid.UUID, pagination: Pagination, selection: FieldSelection
+    ) -> bytes | None:
+        """Get a deck with a page of its cards ordered by name, or ``None`` if it doesn't exist."""
+        ...
+
+    async def get_deck_card_ids(self, deck_id: uuid.UUID) -> list[uuid.UUID] | None:
+        """Get the ids of the cards in a deck, or ``None`` if it doesn't exist."""
+        ...
+
+    async def list_decks(self, selection: FieldSelection) -> bytes:
+        """Get the selected fields of all decks."""
+        ...
+
+    async def create_deck(self, name: str) -> Deck:
+        """Create a deck, raises ``AlreadyExistsError`` if the name is taken."""
+        ...
+
+    async def clone_deck(self, deck_id: uuid.UUID, name: str) -> Deck:
+        """Clone a deck with copies of its cards and their tags.
+
+        Raises ``DeckNotFoundError`` if the deck doesn't exist, and
+        ``AlreadyExistsError`` if the name is taken.
+        """
+        ...
+
+    async def add_card_to_deck(self, deck_id: uuid.UUID, card_id: uuid.UUID) -> None:
+        """Add a card to a deck.
+
+        Raises ``DeckNotFoundError`` or ``CardNotFoundError`` if either doesn't exist,
+        and ``AlreadyExistsError`` if the card is already in the deck.
+        """
+        ...
+
+    async def update_deck(self, deck_id: uuid.UUID, name: str) -> Deck:
+        """Rename a deck.
+
+        Raises ``DeckNotFoundError`` if the deck doesn't exist, and
+        ``AlreadyExistsError`` if the name is taken.
+        """
+        ...
+
+    async def delete_deck(self, deck_id: uuid.UUID, *, delete_orphaned_cards: bool) -> Job | None:
+        """Delete a deck, or get ``None`` if it doesn't exist.
+
+        Backends may delete in the background, the job tracks the deletion.
+        """
+        ...
+
+    async def get_tag(self, tag_id: uuid.UUID, selection: FieldSelection) -> bytes | None:
+        """Get the selected fields of a tag, or ``None`` if it doesn't exist."""
+        ...
+
+    async def list_tags(self, selection: FieldSelection) -> bytes:
+        """Get the selected fields of all tags."""
+        ...
+
+    async def create_tag(self, name: str) -> Tag:
+        """Create a tag, raises ``AlreadyExistsError`` if the name is taken."""
+        ...
+
+    async def update_tag(self, tag_id: uuid.UUID, name: str) -> Tag:
+        """Rename a tag.
+
+        Raises ``TagNotFoundError`` if the tag doesn't exist, and
+        ``AlreadyExistsError`` if the name is taken.
+        """
+        ...
+
+    async def delete_tag(self, tag_id: uuid.UUID) -> Job | None:
+        """Delete a tag, or get ``None`` if it doesn't exist.
+
+        Backends may delete in the background, the job tracks the deletion.
+        """
+        ...
+
+    async def apply_batch(self, operations: list[BatchOperation]) -> list[BatchResult]:
+        """Apply a batch of operations in order, either all of them or none.
+
+        Raises ``BatchOperationError`` with the position of the operation that
+        failed, e.g. because its card doesn't exist or its name is taken.
+        """
+        ...
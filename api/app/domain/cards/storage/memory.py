@@ -0,0 +1,587 @@
+import bisect
+import datetime
+import heapq
+import operator
+import uuid
+from collections.abc import Callable
+from typing import Any, override
+
+from pydantic_core import to_json
+
+from app.domain.cards.dependencies import FieldSelection, Pagination
+from app.domain.cards.schemas import (
+    BatchDeleteCard,
+    BatchOperation,
+    BatchResult,
+    BatchTagCard,
+    BatchUntagCard,
+    BatchUpdateCard,
+    BatchUpdateDeck,
+    BatchUpdateTag,
+    Card,
+    CardCreate,
+    CardUpdate,
+    Change,
+    Deck,
+    Tag,
+    TagExpression,
+    TagFilterAnd,
+    TagFilterNot,
+    TagFilterOr,
+    TagFilterTag,
+)
+from app.domain.cards.storage.base import CardStorage, TagSnapshot
+from app.domain.jobs.schemas import Job, JobKind
+from app.errors import (
+    AlreadyExistsError,
+    BatchOperationError,
+    CardNotFoundError,
+    DeckNotFoundError,
+    TagNotFoundError,
+)
+from app.utils.ids import uuid7
+
+__all__ = ("MemoryCardStorage",)
+
+# Cards of a deck are ordered by name then id, with unnamed cards last like in postgres.
+type _CardKey = tuple[bool, str, uuid.UUID]
+
+
+def _card_key(card: dict[str, Any]) -> _CardKey:
+    return (card["name"] is None, card["name"] or "", card["id"])
+
+
+def _finished_job(kind: JobKind, target_id: uuid.UUID, options: dict[str, Any], rows: int) -> Job:
+    now = datetime.datetime.now(datetime.UTC)
+    return Job(
+        id=uuid7(),
+        kind=kind,
+        target_id=target_id,
+        options=options,
+        status="succeeded",
+        progress=rows,
+        total=rows,
+        error=None,
+        created_at=now,
+        updated_at=now,
+    )
+
+
+class _Renames:
+    """Names of decks or tags as a batch would leave them, without renaming anything."""
+
+    def __init__(self, rows: dict[uuid.UUID, dict[str, Any]], names: dict[str, uuid.UUID]) -> None:
+        self._rows = rows
+        self._names = names
+        self._owners: dict[str, uuid.UUID | None] = {}
+        self._current: dict[uuid.UUID, str] = {}
+
+    def rename(self, row_id: uuid.UUID, name: str) -> bool:
+        """Rename a row.
+
+        Parameters
+        ----------
+        row_id : UUID
+            ID of the deck or tag.
+        name : str
+            Its new name.
+
+        Returns
+        -------
+        bool
+            ``False`` if the name is taken.
+        """
+        if self._owners.get(name, self._names.get(name)) is not None:
+            return False
+        stored_name: str = self._rows[row_id]["name"]
+        self._owners[self._current.get(row_id, stored_name)] = None
+        self._owners[name] = row_id
+        self._current[row_id] = name
+        return True
+
+
+class MemoryCardStorage(CardStorage):  # noqa: PLR0904
+    """Stores cards, decks and tags in memory, for tests, benchmarks and single node setups.
+
+    Rows are dicts indexed by id, names of decks and tags have a unique index,
+    and every deck keeps its cards sorted by name, so a page of a deck is a slice.
+    Nothing is persisted, and changes only reach listeners in this process.
+    Deletions are done at once, the returned jobs have already succeeded.
+    """
+
+    def __init__(self) -> None:
+        self._cards: dict[uuid.UUID, dict[str, Any]] = {}
+        self._decks: dict[uuid.UUID, dict[str, Any]] = {}
+        self._deck_names: dict[str, uuid.UUID] = {}
+        self._tags: dict[uuid.UUID, dict[str, Any]] = {}
+        self._tag_names: dict[str, uuid.UUID] = {}
+
+        self._deck_cards: dict[uuid.UUID, list[_CardKey]] = {}
+        self._deck_card_ids: dict[tuple[uuid.UUID, uuid.UUID], uuid.UUID] = {}
+        self._card_decks: dict[uuid.UUID, set[uuid.UUID]] = {}
+        self._card_tags: dict[uuid.UUID, dict[uuid.UUID, uuid.UUID]] = {}
+        self._tag_cards: dict[uuid.UUID, set[uuid.UUID]] = {}
+
+        self._listeners: list[Callable[[Change], None]] = []
+
+    def add_listener(self, listener: Callable[[Change], None]) -> None:
+        """Call a function for every change, used to keep in-memory state in sync.
+
+        Parameters
+        ----------
+        listener : Callable[[Change], None]
+            The function, it must not block.
+        """
+        self._listeners.append(listener)
+
+    def _publish(self, change: Change) -> None:
+        for listener in self._listeners:
+            listener(change)
+
+    @override
+    async def snapshot_tags(self, deck_id: uuid.UUID | None = None) -> TagSnapshot:
+        card_ids = (
+            sorted(self._cards)
+            if deck_id is None
+            else sorted(card_id for _, _, card_id in self._deck_cards.get(deck_id, []))
+        )
+        card_tags = [
+            (card_id, tag_id) for card_id in card_ids for tag_id in self._card_tags[card_id]
+        ]
+        tag_ids = self._tags if deck_id is None else {tag_id for _, tag_id in card_tags}
+        return TagSnapshot(
+            card_ids=card_ids,
+            tags=[(tag_id, self._tags[tag_id]["name"]) for tag_id in tag_ids],
+            card_tags=card_tags,
+        )
+
+    @override
+    async def scan_card_fronts(
+        self, after: uuid.UUID | None, limit: int
+    ) -> list[tuple[uuid.UUID, str]]:
+        card_ids = heapq.nsmallest(
+            limit, (card_id for card_id in self._cards if after is None or card_id > after)
+        )
+        return [(card_id, self._cards[card_id]["front_content"]) for card_id in card_ids]
+
+    @override
+    async def get_card_fronts(self, card_ids: list[uuid.UUID]) -> list[tuple[uuid.UUID, str]]:
+        return [
+            (card_id, self._cards[card_id]["front_content"])
+            for card_id in card_ids
+            if card_id in self._cards
+        ]
+
+    @override
+    async def get_card(self, card_id: uuid.UUID, selection: FieldSelection) -> bytes | None:
+        card = self._cards.get(card_id)
+        return to_json(selection.pick(card)) if card is not None else None
+
+    @override
+    async def list_cards(self, selection: FieldSelection) -> bytes:
+        return to_json([selection.pick(card) for card in self._cards.values()])
+
+    @override
+    async def get_cards(self, card_ids: list[uuid.UUID], selection: FieldSelection) -> bytes:
+        return to_json([
+            selection.pick(self._cards[card_id]) for card_id in card_ids if card_id in self._cards
+        ])
+
+    def _evaluate(self, expression: TagExpression) -> set[uuid.UUID]:
+        match expression:
+            case TagFilterTag(tag=name):
+                tag_id = self._tag_names.get(name)
+                return set(self._tag_cards[tag_id]) if tag_id is not None else set()
+            case TagFilterAnd(and_=expressions):
+                cards = set(self._cards)
+                for sub_expression in expressions:
+                    cards &= self._evaluate(sub_expression)
+                return cards
+            case TagFilterOr(or_=expressions):
+                cards: set[uuid.UUID] = set()
+                for sub_expression in expressions:
+                    cards |= self._evaluate(sub_expression)
+                return cards
+            case TagFilterNot(not_=sub_expression):
+                return set(self._cards) - self._evaluate(sub_expression)
+
+    @override
+    async def query_cards(
+        self, expression: TagExpression, limit: int, offset: int, selection: FieldSelection
+    ) -> bytes:
+        card_ids = sorted(self._evaluate(expression))[offset : offset + limit]
+        return to_json([selection.pick(self._cards[card_id]) for card_id in card_ids])
+
+    @override
+    async def create_card(self, data: CardCreate) -> Card:
+        card_id = uuid7()
+        self._cards[card_id] = {
+            "id": card_id,
+            "name": data.name,
+            "front_content": data.front_content,
+            "back_content": data.back_content,
+        }
+        self._card_decks[card_id] = set()
+        self._card_tags[card_id] = {}
+        self._publish(Change(entity="card", operation="create", id=card_id))
+
+        return Card.model_validate(self._cards[card_id])
+
+    @override
+    async def update_card(self, card_id: uuid.UUID, data: CardUpdate) -> Card | None:
+        card = self._cards.get(card_id)
+        if card is None:
+            return None
+
+        old_key = _card_key(card)
+        card.update(data.model_dump(exclude_none=True))
+        if (new_key := _card_key(card)) != old_key:
+            for deck_id in self._card_decks[card_id]:
+                deck_cards = self._deck_cards[deck_id]
+                del deck_cards[bisect.bisect_left(deck_cards, old_key)]
+                bisect.insort(deck_cards, new_key)
+
+        self._publish(
+            Change(
+                entity="card",
+                operation="update",
+                id=card_id,
+                deck_ids=list(self._card_decks[card_id]),
+            )
+        )
+
+        return Card.model_validate(card)
+
+    @override
+    async def delete_card(self, card_id: uuid.UUID) -> None:
+        card = self._cards.pop(card_id, None)
+        if card is None:
+            return
+
+        key = _card_key(card)
+        deck_ids = self._card_decks.pop(card_id)
+        for deck_id in deck_ids:
+            deck_cards = self._deck_cards[deck_id]
+            del deck_cards[bisect.bisect_left(deck_cards, key)]
+            del self._deck_card_ids[deck_id, card_id]
+        for tag_id in self._card_tags.pop(card_id):
+            self._tag_cards[tag_id].discard(card_id)
+
+        self._publish(
+            Change(entity="card", operation="delete", id=card_id, deck_ids=list(deck_ids))
+        )
+
+    @override
+    async def tag_card(self, card_id: uuid.UUID, tag_id: uuid.UUID) -> None:
+        if card_id not in self._cards:
+            msg = "Card with id does not exist."
+            raise CardNotFoundError(msg)
+        if tag_id not in self._tags:
+            msg = "Tag with id does not exist."
+            raise TagNotFoundError(msg)
+        if tag_id in self._card_tags[card_id]:
+            msg = "Card already has this tag."
+            raise AlreadyExistsError(msg)
+
+        card_tag_id = uuid7()
+        self._card_tags[card_id][tag_id] = card_tag_id
+        self._tag_cards[tag_id].add(card_id)
+        self._publish(
+            Change(
+                entity="card_tag",
+                operation="create",
+                id=card_tag_id,
+                deck_ids=list(self._card_decks[card_id]),
+                card_id=card_id,
+                tag_id=tag_id,
+            )
+        )
+
+    @override
+    async def get_deck(self, deck_id: uuid.UUID, selection: FieldSelection) -> bytes | None:
+        deck = self._decks.get(deck_id)
+        return to_json(selection.pick(deck)) if deck is not None else None
+
+    def _card_with_tags(self, card_id: uuid.UUID, selection: FieldSelection) -> dict[str, Any]:
+        card = self._cards[card_id]
+        if "tags" not in selection.fields:
+            return selection.pick(card)
+
+        tags = sorted(
+            (self._tags[tag_id] for tag_id in self._card_tags[card_id]),
+            key=operator.itemgetter("name"),
+        )
+        return selection.pick({**card, "tags": tags})
+
+    @override
+    async def get_deck_with_cards(
+        self, deck_id: uuid.UUID, pagination: Pagination, selection: FieldSelection
+    ) -> bytes | None:
+        deck = self._decks.get(deck_id)
+        if deck is None:
+            return None
+
+        deck_cards = self._deck_cards[deck_id]
+        page = deck_cards[pagination.offset : pagination.offset + pagination.limit]
+        return to_json({
+            "id": deck["id"],
+            "name": deck["name"],
+            "card_count": len(deck_cards),
+            "cards": [self._card_with_tags(card_id, selection) for _, _, card_id in page],
+        })
+
+    @override
+    async def get_deck_card_ids(self, deck_id: uuid.UUID) -> list[uuid.UUID] | None:
+        deck_cards = self._deck_cards.get(deck_id)
+        return [card_id for _, _, card_id in deck_cards] if deck_cards is not None else None
+
+    @override
+    async def list_decks(self, selection: FieldSelection) -> bytes:
+        return to_json([selection.pick(deck) for deck in self._decks.values()])
+
+    def _insert_deck(self, name: str) -> uuid.UUID:
+        deck_id = uuid7()
+        self._decks[deck_id] = {"id": deck_id, "name": name}
+        self._deck_names[name] = deck_id
+        self._deck_cards[deck_id] = []
+        self._publish(Change(entity="deck", operation="create", id=deck_id, deck_ids=[deck_id]))
+        return deck_id
+
+    def _insert_deck_card(self, deck_id: uuid.UUID, card_id: uuid.UUID) -> uuid.UUID:
+        deck_card_id = uuid7()
+        bisect.insort(self._deck_cards[deck_id], _card_key(self._cards[card_id]))
+        self._deck_card_ids[deck_id, card_id] = deck_card_id
+        self._card_decks[card_id].add(deck_id)
+        return deck_card_id
+
+    @override
+    async def create_deck(self, name: str) -> Deck:
+        if name in self._deck_names:
+            msg = "Deck with name already exists."
+            raise AlreadyExistsError(msg)
+
+        deck_id = self._insert_deck(name)
+
+        return Deck(id=deck_id, name=name)
+
+    @override
+    async def clone_deck(self, deck_id: uuid.UUID, name: str) -> Deck:
+        if deck_id not in self._decks:
+            msg = "Deck with id does not exist."
+            raise DeckNotFoundError(msg)
+        if name in self._deck_names:
+            msg = "Deck with name already exists."
+            raise AlreadyExistsError(msg)
+
+        new_deck_id = self._insert_deck(name)
+        for _, _, card_id in list(self._deck_cards[deck_id]):
+            card = await self.create_card(CardCreate.model_validate(self._cards[card_id]))
+            self._insert_deck_card(new_deck_id, card.id)
+            for tag_id in self._card_tags[card_id]:
+                await self.tag_card(card.id, tag_id)
+
+        return Deck(id=new_deck_id, name=name)
+
+    @override
+    async def add_card_to_deck(self, deck_id: uuid.UUID, card_id: uuid.UUID) -> None:
+        if deck_id not in self._decks:
+            msg = "Deck with id does not exist."
+            raise DeckNotFoundError(msg)
+        if card_id not in self._cards:
+            msg = "Card with id does not exist."
+            raise CardNotFoundError(msg)
+        if (deck_id, card_id) in self._deck_card_ids:
+            msg = "Card is already in this deck."
+            raise AlreadyExistsError(msg)
+
+        deck_card_id = self._insert_deck_card(deck_id, card_id)
+        self._publish(
+            Change(
+                entity="deck_card",
+                operation="create",
+                id=deck_card_id,
+                deck_ids=[deck_id],
+                card_id=card_id,
+            )
+        )
+
+    @override
+    async def update_deck(self, deck_id: uuid.UUID, name: str) -> Deck:
+        if name in self._deck_names:
+            msg = "Deck with this name already exists, the name must be unique."
+            raise AlreadyExistsError(msg)
+        deck = self._decks.get(deck_id)
+        if deck is None:
+            msg = "Deck with id does not exist."
+            raise DeckNotFoundError(msg)
+
+        del self._deck_names[deck["name"]]
+        deck["name"] = name
+        self._deck_names[name] = deck_id
+        self._publish(Change(entity="deck", operation="update", id=deck_id, deck_ids=[deck_id]))
+
+        return Deck(id=deck_id, name=name)
+
+    @override
+    async def delete_deck(self, deck_id: uuid.UUID, *, delete_orphaned_cards: bool) -> Job | None:
+        deck = self._decks.pop(deck_id, None)
+        if deck is None:
+            return None
+
+        del self._deck_names[deck["name"]]
+        deck_cards = self._deck_cards.pop(deck_id)
+        for _, _, card_id in deck_cards:
+            del self._deck_card_ids[deck_id, card_id]
+            self._card_decks[card_id].discard(deck_id)
+            if delete_orphaned_cards and not self._card_decks[card_id]:
+                await self.delete_card(card_id)
+        self._publish(Change(entity="deck", operation="delete", id=deck_id, deck_ids=[deck_id]))
+
+        return _finished_job(
+            "delete_deck",
+            deck_id,
+            {"delete_orphaned_cards": delete_orphaned_cards},
+            len(deck_cards),
+        )
+
+    @override
+    async def get_tag(self, tag_id: uuid.UUID, selection: FieldSelection) -> bytes | None:
+        tag = self._tags.get(tag_id)
+        return to_json(selection.pick(tag)) if tag is not None else None
+
+    @override
+    async def list_tags(self, selection: FieldSelection) -> bytes:
+        return to_json([selection.pick(tag) for tag in self._tags.values()])
+
+    @override
+    async def create_tag(self, name: str) -> Tag:
+        if name in self._tag_names:
+            msg = "Tag with name already exists."
+            raise AlreadyExistsError(msg)
+
+        tag_id = uuid7()
+        self._tags[tag_id] = {"id": tag_id, "name": name}
+        self._tag_names[name] = tag_id
+        self._tag_cards[tag_id] = set()
+        self._publish(Change(entity="tag", operation="create", id=tag_id, name=name))
+
+        return Tag(id=tag_id, name=name)
+
+    @override
+    async def update_tag(self, tag_id: uuid.UUID, name: str) -> Tag:
+        if name in self._tag_names:
+            msg = "Tag with this name already exists, the name must be unique."
+            raise AlreadyExistsError(msg)
+        tag = self._tags.get(tag_id)
+        if tag is None:
+            msg = "Tag with id does not exist."
+            raise TagNotFoundError(msg)
+
+        del self._tag_names[tag["name"]]
+        tag["name"] = name
+        self._tag_names[name] = tag_id
+        self._publish(Change(entity="tag", operation="update", id=tag_id, name=name))
+
+        return Tag(id=tag_id, name=name)
+
+    @override
+    async def delete_tag(self, tag_id: uuid.UUID) -> Job | None:
+        tag = self._tags.pop(tag_id, None)
+        if tag is None:
+            return None
+
+        del self._tag_names[tag["name"]]
+        card_ids = self._tag_cards.pop(tag_id)
+        for card_id in card_ids:
+            del self._card_tags[card_id][tag_id]
+        self._publish(Change(entity="tag", operation="delete", id=tag_id))
+
+        return _finished_job("delete_tag", tag_id, {}, len(card_ids))
+
+    def _untag_card(self, card_id: uuid.UUID, tag_id: uuid.UUID) -> None:
+        card_tag_id = self._card_tags.get(card_id, {}).pop(tag_id, None)
+        if card_tag_id is None:
+            return
+
+        self._tag_cards[tag_id].discard(card_id)
+        self._publish(
+            Change(
+                entity="card_tag",
+                operation="delete",
+                id=card_tag_id,
+                deck_ids=list(self._card_decks[card_id]),
+                card_id=card_id,
+                tag_id=tag_id,
+            )
+        )
+
+    def _check_batch(self, operations: list[BatchOperation]) -> None:
+        # Operations are checked against what the earlier ones would leave behind,
+        # so a batch that fails changes nothing.
+        deleted_cards: set[uuid.UUID] = set()
+        deck_names = _Renames(self._decks, self._deck_names)
+        tag_names = _Renames(self._tags, self._tag_names)
+        card_tags: dict[tuple[uuid.UUID, uuid.UUID], bool] = {}
+
+        for index, operation in enumerate(operations):
+            match operation:
+                case BatchUpdateCard(card_id=card_id) | BatchTagCard(card_id=card_id) if (
+                    card_id not in self._cards or card_id in deleted_cards
+                ):
+                    msg = "Card with id does not exist."
+                    raise BatchOperationError(msg, index)
+                case BatchDeleteCard(card_id=card_id):
+                    deleted_cards.add(card_id)
+                case BatchUpdateDeck(deck_id=deck_id) if deck_id not in self._decks:
+                    msg = "Deck with id does not exist."
+                    raise BatchOperationError(msg, index)
+                case BatchUpdateDeck(deck_id=deck_id, name=name) if not deck_names.rename(
+                    deck_id, name
+                ):
+                    msg = "Deck with this name already exists, the name must be unique."
+                    raise BatchOperationError(msg, index)
+                case BatchUpdateTag(tag_id=tag_id) | BatchTagCard(tag_id=tag_id) if (
+                    tag_id not in self._tags
+                ):
+                    msg = "Tag with id does not exist."
+                    raise BatchOperationError(msg, index)
+                case BatchUpdateTag(tag_id=tag_id, name=name) if not tag_names.rename(
+                    tag_id, name
+                ):
+                    msg = "Tag with this name already exists, the name must be unique."
+                    raise BatchOperationError(msg, index)
+                case BatchTagCard(card_id=card_id, tag_id=tag_id):
+                    if card_tags.get((card_id, tag_id), tag_id in self._card_tags[card_id]):
+                        msg = "Card already has this tag."
+                        raise BatchOperationError(msg, index)
+                    card_tags[card_id, tag_id] = True
+                case BatchUntagCard(card_id=card_id, tag_id=tag_id):
+                    card_tags[card_id, tag_id] = False
+                case _:
+                    pass
+
+    @override
+    async def apply_batch(self, operations: list[BatchOperation]) -> list[BatchResult]:
+        self._check_batch(operations)
+
+        results: list[BatchResult] = []
+        for operation in operations:
+            match operation:
+                case BatchUpdateCard(card_id=card_id):
+                    update = CardUpdate.model_validate(operation.model_dump(exclude={"op"}))
+                    results.append(await self.update_card(card_id, update))
+                case BatchDeleteCard(card_id=card_id):
+                    await self.delete_card(card_id)
+                    results.append(None)
+                case BatchUpdateDeck(deck_id=deck_id, name=name):
+                    results.append(await self.update_deck(deck_id, name))
+                case BatchUpdateTag(tag_id=tag_id, name=name):
+                    results.append(await self.update_tag(tag_id, name))
+                case BatchTagCard(card_id=card_id, tag_id=tag_id):
+                    await self.tag_card(card_id, tag_id)
+                    results.append(None)
+                case BatchUntagCard(card_id=card_id, tag_id=tag_id):
+                    self._untag_card(card_id, tag_id)
+                    results.append(None)
+
+        return results
@@ -0,0 +1,700 @@
+import uuid
+from typing import override
+
+from asyncpg import ForeignKeyViolationError, Pool, Record
+from asyncpg.pool import PoolAcquireContext
+
+from app.domain.cards.change_feed import publish_change, publish_changes
+from app.domain.cards.dependencies import FieldSelection, Pagination
+from app.domain.cards.schemas import (
+    BatchOperation,
+    BatchResult,
+    Card,
+    CardCreate,
+    CardUpdate,
+    Change,
+    Deck,
+    Tag,
+    TagExpression,
+)
+from app.domain.cards.storage.base import CardStorage, TagSnapshot
+from app.domain.cards.storage.postgres_batch import apply_operations
+from app.domain.cards.tag_index import compile_tag_expression
+from app.domain.jobs.runner import JobRunner
+from app.domain.jobs.schemas import Job
+from app.errors import AlreadyExistsError, CardNotFoundError, DeckNotFoundError, TagNotFoundError
+from app.utils.ids import uuid7
+
+__all__ = ("PostgresCardStorage",)
+
+
+def _missing_reference(e: ForeignKeyViolationError) -> Exception:
+    """Translate a foreign key violation into the error of the missing row.
+
+    Returns
+    -------
+    Exception
+        The error to raise.
+    """
+    constraint: str = e.constraint_name or ""
+    if constraint.endswith("deck_id_fkey"):
+        return DeckNotFoundError("Deck with id does not exist.")
+    if constraint.endswith("tag_id_fkey"):
+        return TagNotFoundError("Tag with id does not exist.")
+    return CardNotFoundError("Card with id does not exist.")
+
+
+class PostgresCardStorage(CardStorage):  # noqa: PLR0904
+    """Stores cards, decks and tags in postgres.
+
+    Json responses are built by postgres and passed on as is. Changes are
+    published with ``NOTIFY``, see :class:`ChangeFeed`, and large deletions run as
+    background jobs.
+
+    Parameters
+    ----------
+    job_runner : JobRunner
+        Runs the deck and tag deletion jobs.
+    """
+
+    def __init__(self, job_runner: JobRunner) -> None:
+        self.job_runner: JobRunner = job_runner
+        self.db_pool: Pool | None = None
+        """Pool to run queries with, set once it has been created."""
+
+    def _acquire(self) -> PoolAcquireContext:
+        if self.db_pool is None:
+            msg = "The database pool hasn't been created yet."
+            raise RuntimeError(msg)
+        return self.db_pool.acquire()
+
+    @override
+    async def snapshot_tags(self, deck_id: uuid.UUID | None = None) -> TagSnapshot:
+        async with (
+            self._acquire() as db_connection,
+            db_connection.transaction(isolation="repeatable_read", readonly=True),
+        ):
+            if deck_id is None:
+                cards: list[Record] = await db_connection.fetch(
+                    "SELECT id FROM cards ORDER BY id;"
+                )
+                tags: list[Record] = await db_connection.fetch("SELECT id, name FROM tags;")
+                card_tags: list[Record] = await db_connection.fetch(
+                    "SELECT card_id, tag_id FROM card_tags;"
+                )
+            else:
+                cards = await db_connection.fetch(
+                    "SELECT card_id FROM deck_cards WHERE deck_id = $1 ORDER BY card_id;",
+                    deck_id,
+                )
+                card_tags = await db_connection.fetch(
+                    """
+                    SELECT card_tags.card_id, card_tags.tag_id
+                    FROM deck_cards
+                    JOIN card_tags ON card_tags.card_id = deck_cards.card_id
+                    WHERE deck_cards.deck_id = $1;
+                    """,
+                    deck_id,
+                )
+                tags = await db_connection.fetch(
+                    "SELECT id, name FROM tags WHERE id = ANY($1::uuid[]);",
+                    list({card_tag[1] for card_tag in card_tags}),
+                )
+
+        return TagSnapshot(
+            card_ids=[card[0] for card in cards],
+            tags=[(tag[0], tag[1]) for tag in tags],
+            card_tags=[(card_tag[0], card_tag[1]) for card_tag in card_tags],
+        )
+
+    @override
+    async def scan_card_fronts(
+        self, after: uuid.UUID | None, limit: int
+    ) -> list[tuple[uuid.UUID, str]]:
+        async with self._acquire() as db_connection:
+            cards: list[Record] = await db_connection.fetch(
+                """
+                SELECT id, front_content
+                FROM cards
+                WHERE id > COALESCE($1, '00000000-0000-0000-0000-000000000000'::uuid)
+                ORDER BY id
+                LIMIT $2;
+                """,
+                after,
+                limit,
+            )
+        return [(card[0], card[1]) for card in cards]
+
+    @override
+    async def get_card_fronts(self, card_ids: list[uuid.UUID]) -> list[tuple[uuid.UUID, str]]:
+        async with self._acquire() as db_connection:
+            cards: list[Record] = await db_connection.fetch(
+                "SELECT id, front_content FROM cards WHERE id = ANY($1::uuid[]);", card_ids
+            )
+        return [(card[0], card[1]) for card in cards]
+
+    @override
+    async def get_card(self, card_id: uuid.UUID, selection: FieldSelection) -> bytes | None:
+        async with self._acquire() as db_connection:
+            # Only whitelisted field names are formatted into the query.
+            card: str | None = await db_connection.fetchval(
+                f"""
+                SELECT {selection.json_object("cards")}
+                FROM cards
+                WHERE id = $1;
+                """,  # noqa: S608
+                card_id,
+            )
+        return card.encode() if card is not None else None
+
+    @override
+    async def list_cards(self, selection: FieldSelection) -> bytes:
+        async with self._acquire() as db_connection:
+            # Only whitelisted field names are formatted into the query.
+            cards: str = await db_connection.fetchval(
+                f"""
+                SELECT COALESCE(json_agg({selection.json_object("cards")}), '[]'::json)
+                FROM cards;
+                """  # noqa: S608
+            )
+        return cards.encode()
+
+    @override
+    async def get_cards(self, card_ids: list[uuid.UUID], selection: FieldSelection) -> bytes:
+        async with self._acquire() as db_connection:
+            # Only whitelisted field names are formatted into the query.
+            cards: str = await db_connection.fetchval(
+                f"""
+                SELECT COALESCE(
+                    json_agg(
+                        {selection.json_object("cards")}
+                        ORDER BY array_position($1::uuid[], cards.id)
+                    ),
+                    '[]'::json
+                )
+                FROM cards
+                WHERE id = ANY($1::uuid[]);
+                """,  # noqa: S608
+                card_ids,
+            )
+        return cards.encode()
+
+    @override
+    async def query_cards(
+        self, expression: TagExpression, limit: int, offset: int, selection: FieldSelection
+    ) -> bytes:
+        args: list[str] = []
+        condition: str = compile_tag_expression(expression, args)
+        async with self._acquire() as db_connection:
+            # The condition only contains placeholders, tag names are passed as
+            # arguments. Only whitelisted field names are formatted into the query.
+            cards: str = await db_connection.fetchval(
+                f"""
+                SELECT COALESCE(
+                    json_agg({selection.json_object("cards")} ORDER BY cards.id),
+                    '[]'::json
+                )
+                FROM (
+                    SELECT *
+                    FROM cards
+                    WHERE {condition}
+                    ORDER BY id
+                    LIMIT ${len(args) + 1} OFFSET ${len(args) + 2}
+                ) cards;
+                """,  # noqa: S608
+                *args,
+                limit,
+                offset,
+            )
+        return cards.encode()
+
+    @override
+    async def create_card(self, data: CardCreate) -> Card:
+        async with self._acquire() as db_connection:
+            selection: list[Record] = await db_connection.fetch(
+                """
+                INSERT INTO cards
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT DO NOTHING
+                RETURNING id, name, front_content, back_content;
+                """,
+                uuid7(),
+                data.name,
+                data.front_content,
+                data.back_content,
+            )
+            card = selection[0]
+            await publish_change(
+                db_connection, Change(entity="card", operation="create", id=card[0])
+            )
+
+        return Card(id=card[0], name=card[1], front_content=card[2], back_content=card[3])
+
+    @override
+    async def update_card(self, card_id: uuid.UUID, data: CardUpdate) -> Card | None:
+        async with self._acquire() as db_connection:
+            # Fields that aren't given keep their value.
+            selection: list[Record] = await db_connection.fetch(
+                """
+                UPDATE cards
+                SET name = COALESCE($2, name),
+                    front_content = COALESCE($3, front_content),
+                    back_content = COALESCE($4, back_content)
+                WHERE id = $1
+                RETURNING id, name, front_content, back_content,
+                          ARRAY(SELECT deck_id FROM deck_cards WHERE card_id = cards.id);
+                """,
+                card_id,
+                data.name,
+                data.front_content,
+                data.back_content,
+            )
+            if len(selection) == 0:
+                return None
+
+            card: Record = selection[0]
+            await publish_change(
+                db_connection,
+                Change(entity="card", operation="update", id=card_id, deck_ids=card[4]),
+            )
+
+        return Card(id=card[0], name=card[1], front_content=card[2], back_content=card[3])
+
+    @override
+    async def delete_card(self, card_id: uuid.UUID) -> None:
+        async with self._acquire() as db_connection:
+            # The memberships are only cascaded after returning, so we still get the decks.
+            selection: list[Record] = await db_connection.fetch(
+                """
+                DELETE FROM cards
+                WHERE id = $1
+                RETURNING ARRAY(SELECT deck_id FROM deck_cards WHERE card_id = cards.id);
+                """,
+                card_id,
+            )
+            if len(selection) != 0:
+                await publish_change(
+                    db_connection,
+                    Change(
+                        entity="card", operation="delete", id=card_id, deck_ids=selection[0][0]
+                    ),
+                )
+
+    @override
+    async def tag_card(self, card_id: uuid.UUID, tag_id: uuid.UUID) -> None:
+        async with self._acquire() as db_connection:
+            try:
+                selection: list[Record] = await db_connection.fetch(
+                    """
+                    INSERT INTO card_tags
+                    VALUES ($1, $2, $3)
+                    ON CONFLICT DO NOTHING
+                    RETURNING id, ARRAY(SELECT deck_id FROM deck_cards WHERE card_id = $2);
+                    """,
+                    uuid7(),
+                    card_id,
+                    tag_id,
+                )
+            except ForeignKeyViolationError as e:
+                raise _missing_reference(e) from e
+
+            if len(selection) == 0:
+                msg = "Card already has this tag."
+                raise AlreadyExistsError(msg)
+
+            card_tag: Record = selection[0]
+            await publish_change(
+                db_connection,
+                Change(
+                    entity="card_tag",
+                    operation="create",
+                    id=card_tag[0],
+                    deck_ids=card_tag[1],
+                    card_id=card_id,
+                    tag_id=tag_id,
+                ),
+            )
+
+    @override
+    async def get_deck(self, deck_id: uuid.UUID, selection: FieldSelection) -> bytes | None:
+        async with self._acquire() as db_connection:
+            # Only whitelisted field names are formatted into the query.
+            deck: str | None = await db_connection.fetchval(
+                f"""
+                SELECT {selection.json_object("decks")}
+                FROM decks
+                WHERE id = $1;
+                """,  # noqa: S608
+                deck_id,
+            )
+        return deck.encode() if deck is not None else None
+
+    @override
+    async def get_deck_with_cards(
+        self, deck_id: uuid.UUID, pagination: Pagination, selection: FieldSelection
+    ) -> bytes | None:
+        # The deck, its cards and their tags are aggregated into a single json
+        # document, so this costs one round trip regardless of deck size.
+        tags_join = ""
+        if "tags" in selection.fields:
+            tags_join = """
+                LEFT JOIN LATERAL (
+                    SELECT json_agg(json_build_object('id', tags.id, 'name', tags.name)
+                                    ORDER BY tags.name) AS tags
+                    FROM card_tags
+                    JOIN tags ON tags.id = card_tags.tag_id
+                    WHERE card_tags.card_id = c.id
+                ) t ON TRUE
+            """
+        # Only whitelisted field names are formatted into the query.
+        card_object = selection.json_object("c", {"tags": "COALESCE(t.tags, '[]'::json)"})
+
+        async with self._acquire() as db_connection:
+            deck: str | None = await db_connection.fetchval(
+                f"""
+                SELECT json_build_object(
+                    'id', d.id,
+                    'name', d.name,
+                    'card_count', (SELECT count(*) FROM deck_cards WHERE deck_id = d.id),
+                    'cards', COALESCE(page.cards, '[]'::json)
+                )
+                FROM decks d
+                LEFT JOIN LATERAL (
+                    SELECT json_agg({card_object} ORDER BY c.name, c.id) AS cards
+                    FROM (
+                        SELECT cards.*
+                        FROM deck_cards
+                        JOIN cards ON cards.id = deck_cards.card_id
+                        WHERE deck_cards.deck_id = d.id
+                        ORDER BY cards.name, cards.id
+                        LIMIT $2 OFFSET $3
+                    ) c
+                    {tags_join}
+                ) page ON TRUE
+                WHERE d.id = $1;
+                """,  # noqa: S608
+                deck_id,
+                pagination.limit,
+                pagination.offset,
+            )
+        return deck.encode() if deck is not None else None
+
+    @override
+    async def get_deck_card_ids(self, deck_id: uuid.UUID) -> list[uuid.UUID] | None:
+        async with self._acquire() as db_connection:
+            card_ids: list[uuid.UUID] | None = await db_connection.fetchval(
+                """
+                SELECT (
+                    SELECT COALESCE(array_agg(card_id), '{}')
+                    FROM deck_cards
+                    WHERE deck_id = decks.id
+                )
+                FROM decks
+                WHERE id = $1;
+                """,
+                deck_id,
+            )
+        return card_ids
+
+    @override
+    async def list_decks(self, selection: FieldSelection) -> bytes:
+        async with self._acquire() as db_connection:
+            # Only whitelisted field names are formatted into the query.
+            decks: str = await db_connection.fetchval(
+                f"""
+                SELECT COALESCE(json_agg({selection.json_object("decks")}), '[]'::json)
+                FROM decks;
+                """  # noqa: S608
+            )
+        return decks.encode()
+
+    @override
+    async def create_deck(self, name: str) -> Deck:
+        async with self._acquire() as db_connection:
+            selection: list[Record] = await db_connection.fetch(
+                """
+                INSERT INTO decks
+                VALUES ($1, $2)
+                ON CONFLICT DO NOTHING
+                RETURNING id, name;
+                """,
+                uuid7(),
+                name,
+            )
+            if len(selection) == 0:
+                msg = "Deck with name already exists."
+                raise AlreadyExistsError(msg)
+
+            deck: Record = selection[0]
+            await publish_change(
+                db_connection,
+                Change(entity="deck", operation="create", id=deck[0], deck_ids=[deck[0]]),
+            )
+
+        return Deck(id=deck[0], name=deck[1])
+
+    @override
+    async def clone_deck(self, deck_id: uuid.UUID, name: str) -> Deck:
+        async with self._acquire() as db_connection, db_connection.transaction():
+            # The copy, media included, is made in a single statement. Data-modifying
+            # CTEs all see the same snapshot, so the source cards are materialised once
+            # with their new ids and every insert joins on them.
+            selection: list[Record] = await db_connection.fetch(
+                """
+                WITH new_deck AS (
+                    INSERT INTO decks (id, name)
+                    SELECT uuid_generate_v7(), $2
+                    FROM decks
+                    WHERE id = $1
+                    ON CONFLICT DO NOTHING
+                    RETURNING id, name
+                ), source_cards AS MATERIALIZED (
+                    SELECT
+                        cards.id AS old_id,
+                        uuid_generate_v7() AS new_id,
+                        cards.name,
+                        cards.front_content,
+                        cards.back_content
+                    FROM deck_cards
+                    JOIN cards ON cards.id = deck_cards.card_id
+                    WHERE deck_cards.deck_id = $1 AND EXISTS (SELECT 1 FROM new_deck)
+                ), new_cards AS (
+                    INSERT INTO cards (id, name, front_content, back_content)
+                    SELECT new_id, name, front_content, back_content
+                    FROM source_cards
+                ), new_deck_cards AS (
+                    INSERT INTO deck_cards (id, deck_id, card_id)
+                    SELECT uuid_generate_v7(), new_deck.id, source_cards.new_id
+                    FROM source_cards
+                    CROSS JOIN new_deck
+                ), new_card_tags AS (
+                    INSERT INTO card_tags (id, card_id, tag_id)
+                    SELECT uuid_generate_v7(), source_cards.new_id, card_tags.tag_id
+                    FROM source_cards
+                    JOIN card_tags ON card_tags.card_id = source_cards.old_id
+                ), new_card_media AS (
+                    INSERT INTO card_media (id, card_id, sha256, size, media_type, filename)
+                    SELECT
+                        uuid_generate_v7(),
+                        source_cards.new_id,
+                        card_media.sha256,
+                        card_media.size,
+                        card_media.media_type,
+                        card_media.filename
+                    FROM source_cards
+                    JOIN card_media ON card_media.card_id = source_cards.old_id
+                )
+                SELECT id, name
+                FROM new_deck;
+                """,
+                deck_id,
+                name,
+            )
+
+            if len(selection) == 0:
+                exists: bool = await db_connection.fetchval(
+                    "SELECT EXISTS (SELECT 1 FROM decks WHERE id = $1);", deck_id
+                )
+                if exists:
+                    msg = "Deck with name already exists."
+                    raise AlreadyExistsError(msg)
+                msg = "Deck with id does not exist."
+                raise DeckNotFoundError(msg)
+
+            new_deck_id, new_name = selection[0]
+            # A change for every copied card and card tag would overflow the queues
+            # of the change feed's subscribers, listeners read the deck again instead.
+            await publish_changes(
+                db_connection,
+                [
+                    Change(
+                        entity="deck", operation="create", id=new_deck_id, deck_ids=[new_deck_id]
+                    ),
+                    Change(
+                        entity="deck", operation="reload", id=new_deck_id, deck_ids=[new_deck_id]
+                    ),
+                ],
+            )
+
+        return Deck(id=new_deck_id, name=new_name)
+
+    @override
+    async def add_card_to_deck(self, deck_id: uuid.UUID, card_id: uuid.UUID) -> None:
+        async with self._acquire() as db_connection:
+            try:
+                selection: list[Record] = await db_connection.fetch(
+                    """
+                    INSERT INTO deck_cards
+                    VALUES ($1, $2, $3)
+                    ON CONFLICT DO NOTHING
+                    RETURNING id;
+                    """,
+                    uuid7(),
+                    deck_id,
+                    card_id,
+                )
+            except ForeignKeyViolationError as e:
+                raise _missing_reference(e) from e
+
+            if len(selection) == 0:
+                msg = "Card is already in this deck."
+                raise AlreadyExistsError(msg)
+
+            await publish_change(
+                db_connection,
+                Change(
+                    entity="deck_card",
+                    operation="create",
+                    id=selection[0][0],
+                    deck_ids=[deck_id],
+                    card_id=card_id,
+                ),
+            )
+
+    @override
+    async def update_deck(self, deck_id: uuid.UUID, name: str) -> Deck:
+        async with self._acquire() as db_connection:
+            taken: bool = await db_connection.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM decks WHERE name = $1);", name
+            )
+            if taken:
+                msg = "Deck with this name already exists, the name must be unique."
+                raise AlreadyExistsError(msg)
+
+            selection: list[Record] = await db_connection.fetch(
+                """
+                UPDATE decks
+                SET name = $2
+                WHERE id = $1
+                RETURNING id, name;
+                """,
+                deck_id,
+                name,
+            )
+            if len(selection) == 0:
+                msg = "Deck with id does not exist."
+                raise DeckNotFoundError(msg)
+
+            deck: Record = selection[0]
+            await publish_change(
+                db_connection,
+                Change(entity="deck", operation="update", id=deck_id, deck_ids=[deck_id]),
+            )
+
+        return Deck(id=deck[0], name=deck[1])
+
+    @override
+    async def delete_deck(self, deck_id: uuid.UUID, *, delete_orphaned_cards: bool) -> Job | None:
+        async with self._acquire() as db_connection:
+            exists: bool = await db_connection.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM decks WHERE id = $1);", deck_id
+            )
+            if not exists:
+                return None
+
+            return await self.job_runner.submit(
+                db_connection,
+                "delete_deck",
+                deck_id,
+                {"delete_orphaned_cards": delete_orphaned_cards},
+            )
+
+    @override
+    async def get_tag(self, tag_id: uuid.UUID, selection: FieldSelection) -> bytes | None:
+        async with self._acquire() as db_connection:
+            # Only whitelisted field names are formatted into the query.
+            tag: str | None = await db_connection.fetchval(
+                f"""
+                SELECT {selection.json_object("tags")}
+                FROM tags
+                WHERE id = $1;
+                """,  # noqa: S608
+                tag_id,
+            )
+        return tag.encode() if tag is not None else None
+
+    @override
+    async def list_tags(self, selection: FieldSelection) -> bytes:
+        async with self._acquire() as db_connection:
+            # Only whitelisted field names are formatted into the query.
+            tags: str = await db_connection.fetchval(
+                f"""
+                SELECT COALESCE(json_agg({selection.json_object("tags")}), '[]'::json)
+                FROM tags;
+                """  # noqa: S608
+            )
+        return tags.encode()
+
+    @override
+    async def create_tag(self, name: str) -> Tag:
+        async with self._acquire() as db_connection:
+            selection: list[Record] = await db_connection.fetch(
+                """
+                INSERT INTO tags
+                VALUES ($1, $2)
+                ON CONFLICT DO NOTHING
+                RETURNING id, name;
+                """,
+                uuid7(),
+                name,
+            )
+            if len(selection) == 0:
+                msg = "Tag with name already exists."
+                raise AlreadyExistsError(msg)
+
+            tag: Record = selection[0]
+            await publish_change(
+                db_connection, Change(entity="tag", operation="create", id=tag[0], name=tag[1])
+            )
+
+        return Tag(id=tag[0], name=tag[1])
+
+    @override
+    async def update_tag(self, tag_id: uuid.UUID, name: str) -> Tag:
+        async with self._acquire() as db_connection:
+            taken: bool = await db_connection.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM tags WHERE name = $1);", name
+            )
+            if taken:
+                msg = "Tag with this name already exists, the name must be unique."
+                raise AlreadyExistsError(msg)
+
+            selection: list[Record] = await db_connection.fetch(
+                """
+                UPDATE tags
+                SET name = $2
+                WHERE id = $1
+                RETURNING id, name;
+                """,
+                tag_id,
+                name,
+            )
+            if len(selection) == 0:
+                msg = "Tag with id does not exist."
+                raise TagNotFoundError(msg)
+
+            tag: Record = selection[0]
+            await publish_change(
+                db_connection, Change(entity="tag", operation="update", id=tag[0], name=tag[1])
+            )
+
+        return Tag(id=tag[0], name=tag[1])
+
+    @override
+    async def delete_tag(self, tag_id: uuid.UUID) -> Job | None:
+        async with self._acquire() as db_connection:
+            exists: bool = await db_connection.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM tags WHERE id = $1);", tag_id
+            )
+            if not exists:
+                return None
+
+            return await self.job_runner.submit(db_connection, "delete_tag", tag_id)
+
+    @override
+    async def apply_batch(self, operations: list[BatchOperation]) -> list[BatchResult]:
+        async with self._acquire() as db_connection, db_connection.transaction():
+            results, changes = await apply_operations(db_connection, operations)
+            await publish_changes(db_connection, changes)
+
+        return results
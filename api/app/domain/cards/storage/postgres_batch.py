@@ -0,0 +1,431 @@
+import uuid
+from collections.abc import Awaitable, Callable, Hashable, Sequence
+from typing import Any, Literal
+
+from asyncpg import Connection, ForeignKeyViolationError, Record, UniqueViolationError
+from asyncpg.pool import PoolConnectionProxy
+
+from app.domain.cards.change_feed import MAX_PUBLISHED_CHANGES
+from app.domain.cards.schemas import (
+    BatchDeleteCard,
+    BatchOperation,
+    BatchResult,
+    BatchTagCard,
+    BatchUntagCard,
+    BatchUpdateCard,
+    BatchUpdateDeck,
+    BatchUpdateTag,
+    Card,
+    Change,
+    Deck,
+    Tag,
+)
+from app.errors import BatchOperationError
+from app.utils.ids import uuid7
+
+__all__ = ("apply_operations",)
+
+type _Group[T] = Sequence[tuple[int, T]]
+
+
+def _conflict_keys(operation: BatchOperation) -> set[Hashable]:
+    """Get what an operation writes, operations writing the same thing can't share a statement.
+
+    Returns
+    -------
+    set[Hashable]
+        The written rows and unique names.
+    """
+    match operation:
+        case BatchUpdateCard(card_id=card_id) | BatchDeleteCard(card_id=card_id):
+            return {card_id}
+        case BatchUpdateDeck(deck_id=row_id, name=name) | BatchUpdateTag(tag_id=row_id, name=name):
+            return {row_id, (operation.op, name)}
+        case (
+            BatchTagCard(card_id=card_id, tag_id=tag_id)
+            | BatchUntagCard(card_id=card_id, tag_id=tag_id)
+        ):
+            return {(card_id, tag_id)}
+
+
+def _group_operations(
+    operations: Sequence[BatchOperation],
+) -> list[list[tuple[int, BatchOperation]]]:
+    """Group consecutive operations of the same kind, to apply each group with one statement.
+
+    A group ends before an operation that writes what an operation in the group
+    already writes, e.g. a second update of the same card, so applying a group
+    at once gives the same result as applying its operations in order.
+
+    Parameters
+    ----------
+    operations : Sequence[BatchOperation]
+        The operations of a batch.
+
+    Returns
+    -------
+    list[list[tuple[int, BatchOperation]]]
+        The groups in order, with the position of every operation.
+    """
+    groups: list[list[tuple[int, BatchOperation]]] = []
+    group_keys: set[Hashable] = set()
+    for index, operation in enumerate(operations):
+        keys = _conflict_keys(operation)
+        if groups and groups[-1][0][1].op == operation.op and group_keys.isdisjoint(keys):
+            groups[-1].append((index, operation))
+            group_keys |= keys
+        else:
+            groups.append([(index, operation)])
+            group_keys = keys
+    return groups
+
+
+async def _update_cards(
+    db_connection: Connection | PoolConnectionProxy,
+    group: _Group[BatchUpdateCard],
+    results: list[BatchResult],
+) -> list[Change]:
+    # Fields that aren't given keep their value.
+    cards: list[Record] = await db_connection.fetch(
+        """
+        UPDATE cards
+        SET name = COALESCE(updates.name, cards.name),
+            front_content = COALESCE(updates.front_content, cards.front_content),
+            back_content = COALESCE(updates.back_content, cards.back_content)
+        FROM unnest($1::uuid[], $2::text[], $3::text[], $4::text[])
+            AS updates (id, name, front_content, back_content)
+        WHERE cards.id = updates.id
+        RETURNING cards.id, cards.name, cards.front_content, cards.back_content,
+                  ARRAY(SELECT deck_id FROM deck_cards WHERE card_id = cards.id);
+        """,
+        [operation.card_id for _, operation in group],
+        [operation.name for _, operation in group],
+        [operation.front_content for _, operation in group],
+        [operation.back_content for _, operation in group],
+    )
+    updated = {card[0]: card for card in cards}
+    for index, operation in group:
+        card = updated.get(operation.card_id)
+        if card is None:
+            msg = "Card with id does not exist."
+            raise BatchOperationError(msg, index)
+        results[index] = Card(
+            id=card[0], name=card[1], front_content=card[2], back_content=card[3]
+        )
+
+    return [
+        Change(entity="card", operation="update", id=card[0], deck_ids=card[4]) for card in cards
+    ]
+
+
+async def _delete_cards(
+    db_connection: Connection | PoolConnectionProxy,
+    group: _Group[BatchDeleteCard],
+    results: list[BatchResult],
+) -> list[Change]:
+    # The memberships are only cascaded after returning, so we still get the decks.
+    cards: list[Record] = await db_connection.fetch(
+        """
+        DELETE FROM cards
+        WHERE id = ANY($1::uuid[])
+        RETURNING id, ARRAY(SELECT deck_id FROM deck_cards WHERE card_id = cards.id);
+        """,
+        [operation.card_id for _, operation in group],
+    )
+    for index, _ in group:
+        results[index] = None
+
+    return [
+        Change(entity="card", operation="delete", id=card[0], deck_ids=card[1]) for card in cards
+    ]
+
+
+async def _rename(
+    db_connection: Connection | PoolConnectionProxy,
+    entity: Literal["deck", "tag"],
+    group: _Group[BatchUpdateDeck | BatchUpdateTag],
+) -> dict[uuid.UUID, str]:
+    """Rename decks or tags.
+
+    Renames are checked in order against the names the earlier ones leave, so a
+    name freed earlier in the group can be taken again. Names are unique at every
+    row, so such a rename is applied by a statement after the one freeing it.
+
+    Returns
+    -------
+    dict[UUID, str]
+        The new name of every renamed row.
+
+    Raises
+    ------
+    BatchOperationError
+        If a row doesn't exist or a name is taken.
+    """
+    table = f"{entity}s"
+    taken_message = (
+        f"{entity.capitalize()} with this name already exists, the name must be unique."
+    )
+    renames = [
+        (
+            index,
+            operation.deck_id if isinstance(operation, BatchUpdateDeck) else operation.tag_id,
+            operation.name,
+        )
+        for index, operation in group
+    ]
+
+    # The renamed rows are locked, so they're still there when renamed. Only the
+    # table name is formatted into the queries.
+    rows: list[Record] = await db_connection.fetch(
+        f"""
+        SELECT id, name
+        FROM {table}
+        WHERE id = ANY($1::uuid[]) OR name = ANY($2::text[])
+        ORDER BY id
+        FOR UPDATE;
+        """,  # noqa: S608
+        [row_id for _, row_id, _ in renames],
+        [name for _, _, name in renames],
+    )
+    names: dict[uuid.UUID, str] = {row[0]: row[1] for row in rows}
+    owners: dict[str, uuid.UUID] = {row[1]: row[0] for row in rows}
+
+    statements: list[list[tuple[uuid.UUID, str]]] = [[]]
+    freed: set[str] = set()
+    for index, row_id, name in renames:
+        old_name = names.get(row_id)
+        if old_name is None:
+            msg = f"{entity.capitalize()} with id does not exist."
+            raise BatchOperationError(msg, index)
+        if name in owners:
+            raise BatchOperationError(taken_message, index)
+        if name in freed:
+            statements.append([])
+            freed = set()
+        del owners[old_name]
+        freed.add(old_name)
+        owners[name] = row_id
+        names[row_id] = name
+        statements[-1].append((row_id, name))
+
+    for statement in statements:
+        try:
+            await db_connection.execute(
+                f"""
+                UPDATE {table}
+                SET name = renames.name
+                FROM unnest($1::uuid[], $2::text[]) AS renames (id, name)
+                WHERE {table}.id = renames.id;
+                """,  # noqa: S608
+                [row_id for row_id, _ in statement],
+                [name for _, name in statement],
+            )
+        except UniqueViolationError as e:
+            # Taken by a concurrent transaction since it was checked.
+            raise BatchOperationError(taken_message, group[0][0]) from e
+
+    return {row_id: names[row_id] for _, row_id, _ in renames}
+
+
+async def _update_decks(
+    db_connection: Connection | PoolConnectionProxy,
+    group: _Group[BatchUpdateDeck],
+    results: list[BatchResult],
+) -> list[Change]:
+    renamed = await _rename(db_connection, "deck", group)
+    for index, operation in group:
+        results[index] = Deck(id=operation.deck_id, name=operation.name)
+
+    return [
+        Change(entity="deck", operation="update", id=deck_id, deck_ids=[deck_id])
+        for deck_id in renamed
+    ]
+
+
+async def _update_tags(
+    db_connection: Connection | PoolConnectionProxy,
+    group: _Group[BatchUpdateTag],
+    results: list[BatchResult],
+) -> list[Change]:
+    renamed = await _rename(db_connection, "tag", group)
+    for index, operation in group:
+        results[index] = Tag(id=operation.tag_id, name=operation.name)
+
+    return [
+        Change(entity="tag", operation="update", id=tag_id, name=name)
+        for tag_id, name in renamed.items()
+    ]
+
+
+async def _tag_cards(
+    db_connection: Connection | PoolConnectionProxy,
+    group: _Group[BatchTagCard],
+    results: list[BatchResult],
+) -> list[Change]:
+    # Only cards and tags that exist are inserted, so a missing one can be told
+    # apart per operation instead of failing the statement.
+    try:
+        tagged: list[Record] = await db_connection.fetch(
+            """
+            WITH additions AS (
+                SELECT *
+                FROM unnest($1::uuid[], $2::uuid[], $3::uuid[])
+                    WITH ORDINALITY AS additions (id, card_id, tag_id, position)
+            ), inserted AS (
+                INSERT INTO card_tags (id, card_id, tag_id)
+                SELECT id, card_id, tag_id
+                FROM additions
+                WHERE EXISTS (SELECT 1 FROM cards WHERE id = additions.card_id)
+                    AND EXISTS (SELECT 1 FROM tags WHERE id = additions.tag_id)
+                ON CONFLICT (card_id, tag_id) DO NOTHING
+                RETURNING id
+            )
+            SELECT EXISTS (SELECT 1 FROM cards WHERE id = additions.card_id),
+                   EXISTS (SELECT 1 FROM tags WHERE id = additions.tag_id),
+                   additions.id IN (SELECT id FROM inserted),
+                   additions.id,
+                   ARRAY(SELECT deck_id FROM deck_cards WHERE card_id = additions.card_id)
+            FROM additions
+            ORDER BY additions.position;
+            """,
+            [uuid7() for _ in group],
+            [operation.card_id for _, operation in group],
+            [operation.tag_id for _, operation in group],
+        )
+    except ForeignKeyViolationError as e:
+        # Deleted by a concurrent transaction since it was checked.
+        msg = "Card or tag with id does not exist."
+        raise BatchOperationError(msg, group[0][0]) from e
+
+    changes: list[Change] = []
+    for (index, operation), (card_exists, tag_exists, inserted, card_tag_id, deck_ids) in zip(
+        group, tagged, strict=True
+    ):
+        if not card_exists:
+            msg = "Card with id does not exist."
+            raise BatchOperationError(msg, index)
+        if not tag_exists:
+            msg = "Tag with id does not exist."
+            raise BatchOperationError(msg, index)
+        if not inserted:
+            msg = "Card already has this tag."
+            raise BatchOperationError(msg, index)
+        results[index] = None
+        changes.append(
+            Change(
+                entity="card_tag",
+                operation="create",
+                id=card_tag_id,
+                deck_ids=deck_ids,
+                card_id=operation.card_id,
+                tag_id=operation.tag_id,
+            )
+        )
+    return changes
+
+
+async def _untag_cards(
+    db_connection: Connection | PoolConnectionProxy,
+    group: _Group[BatchUntagCard],
+    results: list[BatchResult],
+) -> list[Change]:
+    card_tags: list[Record] = await db_connection.fetch(
+        """
+        DELETE FROM card_tags
+        USING unnest($1::uuid[], $2::uuid[]) AS removals (card_id, tag_id)
+        WHERE card_tags.card_id = removals.card_id AND card_tags.tag_id = removals.tag_id
+        RETURNING card_tags.id, card_tags.card_id, card_tags.tag_id,
+                  ARRAY(SELECT deck_id FROM deck_cards WHERE card_id = card_tags.card_id);
+        """,
+        [operation.card_id for _, operation in group],
+        [operation.tag_id for _, operation in group],
+    )
+    for index, _ in group:
+        results[index] = None
+
+    return [
+        Change(
+            entity="card_tag",
+            operation="delete",
+            id=card_tag[0],
+            deck_ids=card_tag[3],
+            card_id=card_tag[1],
+            tag_id=card_tag[2],
+        )
+        for card_tag in card_tags
+    ]
+
+
+def _collapse_changes(changes: list[Change]) -> list[Change]:
+    """Replace the changes to decks and their cards with a reload of the decks, for large batches.
+
+    Deleted cards aren't in their decks anymore, and tag renames and changes to
+    cards in no deck can't be read again from a deck either, so these changes are
+    published as is. :class:`Batch` has at most as many operations as a change
+    feed subscriber buffers changes, so they don't overflow it on their own.
+
+    Returns
+    -------
+    list[Change]
+        The changes to publish.
+    """
+    if len(changes) <= MAX_PUBLISHED_CHANGES:
+        return changes
+
+    collapsed: list[Change] = []
+    reloaded: dict[uuid.UUID, None] = {}
+    for change in changes:
+        if change.deck_ids and (
+            change.entity in {"card_tag", "deck"}
+            or (change.entity == "card" and change.operation == "update")
+        ):
+            reloaded.update(dict.fromkeys(change.deck_ids))
+        else:
+            collapsed.append(change)
+    collapsed.extend(
+        Change(entity="deck", operation="reload", id=deck_id, deck_ids=[deck_id])
+        for deck_id in reloaded
+    )
+    # Cards in many decks could make for more reloads than changes.
+    return min(collapsed, changes, key=len)
+
+
+# Applies a group of operations of one kind, keyed by the kind.
+_APPLIERS: dict[
+    str,
+    Callable[[Connection | PoolConnectionProxy, Any, list[BatchResult]], Awaitable[list[Change]]],
+] = {
+    "update_card": _update_cards,
+    "delete_card": _delete_cards,
+    "update_deck": _update_decks,
+    "update_tag": _update_tags,
+    "tag_card": _tag_cards,
+    "untag_card": _untag_cards,
+}
+
+
+async def apply_operations(
+    db_connection: Connection | PoolConnectionProxy, operations: Sequence[BatchOperation]
+) -> tuple[list[BatchResult], list[Change]]:
+    """Apply a batch of operations, with one statement per group of operations.
+
+    Run it in a transaction, so a failed operation rolls back the ones before it.
+
+    Parameters
+    ----------
+    db_connection : Connection | PoolConnectionProxy
+        Asyncpg database connection.
+    operations : Sequence[BatchOperation]
+        The operations, applied in order.
+
+    Returns
+    -------
+    tuple[list[BatchResult], list[Change]]
+        The result of every operation, and the changes to publish.
+    """
+    results: list[BatchResult] = [None] * len(operations)
+    changes: list[Change] = []
+    for group in _group_operations(operations):
+        changes += await _APPLIERS[group[0][1].op](db_connection, group, results)
+
+    return results, _collapse_changes(changes)
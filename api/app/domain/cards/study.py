@@ -0,0 +1,248 @@
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from app.domain.cards.dependencies import FieldSelection
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from app.domain.cards.schemas import TagExpression
+    from app.domain.cards.storage.base import CardStorage
+
+__all__ = ("StudySessionStore", "sample_matching_cards")
+
+logger = logging.getLogger(__name__)
+
+# Bytes of a card id in a session's queue.
+_ID_SIZE = 16
+
+_ID_FIELD = FieldSelection(("id",))
+
+
+@dataclass(slots=True)
+class _StudySession:
+    queue: bytes
+    """IDs of the cards to study, packed back to back."""
+    selection: FieldSelection
+    expires_at: float
+    fetched: int = 0
+    """Amount of queued cards that have been read from storage."""
+    prefetched: deque[dict[str, Any]] = field(default_factory=deque[dict[str, Any]])
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    refill: asyncio.Task[None] | None = None
+
+    @property
+    def size(self) -> int:
+        return len(self.queue) // _ID_SIZE
+
+    @property
+    def remaining(self) -> int:
+        return len(self.prefetched) + self.size - self.fetched
+
+
+class StudySessionStore:
+    """Keeps study sessions in memory, each a precomputed queue of cards.
+
+    A session's queue holds packed card ids, 16 bytes per card. Cards are read
+    from storage a batch at a time, and the next batch is read in the background
+    once half of the current one has been served, so serving the next card is a
+    memory lookup. Sessions expire after not being used for a while, the least
+    recently used ones are evicted first once there are too many.
+
+    Sessions live in the worker that started them.
+
+    Parameters
+    ----------
+    ttl : float
+        Seconds an unused session is kept.
+    max_sessions : int
+        Maximum amount of sessions kept.
+    batch_size : int
+        Amount of cards read from storage at once.
+    """
+
+    def __init__(
+        self, ttl: float = 60 * 60, max_sessions: int = 10_000, batch_size: int = 50
+    ) -> None:
+        self.ttl: float = ttl
+        self.max_sessions: int = max_sessions
+        self.batch_size: int = batch_size
+        self._sessions: OrderedDict[uuid.UUID, _StudySession] = OrderedDict()
+
+    def _evict(self) -> None:
+        # Sessions are ordered by last use, so expired ones are at the front.
+        now = time.monotonic()
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.expires_at >= now and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+            if session.refill is not None:
+                session.refill.cancel()
+
+    def _get(self, session_id: uuid.UUID) -> _StudySession | None:
+        self._evict()
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        session.expires_at = time.monotonic() + self.ttl
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def start(self, card_ids: "Sequence[uuid.UUID]", selection: FieldSelection) -> uuid.UUID:
+        """Start a session.
+
+        Parameters
+        ----------
+        card_ids : Sequence[UUID]
+            IDs of the cards to study, in order.
+        selection : FieldSelection
+            Fields of the cards to serve.
+
+        Returns
+        -------
+        UUID
+            ID of the session.
+        """
+        session_id = uuid.uuid4()
+        self._sessions[session_id] = _StudySession(
+            queue=b"".join(card_id.bytes for card_id in card_ids),
+            selection=selection,
+            expires_at=time.monotonic() + self.ttl,
+        )
+        self._evict()
+        return session_id
+
+    def end(self, session_id: uuid.UUID) -> bool:
+        """End a session.
+
+        Parameters
+        ----------
+        session_id : UUID
+            ID of the session.
+
+        Returns
+        -------
+        bool
+            Whether the session existed.
+        """
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        if session.refill is not None:
+            session.refill.cancel()
+        return True
+
+    async def _fill(self, session: _StudySession, storage: "CardStorage", count: int) -> None:
+        # Cards deleted since the session started are skipped, read more until
+        # there are enough or the queue is exhausted.
+        while len(session.prefetched) < count and session.fetched < session.size:
+            start = session.fetched
+            end = min(start + max(self.batch_size, count - len(session.prefetched)), session.size)
+            card_ids = [
+                uuid.UUID(bytes=session.queue[i * _ID_SIZE : (i + 1) * _ID_SIZE])
+                for i in range(start, end)
+            ]
+            cards: list[dict[str, Any]] = json.loads(
+                await storage.get_cards(card_ids, session.selection)
+            )
+            session.prefetched.extend(cards)
+            session.fetched = end
+
+    async def _refill(self, session: _StudySession, storage: "CardStorage") -> None:
+        # A failed prefetch is retried by the next request that runs out of cards.
+        try:
+            async with session.lock:
+                await self._fill(session, storage, self.batch_size)
+        except Exception:
+            logger.exception("Could not prefetch study cards.")
+
+    async def next_cards(
+        self, session_id: uuid.UUID, storage: "CardStorage", count: int
+    ) -> tuple[list[dict[str, Any]], int] | None:
+        """Serve the next cards of a session.
+
+        Parameters
+        ----------
+        session_id : UUID
+            ID of the session.
+        storage : CardStorage
+            Storage to read the cards from, when they haven't been prefetched.
+        count : int
+            Maximum amount of cards to serve.
+
+        Returns
+        -------
+        tuple[list[dict[str, Any]], int] | None
+            The selected fields of the cards, and the amount of cards left, or
+            ``None`` if the session doesn't exist.
+        """
+        session = self._get(session_id)
+        if session is None:
+            return None
+
+        async with session.lock:
+            if len(session.prefetched) < count:
+                await self._fill(session, storage, count)
+            cards = [
+                session.prefetched.popleft() for _ in range(min(count, len(session.prefetched)))
+            ]
+
+        if (
+            len(session.prefetched) < self.batch_size // 2
+            and session.fetched < session.size
+            and (session.refill is None or session.refill.done())
+        ):
+            session.refill = asyncio.create_task(self._refill(session, storage))
+
+        return cards, session.remaining
+
+
+async def sample_matching_cards(
+    storage: "CardStorage", expression: "TagExpression", count: int, page_size: int = 10_000
+) -> list[uuid.UUID]:
+    """Pick cards matching a tag expression at random, without holding all of them.
+
+    The matches are read a page at a time and reservoir sampled, so every
+    matching card is equally likely to be picked.
+
+    Parameters
+    ----------
+    storage : CardStorage
+        Storage to read the cards from.
+    expression : TagExpression
+        The tag expression.
+    count : int
+        Maximum amount of cards to pick.
+    page_size : int
+        Amount of card ids read from storage at once.
+
+    Returns
+    -------
+    list[UUID]
+        IDs of the picked cards, all of the matches if there are no more than ``count``.
+    """
+    sample: list[uuid.UUID] = []
+    matches = 0
+    offset = 0
+    while True:
+        cards: list[dict[str, Any]] = json.loads(
+            await storage.query_cards(expression, page_size, offset, _ID_FIELD)
+        )
+        for card in cards:
+            matches += 1
+            if len(sample) < count:
+                sample.append(uuid.UUID(card["id"]))
+            elif (index := random.randrange(matches)) < count:  # noqa: S311
+                sample[index] = uuid.UUID(card["id"])
+        if len(cards) < page_size:
+            # Pages may shift under concurrent changes, a card is only queued once.
+            return list(dict.fromkeys(sample))
+        offset += page_size
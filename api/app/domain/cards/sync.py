@@ -0,0 +1,271 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import TYPE_CHECKING, Self, override
+
+import asyncpg
+from asyncpg import Connection, Record
+from asyncpg.pool import PoolConnectionProxy
+
+from app.database.purge import Purger
+from app.domain.cards.schemas import Card, CardTag, Deck, DeckCard, SyncChanges, Tag, Tombstone
+from app.errors import SyncTokenExpiredError
+
+if TYPE_CHECKING:
+    import uuid
+
+
+__all__ = ("SyncToken", "TombstonePurger", "fetch_changes")
+
+
+@dataclass(frozen=True, slots=True)
+class SyncToken:
+    """Position of a client in the sync log, handed out opaquely.
+
+    Changes are tracked by the transaction that made them, not by sequence,
+    since sequence values are taken before commit and commit out of order. A
+    client has seen every change that is visible in the postgres snapshot of
+    its last sync.
+
+    Attributes
+    ----------
+    since : :class:`str` | None
+        Snapshot of the last completed sync, or ``None`` to sync everything.
+    round : :class:`str` | None
+        Snapshot of the first page of a sync that has more pages.
+    after : :class:`int`
+        Sequence of the last change sent in this round.
+    """
+
+    since: str | None = None
+    round: str | None = None
+    after: int = 0
+
+    def encode(self) -> str:
+        """Encode the token for the client.
+
+        Returns
+        -------
+        str
+            The url-safe token.
+        """
+        data = json.dumps([self.since, self.round, self.after], separators=(",", ":"))
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    @classmethod
+    def decode(cls, token: str) -> Self:
+        """Decode a token from a client.
+
+        Parameters
+        ----------
+        token : str
+            The token.
+
+        Returns
+        -------
+        Self
+            The decoded token.
+
+        Raises
+        ------
+        ValueError
+            If the token is malformed.
+        """
+        try:
+            data = json.loads(base64.urlsafe_b64decode(token))
+        except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+            msg = "Malformed sync token."
+            raise ValueError(msg) from e
+
+        match data:
+            case [str() | None as since, str() | None as round_, int() as after]:
+                return cls(since, round_, after)
+            case _:
+                msg = "Malformed sync token."
+                raise ValueError(msg)
+
+
+# Current state of changed rows, by entity.
+_ROW_QUERIES: dict[str, str] = {
+    "deck": "SELECT id, name FROM decks WHERE id = ANY($1::uuid[]);",
+    "card": "SELECT id, name, front_content, back_content FROM cards WHERE id = ANY($1::uuid[]);",
+    "tag": "SELECT id, name FROM tags WHERE id = ANY($1::uuid[]);",
+    "deck_card": "SELECT id, deck_id, card_id FROM deck_cards WHERE id = ANY($1::uuid[]);",
+    "card_tag": "SELECT id, card_id, tag_id FROM card_tags WHERE id = ANY($1::uuid[]);",
+}
+
+
+async def _fetch_entries(db_connection: Connection, token: SyncToken, limit: int) -> list[Record]:
+    if token.since is None:
+        return await db_connection.fetch(
+            """
+            SELECT entity, id, deleted, seq
+            FROM sync_log
+            WHERE seq > $1 AND NOT deleted
+            ORDER BY seq
+            LIMIT $2;
+            """,
+            token.after,
+            limit,
+        )
+
+    return await db_connection.fetch(
+        """
+        SELECT entity, id, deleted, seq
+        FROM sync_log
+        WHERE xid >= pg_snapshot_xmin($1::text::pg_snapshot)
+            AND NOT pg_visible_in_snapshot(xid, $1::text::pg_snapshot)
+            AND seq > $2
+        ORDER BY seq
+        LIMIT $3;
+        """,
+        token.since,
+        token.after,
+        limit,
+    )
+
+
+async def fetch_changes(db_connection: Connection, token: SyncToken, limit: int) -> SyncChanges:
+    """Get the rows changed since a sync token, reading only the changes.
+
+    Parameters
+    ----------
+    db_connection : Connection
+        Asyncpg database connection.
+    token : SyncToken
+        The client's position.
+    limit : int
+        Maximum amount of changes to return, the rest is left for the next page.
+
+    Returns
+    -------
+    SyncChanges
+        The changed rows and tombstones, with the next token.
+
+    Raises
+    ------
+    SyncTokenExpiredError
+        If tombstones the client hasn't seen have been purged.
+    ValueError
+        If the token doesn't hold valid snapshots.
+    """
+    async with db_connection.transaction(isolation="repeatable_read", readonly=True):
+        try:
+            snapshot: str = await db_connection.fetchval("SELECT pg_current_snapshot()::text;")
+            expired: bool = token.since is not None and await db_connection.fetchval(
+                """
+                SELECT EXISTS (
+                    SELECT 1
+                    FROM sync_horizon
+                    WHERE xid >= pg_snapshot_xmin($1::text::pg_snapshot)
+                );
+                """,
+                token.since,
+            )
+            entries = await _fetch_entries(db_connection, token, limit + 1)
+        except asyncpg.DataError as e:
+            msg = "Malformed sync token."
+            raise ValueError(msg) from e
+        if expired:
+            msg = "Changes since the sync token have been purged, sync from scratch."
+            raise SyncTokenExpiredError(msg)
+
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        changed: dict[str, list[uuid.UUID]] = {}
+        deleted: list[Tombstone] = []
+        for entity, entity_id, is_deleted, _ in entries:
+            if is_deleted:
+                deleted.append(Tombstone(entity=entity, id=entity_id))
+            else:
+                changed.setdefault(entity, []).append(entity_id)
+
+        rows: dict[str, list[Record]] = {
+            entity: await db_connection.fetch(_ROW_QUERIES[entity], ids)
+            for entity, ids in changed.items()
+        }
+
+    # Pages of a round are read from different snapshots. The round's first
+    # snapshot becomes the next token, changes committed since then that
+    # weren't sent on a later page are sent by the next sync.
+    round_snapshot = token.round or snapshot
+    if has_more:
+        next_token = SyncToken(token.since, round_snapshot, entries[-1][3])
+    else:
+        next_token = SyncToken(round_snapshot)
+
+    return SyncChanges(
+        token=next_token.encode(),
+        has_more=has_more,
+        decks=[Deck(id=deck[0], name=deck[1]) for deck in rows.get("deck", [])],
+        cards=[
+            Card(id=card[0], name=card[1], front_content=card[2], back_content=card[3])
+            for card in rows.get("card", [])
+        ],
+        tags=[Tag(id=tag[0], name=tag[1]) for tag in rows.get("tag", [])],
+        deck_cards=[
+            DeckCard(id=deck_card[0], deck_id=deck_card[1], card_id=deck_card[2])
+            for deck_card in rows.get("deck_card", [])
+        ],
+        card_tags=[
+            CardTag(id=card_tag[0], card_id=card_tag[1], tag_id=card_tag[2])
+            for card_tag in rows.get("card_tag", [])
+        ],
+        deleted=deleted,
+    )
+
+
+class TombstonePurger(Purger):
+    """Purges old tombstones from the sync log in the background.
+
+    Clients whose sync token predates a purged tombstone have to sync from
+    scratch, so the retention should exceed how long clients stay offline.
+
+    Parameters
+    ----------
+    retention : timedelta
+        How long tombstones are kept.
+    interval : float
+        Seconds between purges.
+    """
+
+    purged: str = "tombstones"
+
+    def __init__(
+        self, retention: timedelta = timedelta(days=30), interval: float = 3600.0
+    ) -> None:
+        super().__init__(interval)
+        self.retention: timedelta = retention
+
+    @override
+    async def purge(self, db_connection: Connection | PoolConnectionProxy) -> int:
+        # The sync log is appended to by every write, in batches its inserts
+        # don't wait on the purge. The horizon moves past the purged tombstones.
+        purged: int = await db_connection.fetchval(
+            """
+            WITH purged AS (
+                DELETE FROM sync_log
+                WHERE ctid IN (
+                    SELECT ctid
+                    FROM sync_log
+                    WHERE deleted AND changed_at < NOW() - $1::interval
+                    LIMIT $2
+                )
+                RETURNING xid
+            ), horizon AS (
+                INSERT INTO sync_horizon (xid)
+                SELECT max(xid)
+                FROM purged
+                HAVING count(*) > 0
+                ON CONFLICT (id) DO UPDATE
+                SET xid = GREATEST(sync_horizon.xid, EXCLUDED.xid)
+            )
+            SELECT count(*) FROM purged;
+            """,
+            self.retention,
+            self.batch_size,
+        )
+        return purged
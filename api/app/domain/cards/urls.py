@@ -3,7 +3,11 @@
 DECK_DELETE = "/api/decks/delete/{deck_id:uuid}"
 DECK_LIST = "/api/decks"
 DECK_GET = "/api/decks/{deck_id:uuid}"
+DECK_GET_WITH_CARDS = "/api/decks/{deck_id:uuid}/cards"
 DECK_ADD_CARD = "/api/decks/add_card"
+DECK_CLONE = "/api/decks/clone/{deck_id:uuid}"
+DECK_DUPLICATES = "/api/decks/{deck_id:uuid}/duplicates"
+DECK_SNAPSHOT = "/api/decks/{deck_id:uuid}/snapshot"
 
 CARD_CREATE = "/api/cards/create"
 CARD_UPDATE = "/api/cards/update/{card_id:uuid}"
@@ -11,9 +15,25 @@
 CARD_LIST = "/api/cards"
 CARD_GET = "/api/cards/{card_id:uuid}"
 CARD_ADD_TAG = "/api/cards/add_tag"
+CARD_QUERY = "/api/cards/query"
+CARD_DUPLICATES = "/api/cards/{card_id:uuid}/duplicates"
+CARD_MEDIA_UPLOAD = "/api/cards/{card_id:uuid}/media"
+CARD_MEDIA_LIST = "/api/cards/{card_id:uuid}/media"
+CARD_MEDIA_GET = "/api/cards/media/{media_id:uuid}"
+CARD_MEDIA_DELETE = "/api/cards/media/delete/{media_id:uuid}"
 
 TAG_CREATE = "/api/tags/create"
 TAG_UPDATE = "/api/tags/update/{tag_id:uuid}"
 TAG_DELETE = "/api/tags/delete/{tag_id:uuid}"
 TAG_LIST = "/api/tags"
 TAG_GET = "/api/tags/{tag_id:uuid}"
+
+BATCH = "/api/batch"
+
+CHANGE_FEED = "/api/changes"
+
+SYNC = "/api/sync"
+
+STUDY_START = "/api/study/start"
+STUDY_NEXT = "/api/study/{session_id:uuid}/next"
+STUDY_END = "/api/study/end/{session_id:uuid}"
@@ -0,0 +1,6 @@
+from app.domain.jobs import schemas, urls
+
+__all__ = (
+    "schemas",
+    "urls",
+)
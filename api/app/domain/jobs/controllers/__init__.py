@@ -0,0 +1,3 @@
+from app.domain.jobs.controllers.job_controller import JobController
+
+__all__ = ("JobController",)
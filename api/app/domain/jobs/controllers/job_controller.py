@@ -0,0 +1,91 @@
+import uuid
+from collections.abc import Sequence
+from typing import Annotated
+
+from asyncpg import Connection, Record
+from litestar import Controller, MediaType, Response, get
+from litestar.params import Parameter
+
+from app.domain.jobs import urls
+from app.domain.jobs.runner import JOB_COLUMNS, job_from_record
+from app.domain.jobs.schemas import Job
+
+
+class JobController(Controller):
+    """Controller for background jobs."""
+
+    tags: Sequence[str] | None = ["Jobs"]
+
+    @get(operation_id="GetJob", path=urls.JOB_GET)
+    async def get_job(
+        self,
+        db_connection: Connection,
+        job_id: Annotated[
+            uuid.UUID, Parameter(title="Job ID", description="ID of the job to get.")
+        ],
+    ) -> Response[Job | str]:
+        """Retrieve a job, e.g. to follow its progress.
+
+        Parameters
+        ----------
+        job_id : UUID
+            ID of the job.
+
+        Returns
+        -------
+        Response[Job | str]
+            The job if found, else error.
+        """
+        selection: list[Record] = await db_connection.fetch(
+            f"""
+            SELECT {JOB_COLUMNS}
+            FROM jobs
+            WHERE id = $1;
+            """,  # noqa: S608
+            job_id,
+        )
+        if len(selection) == 0:
+            return Response(
+                "Job with id does not exist.", status_code=400, media_type=MediaType.JSON
+            )
+
+        return Response(job_from_record(selection[0]), status_code=200, media_type=MediaType.JSON)
+
+    @get(operation_id="ListJobs", path=urls.JOB_LIST)
+    async def list_jobs(
+        self,
+        db_connection: Connection,
+        limit: Annotated[
+            int,
+            Parameter(
+                title="Limit", description="Maximum amount of jobs to return.", ge=1, le=1000
+            ),
+        ] = 100,
+    ) -> Response[list[Job]]:
+        """Retrieve the most recently submitted jobs.
+
+        Parameters
+        ----------
+        limit : int
+            Maximum amount of jobs to return.
+
+        Returns
+        -------
+        Response[list[Job]]
+            List with the jobs, newest first.
+        """
+        selection: list[Record] = await db_connection.fetch(
+            f"""
+            SELECT {JOB_COLUMNS}
+            FROM jobs
+            ORDER BY created_at DESC
+            LIMIT $1;
+            """,  # noqa: S608
+            limit,
+        )
+
+        return Response(
+            [job_from_record(job) for job in selection],
+            status_code=200,
+            media_type=MediaType.JSON,
+        )
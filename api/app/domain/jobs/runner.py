@@ -0,0 +1,279 @@
+import asyncio
+import contextlib
+import datetime
+import json
+import logging
+import uuid
+from collections.abc import Awaitable, Callable, Mapping
+from typing import Any
+
+import asyncpg
+from asyncpg import Connection, Pool, Record
+from asyncpg.pool import PoolConnectionProxy
+
+from app.domain.jobs.schemas import Job, JobKind, JobStatus
+from app.utils.ids import uuid7
+
+__all__ = (
+    "JOB_COLUMNS",
+    "JobContext",
+    "JobHandler",
+    "JobRunner",
+    "job_from_record",
+)
+
+logger = logging.getLogger(__name__)
+
+JOB_COLUMNS = (
+    "id, kind, target_id, options::text, status, progress, total, error, created_at, updated_at"
+)
+
+
+def job_from_record(record: Record) -> Job:
+    """Create a job from a row selected with :data:`JOB_COLUMNS`.
+
+    Returns
+    -------
+    Job
+        The job.
+    """
+    return Job(
+        id=record[0],
+        kind=record[1],
+        target_id=record[2],
+        options=json.loads(record[3]),
+        status=record[4],
+        progress=record[5],
+        total=record[6],
+        error=record[7],
+        created_at=record[8],
+        updated_at=record[9],
+    )
+
+
+class JobContext:
+    """What a job handler gets to work with.
+
+    Handlers process their job in batches of at most ``batch_size`` rows, each
+    in its own short transaction that also records the progress. So a job never
+    holds locks for long, and a resumed job continues where it left off.
+
+    Parameters
+    ----------
+    job : Job
+        The job being run.
+    db_pool : Pool
+        Asyncpg database pool.
+    batch_size : int
+        Maximum amount of rows per batch.
+    """
+
+    def __init__(self, job: Job, db_pool: Pool, batch_size: int) -> None:
+        self.job: Job = job
+        self.db_pool: Pool = db_pool
+        self.batch_size: int = batch_size
+
+    async def set_total(self, db_connection: Connection | PoolConnectionProxy, total: int) -> None:
+        """Record the amount of rows the job has left to process.
+
+        Parameters
+        ----------
+        db_connection : Connection | PoolConnectionProxy
+            Asyncpg database connection.
+        total : int
+            Amount of rows left, the rows already processed are added to it.
+        """
+        await db_connection.execute(
+            "UPDATE jobs SET total = progress + $2, updated_at = NOW() WHERE id = $1;",
+            self.job.id,
+            total,
+        )
+
+    async def advance(self, db_connection: Connection | PoolConnectionProxy, amount: int) -> None:
+        """Record progress, in the same transaction as the batch that made it.
+
+        This also tells other workers the job is still alive.
+
+        Parameters
+        ----------
+        db_connection : Connection | PoolConnectionProxy
+            Asyncpg database connection.
+        amount : int
+            Amount of rows processed.
+        """
+        await db_connection.execute(
+            "UPDATE jobs SET progress = progress + $2, updated_at = NOW() WHERE id = $1;",
+            self.job.id,
+            amount,
+        )
+
+
+type JobHandler = Callable[[JobContext], Awaitable[None]]
+
+
+class JobRunner:
+    """Runs background jobs stored in postgres, one at a time per worker.
+
+    Jobs are claimed with ``FOR UPDATE SKIP LOCKED``, so every job runs on a single
+    worker. A running job that hasn't made progress within ``lease`` is considered
+    abandoned, e.g. by a worker that was restarted, and is resumed by any worker.
+    Handlers must therefore be safe to resume from any batch.
+
+    Parameters
+    ----------
+    handlers : Mapping[JobKind, JobHandler]
+        The handler running each kind of job.
+    batch_size : int
+        Maximum amount of rows a job processes per transaction.
+    poll_interval : float
+        Seconds between checks for jobs submitted by other workers.
+    lease : float
+        Seconds without progress after which a running job is resumed elsewhere.
+    """
+
+    def __init__(
+        self,
+        handlers: Mapping[JobKind, JobHandler],
+        batch_size: int = 1000,
+        poll_interval: float = 5.0,
+        lease: float = 60.0,
+    ) -> None:
+        self.handlers: Mapping[JobKind, JobHandler] = handlers
+        self.batch_size: int = batch_size
+        self.poll_interval: float = poll_interval
+        self.lease: float = lease
+        self.db_pool: Pool | None = None
+        """Pool to run jobs with, set once it has been created."""
+        self._wake: asyncio.Event = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    async def submit(
+        self,
+        db_connection: Connection | PoolConnectionProxy,
+        kind: JobKind,
+        target_id: uuid.UUID,
+        options: Mapping[str, Any] | None = None,
+    ) -> Job:
+        """Submit a job, or get the unfinished job of the same kind for the same target.
+
+        Parameters
+        ----------
+        db_connection : Connection | PoolConnectionProxy
+            Asyncpg database connection, the job starts once it's committed.
+        kind : JobKind
+            What the job does.
+        target_id : UUID
+            ID of the deck, tag, etc. the job operates on.
+        options : Mapping[str, Any] | None
+            Kind specific options.
+
+        Returns
+        -------
+        Job
+            The job.
+        """
+        selection: list[Record] = await db_connection.fetch(
+            f"""
+            INSERT INTO jobs (id, kind, target_id, options)
+            VALUES ($1, $2, $3, $4::jsonb)
+            ON CONFLICT (kind, target_id) WHERE status IN ('pending', 'running') DO NOTHING
+            RETURNING {JOB_COLUMNS};
+            """,  # noqa: S608
+            uuid7(),
+            kind,
+            target_id,
+            json.dumps(options or {}),
+        )
+        if len(selection) == 0:
+            selection = await db_connection.fetch(
+                f"""
+                SELECT {JOB_COLUMNS}
+                FROM jobs
+                WHERE kind = $1 AND target_id = $2 AND status IN ('pending', 'running');
+                """,  # noqa: S608
+                kind,
+                target_id,
+            )
+
+        self._wake.set()
+        return job_from_record(selection[0])
+
+    def start(self) -> None:
+        """Start running jobs in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop running jobs, an interrupted job is resumed after its lease expires."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            db_pool = self.db_pool
+            job = None
+            if db_pool is not None:
+                try:
+                    job = await self._claim(db_pool)
+                except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                    logger.warning("Could not claim a job.", exc_info=True)
+
+            if db_pool is None or job is None:
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                continue
+
+            await self._execute(db_pool, job)
+
+    async def _claim(self, db_pool: Pool) -> Job | None:
+        async with db_pool.acquire() as db_connection:
+            selection: list[Record] = await db_connection.fetch(
+                f"""
+                UPDATE jobs
+                SET status = 'running', updated_at = NOW()
+                WHERE id = (
+                    SELECT id
+                    FROM jobs
+                    WHERE status = 'pending'
+                        OR (status = 'running' AND updated_at < NOW() - $1::interval)
+                    ORDER BY created_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING {JOB_COLUMNS};
+                """,  # noqa: S608
+                datetime.timedelta(seconds=self.lease),
+            )
+
+        return job_from_record(selection[0]) if len(selection) != 0 else None
+
+    async def _execute(self, db_pool: Pool, job: Job) -> None:
+        logger.info("Running %s job %s for %s.", job.kind, job.id, job.target_id)
+        try:
+            await self.handlers[job.kind](JobContext(job, db_pool, self.batch_size))
+        except (OSError, asyncpg.InterfaceError, asyncpg.PostgresConnectionError):
+            # Likely to succeed later, the job is resumed once its lease expires.
+            logger.warning("Job %s was interrupted.", job.id, exc_info=True)
+            return
+        except Exception as e:
+            logger.exception("Job %s failed.", job.id)
+            await self._finish(db_pool, job, "failed", str(e))
+            return
+
+        await self._finish(db_pool, job, "succeeded", None)
+
+    async def _finish(self, db_pool: Pool, job: Job, status: JobStatus, error: str | None) -> None:
+        try:
+            async with db_pool.acquire() as db_connection:
+                await db_connection.execute(
+                    "UPDATE jobs SET status = $2, error = $3, updated_at = NOW() WHERE id = $1;",
+                    job.id,
+                    status,
+                    error,
+                )
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            logger.warning("Could not finish job %s.", job.id, exc_info=True)
@@ -0,0 +1,53 @@
+from datetime import datetime
+from typing import Any, Literal
+from uuid import UUID
+
+from pydantic import BaseModel
+
+__all__ = (
+    "Job",
+    "JobKind",
+    "JobStatus",
+)
+
+type JobKind = Literal["delete_deck", "delete_tag"]
+type JobStatus = Literal["pending", "running", "succeeded", "failed"]
+
+
+class Job(BaseModel):
+    """Represents a background job.
+
+    Attributes
+    ----------
+    id : :class:`UUID`
+        ID of the job.
+    kind : :type:`JobKind`
+        What the job does.
+    target_id : :class:`UUID`
+        ID of the deck, tag, etc. the job operates on.
+    options : :class:`dict`
+        Kind specific options.
+    status : :type:`JobStatus`
+        Where the job is in its lifecycle.
+    progress : :class:`int`
+        Amount of rows processed so far.
+    total : :class:`int` | None
+        Amount of rows to process, ``None`` until the job has started.
+    error : :class:`str` | None
+        Why the job failed.
+    created_at : :class:`datetime`
+        When the job was submitted.
+    updated_at : :class:`datetime`
+        When the job last made progress.
+    """
+
+    id: UUID
+    kind: JobKind
+    target_id: UUID
+    options: dict[str, Any]
+    status: JobStatus
+    progress: int
+    total: int | None
+    error: str | None
+    created_at: datetime
+    updated_at: datetime
@@ -0,0 +1,2 @@
+JOB_LIST = "/api/jobs"
+JOB_GET = "/api/jobs/{job_id:uuid}"
@@ -1,3 +1,3 @@
-from app.domain.system.controllers.system_controller import SystemController
+from app.domain.system.controllers.system_controller import LivenessController, SystemController
 
-__all__ = ("SystemController",)
+__all__ = ("LivenessController", "SystemController")
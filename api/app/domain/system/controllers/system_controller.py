@@ -1,16 +1,43 @@
-from collections.abc import Sequence
+from collections.abc import Mapping, Sequence
+from typing import Any
 
-from asyncpg import Connection
-from litestar import Controller, MediaType, Request, Response, get
+from litestar import Controller, MediaType, Response, get
 
 from app.domain.system import urls
-from app.domain.system.schemas import HealthStatus, SystemHealth
+from app.domain.system.health import HealthMonitor
+from app.domain.system.schemas import HealthSnapshot, SystemHealth
+from app.middleware.admission import ROUTE_CLASS_OPT_KEY
+
+
+class LivenessController(Controller):
+    """Controller for the liveness probe, served with every storage backend."""
+
+    tags: Sequence[str] | None = ["System"]
+    # Health checks must keep working when the service is overloaded.
+    opt: Mapping[str, Any] | None = {ROUTE_CLASS_OPT_KEY: "exempt"}
+
+    @get(
+        operation_id="SystemLiveness",
+        name="system:liveness",
+        path=urls.SYSTEM_LIVENESS,
+        summary="Liveness check.",
+        description="Checks whether the process is up, without checking any dependencies.",
+        status_code=204,
+    )
+    async def system_liveness(self) -> None:
+        """Check whether the process is up, without checking any dependencies."""
 
 
 class SystemController(Controller):
-    """Controller for the system health endpoint."""
+    """Controller for the system health endpoints that check the database.
+
+    Health is checked in the background by the :class:`HealthMonitor`, so probes
+    don't use database connections and are cheap to call often.
+    """
 
     tags: Sequence[str] | None = ["System"]
+    # Health checks must keep working when the service is overloaded.
+    opt: Mapping[str, Any] | None = {ROUTE_CLASS_OPT_KEY: "exempt"}
 
     @get(
         operation_id="SystemHealth",
@@ -19,9 +46,7 @@ class SystemController(Controller):
         summary="Health check.",
         description="Checks whether backend services (database) are online.",
     )
-    async def system_health(
-        self, request: Request, db_connection: Connection
-    ) -> Response[SystemHealth]:
+    async def system_health(self, health_monitor: HealthMonitor) -> Response[SystemHealth]:
         """Check whether backend services (database) are online.
 
         Returns
@@ -29,15 +54,33 @@ async def system_health(
         Response[SystemHealth]
             Schema containing information about system health.
         """
-        db_ping_success = False
-        try:
-            await db_connection.fetch("SELECT 1;")
-            db_ping_success = True
-        except ConnectionRefusedError:
-            pass
+        return Response(
+            SystemHealth(database_status=health_monitor.snapshot.database_status),
+            status_code=200,
+            media_type=MediaType.JSON,
+        )
 
-        db_status: HealthStatus = "online" if db_ping_success else "offline"
+    @get(
+        operation_id="SystemReadiness",
+        name="system:readiness",
+        path=urls.SYSTEM_READINESS,
+        summary="Readiness check.",
+        description=(
+            "Checks whether the service can handle requests, responds with a 503 if not. "
+            "Includes database latency, pool utilisation and event loop lag, as of the last "
+            "background check."
+        ),
+    )
+    async def system_readiness(self, health_monitor: HealthMonitor) -> Response[HealthSnapshot]:
+        """Check whether the service can handle requests.
 
+        Returns
+        -------
+        Response[HealthSnapshot]
+            Detailed system health, with a 503 status if the service isn't ready.
+        """
         return Response(
-            SystemHealth(database_status=db_status), status_code=200, media_type=MediaType.JSON
+            health_monitor.snapshot,
+            status_code=200 if health_monitor.is_ready() else 503,
+            media_type=MediaType.JSON,
         )
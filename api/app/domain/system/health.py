@@ -0,0 +1,131 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+import time
+
+import asyncpg
+from asyncpg import Connection, Pool
+
+from app.domain.system.schemas import HealthSnapshot
+
+__all__ = ("HealthMonitor",)
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """Checks system health in the background, so health probes cost no I/O.
+
+    The database is pinged over a dedicated connection rather than the pool, so
+    checks never compete with requests for pool connections, nor queue behind them.
+
+    Parameters
+    ----------
+    dsn : str
+        Postgres dsn for the dedicated connection.
+    interval : float
+        Seconds between checks.
+    timeout : float
+        Seconds before a database ping is considered failed.
+    """
+
+    def __init__(self, dsn: str, interval: float = 5.0, timeout: float = 2.0) -> None:
+        self.dsn: str = dsn
+        self.interval: float = interval
+        self.timeout: float = timeout
+        self.db_pool: Pool | None = None
+        """Pool to report the utilisation of, set once it has been created."""
+        self._connection: Connection | None = None
+        self._event_loop_lag: float = 0.0
+        self._task: asyncio.Task[None] | None = None
+        self._snapshot: HealthSnapshot = HealthSnapshot(
+            database_status="offline",
+            database_latency_ms=None,
+            pool_size=0,
+            pool_in_use=0,
+            pool_max_size=0,
+            event_loop_lag_ms=0.0,
+            checked_at=datetime.datetime.now(datetime.UTC),
+        )
+
+    @property
+    def snapshot(self) -> HealthSnapshot:
+        """Health as of the last check."""
+        return self._snapshot
+
+    def is_ready(self) -> bool:
+        """Whether the service can handle requests.
+
+        Returns
+        -------
+        bool
+            Whether the database was online at the last check, and checks are still
+            running on schedule.
+        """
+        age = datetime.datetime.now(datetime.UTC) - self._snapshot.checked_at
+        return (
+            self._snapshot.database_status == "online"
+            and age.total_seconds() < 3 * self.interval + self.timeout
+        )
+
+    async def refresh(self) -> None:
+        """Run a check and update the snapshot."""
+        latency = await self._ping_database()
+
+        pool_size = pool_in_use = pool_max_size = 0
+        if self.db_pool is not None:
+            pool_size = self.db_pool.get_size()
+            pool_in_use = pool_size - self.db_pool.get_idle_size()
+            pool_max_size = self.db_pool.get_max_size()
+
+        self._snapshot = HealthSnapshot(
+            database_status="offline" if latency is None else "online",
+            database_latency_ms=None if latency is None else latency * 1000,
+            pool_size=pool_size,
+            pool_in_use=pool_in_use,
+            pool_max_size=pool_max_size,
+            event_loop_lag_ms=self._event_loop_lag * 1000,
+            checked_at=datetime.datetime.now(datetime.UTC),
+        )
+
+    async def _ping_database(self) -> float | None:
+        try:
+            if self._connection is None or self._connection.is_closed():
+                self._connection = await asyncpg.connect(self.dsn, timeout=self.timeout)
+            started = time.perf_counter()
+            await self._connection.fetchval("SELECT 1;", timeout=self.timeout)
+            return time.perf_counter() - started
+        except (OSError, TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            logger.warning("Database health check failed.", exc_info=True)
+            if self._connection is not None:
+                # Don't wait on a connection that may be hanging, just drop it.
+                self._connection.terminate()
+                self._connection = None
+            return None
+
+    async def start(self) -> None:
+        """Run a first check and keep checking in the background."""
+        if self._task is None:
+            await self.refresh()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop checking."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            # The sleep can only overshoot when the loop is too busy to wake us up.
+            self._event_loop_lag = max(0.0, loop.time() - started - self.interval)
+            await self.refresh()
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Literal
 
 from pydantic import BaseModel
@@ -5,6 +6,7 @@
 from app import __version__
 
 __all__ = (
+    "HealthSnapshot",
     "HealthStatus",
     "SystemHealth",
 )
@@ -25,3 +27,36 @@ class SystemHealth(BaseModel):
 
     database_status: HealthStatus
     version: str = __version__
+
+
+class HealthSnapshot(BaseModel):
+    """Detailed system health, as of the last background check.
+
+    Attributes
+    ----------
+    database_status : :type:`HealthStatus`
+        Whether the database is online or offline.
+    database_latency_ms : :class:`float` | None
+        Round-trip time of a database query, ``None`` if the database is offline.
+    pool_size : :class:`int`
+        Amount of connections currently in the database pool.
+    pool_in_use : :class:`int`
+        Amount of pool connections currently acquired by requests.
+    pool_max_size : :class:`int`
+        Maximum amount of connections in the database pool.
+    event_loop_lag_ms : :class:`float`
+        How late the event loop ran the last check, high values mean it is blocked or overloaded.
+    checked_at : :class:`datetime`
+        When the check ran.
+    version : :class:`str`
+        Version of the application.
+    """
+
+    database_status: HealthStatus
+    database_latency_ms: float | None
+    pool_size: int
+    pool_in_use: int
+    pool_max_size: int
+    event_loop_lag_ms: float
+    checked_at: datetime
+    version: str = __version__
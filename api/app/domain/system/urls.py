@@ -1 +1,3 @@
 SYSTEM_HEALTH: str = "/health"
+SYSTEM_LIVENESS: str = "/health/live"
+SYSTEM_READINESS: str = "/health/ready"
@@ -4,3 +4,51 @@ class DeckNotFoundError(Exception):
 
 class TagNotFoundError(Exception):
     """Raised when a tag isn't found in the database."""
+
+
+class CardNotFoundError(Exception):
+    """Raised when a card isn't found in the database."""
+
+
+class AlreadyExistsError(Exception):
+    """Raised when creating something unique that already exists, e.g. a deck name."""
+
+
+class BatchOperationError(Exception):
+    """Raised when an operation of a batch fails, none of the batch is applied then.
+
+    Attributes
+    ----------
+    index : :class:`int`
+        Position of the failed operation in the batch.
+    """
+
+    def __init__(self, msg: str, index: int) -> None:
+        super().__init__(msg)
+        self.index: int = index
+
+
+class ServiceOverloadedError(Exception):
+    """Raised when a request is shed because the service is overloaded.
+
+    Attributes
+    ----------
+    retry_after : :class:`int`
+        Seconds after which the client may retry.
+    """
+
+    def __init__(self, msg: str, retry_after: int = 1) -> None:
+        super().__init__(msg)
+        self.retry_after: int = retry_after
+
+
+class MediaTooLargeError(Exception):
+    """Raised when an uploaded media file exceeds the maximum size."""
+
+
+class SyncTokenExpiredError(Exception):
+    """Raised when changes since a sync token have been purged, the client has to resync."""
+
+
+class MigrationError(Exception):
+    """Raised when the database can't be migrated, e.g. an applied migration was edited."""
@@ -0,0 +1,168 @@
+import asyncio
+import contextlib
+import math
+import time
+from collections.abc import AsyncGenerator, Mapping
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Literal, override
+
+from litestar.middleware import MiddlewareProtocol
+from litestar.types import ASGIApp, HTTPScope, Receive, Scope, Send
+
+from app.errors import ServiceOverloadedError
+
+if TYPE_CHECKING:
+    from asyncpg import Pool
+
+__all__ = (
+    "AdmissionController",
+    "AdmissionMiddleware",
+    "RouteClass",
+)
+
+type RouteClass = Literal["read", "list", "write", "exempt"]
+
+ROUTE_CLASS_OPT_KEY = "route_class"
+"""Key in a route handler's ``opt`` to override the route class it is admitted as."""
+
+
+@dataclass(slots=True)
+class _RouteClassState:
+    semaphore: asyncio.Semaphore
+    queued: int = 0
+    wait_ewma: float = 0.0
+
+
+class AdmissionController:
+    """Caps in-flight requests per route class and sheds excess load early.
+
+    Requests of a class at its cap briefly queue for a slot. They are shed with a
+    503 straight away when queueing would only add latency: the database pool is
+    saturated, or recent requests of the class already waited longer than
+    ``target_wait``. Health checks and streams are ``exempt`` and always admitted.
+
+    Parameters
+    ----------
+    limits : Mapping[RouteClass, int]
+        Maximum amount of in-flight requests per route class.
+    max_queue_wait : float
+        Maximum seconds a request waits for a slot before it is shed.
+    target_wait : float
+        Seconds of recent average queueing above which requests are shed immediately.
+    """
+
+    def __init__(
+        self,
+        limits: Mapping[RouteClass, int],
+        max_queue_wait: float = 0.5,
+        target_wait: float = 0.1,
+    ) -> None:
+        self.max_queue_wait: float = max_queue_wait
+        self.target_wait: float = target_wait
+        self.db_pool: Pool | None = None
+        """Pool to watch for saturation, set once it has been created."""
+        self._route_classes: dict[RouteClass, _RouteClassState] = {
+            route_class: _RouteClassState(asyncio.Semaphore(limit))
+            for route_class, limit in limits.items()
+        }
+
+    def _pool_saturated(self) -> bool:
+        if self.db_pool is None:
+            return False
+        return (
+            self.db_pool.get_idle_size() == 0
+            and self.db_pool.get_size() >= self.db_pool.get_max_size()
+        )
+
+    @contextlib.asynccontextmanager
+    async def admit(self, route_class: RouteClass) -> AsyncGenerator[None]:
+        """Hold a slot of the route class for as long as the context is entered.
+
+        Parameters
+        ----------
+        route_class : RouteClass
+            Route class of the request.
+
+        Yields
+        ------
+        None
+            Once the request is admitted.
+
+        Raises
+        ------
+        ServiceOverloadedError
+            If the request is shed.
+        """
+        state = self._route_classes.get(route_class)
+        if state is None:
+            yield
+            return
+
+        msg = "The service is overloaded, try again later."
+        if state.semaphore.locked():
+            if self._pool_saturated() or state.wait_ewma > self.target_wait:
+                raise ServiceOverloadedError(msg, retry_after=self._retry_after(state))
+
+            started = time.perf_counter()
+            state.queued += 1
+            try:
+                await asyncio.wait_for(state.semaphore.acquire(), self.max_queue_wait)
+            except TimeoutError:
+                self._record_wait(state, self.max_queue_wait)
+                raise ServiceOverloadedError(msg, retry_after=self._retry_after(state)) from None
+            finally:
+                state.queued -= 1
+            self._record_wait(state, time.perf_counter() - started)
+        else:
+            await state.semaphore.acquire()
+            self._record_wait(state, 0.0)
+
+        try:
+            yield
+        finally:
+            state.semaphore.release()
+
+    @staticmethod
+    def _record_wait(state: _RouteClassState, wait: float) -> None:
+        state.wait_ewma += 0.1 * (wait - state.wait_ewma)
+
+    def _retry_after(self, state: _RouteClassState) -> int:
+        # Roughly how long it takes the queue in front of the client to drain.
+        return max(1, math.ceil(state.wait_ewma + state.queued * self.target_wait))
+
+
+def route_class_of(scope: HTTPScope) -> RouteClass:
+    """Classify a request, by its handler's ``route_class`` opt or else its method.
+
+    Reads of a single resource are ``read``, other reads are ``list`` and
+    everything else is ``write``.
+
+    Returns
+    -------
+    RouteClass
+        Route class of the request.
+    """
+    route_class: RouteClass | None = scope["route_handler"].opt.get(ROUTE_CLASS_OPT_KEY)
+    if route_class is not None:
+        return route_class
+    if scope["method"] in {"GET", "HEAD"}:
+        return "read" if scope["path_params"] else "list"
+    return "write"
+
+
+class AdmissionMiddleware(MiddlewareProtocol):
+    """Admits http requests through an :class:`AdmissionController`."""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController) -> None:
+        self.app: ASGIApp = app
+        self.controller: AdmissionController = controller
+
+    @override
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Admit the request, or shed it with a 503."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async with self.controller.admit(route_class_of(scope)):
+            await self.app(scope, receive, send)
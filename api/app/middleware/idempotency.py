@@ -0,0 +1,462 @@
+import asyncio
+import contextlib
+import datetime
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Literal, override
+
+from asyncpg import Connection, Pool, Record
+from asyncpg.pool import PoolConnectionProxy
+from litestar.datastructures import Headers
+from litestar.middleware import MiddlewareProtocol
+from litestar.types import (
+    ASGIApp,
+    HTTPResponseStartEvent,
+    HTTPScope,
+    Message,
+    Receive,
+    ReceiveMessage,
+    Scope,
+    Send,
+)
+
+from app.database.purge import Purger
+
+__all__ = (
+    "IDEMPOTENT_OPT_KEY",
+    "IdempotencyMiddleware",
+    "IdempotencyStore",
+)
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_OPT_KEY = "idempotent"
+"""Key in a route handler's ``opt`` to enable ``Idempotency-Key`` support."""
+
+MAX_KEY_LENGTH = 255
+
+
+@dataclass(frozen=True, slots=True)
+class StoredResponse:
+    """A response stored for retries of its request.
+
+    Attributes
+    ----------
+    status_code : :class:`int`
+        Http status code of the response.
+    headers : :class:`list` [:class:`tuple` [:class:`bytes`, :class:`bytes`]]
+        Raw headers of the response.
+    body : :class:`bytes`
+        Body of the response.
+    """
+
+    status_code: int
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+
+
+@dataclass(frozen=True, slots=True)
+class _CachedResponse:
+    request_hash: str
+    response: StoredResponse
+    expires_at: float
+
+
+type Reservation = Literal["reserved", "in_progress", "mismatch"] | StoredResponse
+
+
+def _dump_headers(headers: list[tuple[bytes, bytes]]) -> str:
+    return json.dumps([
+        [name.decode("latin-1"), value.decode("latin-1")] for name, value in headers
+    ])
+
+
+def _load_headers(headers: str) -> list[tuple[bytes, bytes]]:
+    return [
+        (name.encode("latin-1"), value.encode("latin-1")) for name, value in json.loads(headers)
+    ]
+
+
+class IdempotencyStore(Purger):
+    """Remembers responses by idempotency key, so retried requests aren't run twice.
+
+    Responses are kept in postgres, which is shared by all workers, fronted by a
+    bounded in-process LRU cache. Before a request runs its key is reserved in
+    postgres, so concurrent retries on other workers don't run it either. Expired
+    keys are purged in the background.
+
+    Parameters
+    ----------
+    ttl : float
+        Seconds a response is remembered.
+    max_entries : int
+        Maximum amount of responses cached in-process.
+    lock_timeout : float
+        Seconds after which a reservation of a request that never completed,
+        e.g. because its worker died, may be taken over.
+    """
+
+    purged: str = "expired idempotency keys"
+
+    def __init__(
+        self, ttl: float = 24 * 60 * 60, max_entries: int = 10_000, lock_timeout: float = 30.0
+    ) -> None:
+        super().__init__(interval=lock_timeout)
+        self.ttl: float = ttl
+        self.max_entries: int = max_entries
+        self.lock_timeout: float = lock_timeout
+        self._cache: OrderedDict[tuple[str, str], _CachedResponse] = OrderedDict()
+
+    def _cached(self, operation: str, key: str) -> _CachedResponse | None:
+        stored = self._cache.get((operation, key))
+        if stored is None:
+            return None
+        if stored.expires_at < time.monotonic():
+            del self._cache[operation, key]
+            return None
+        self._cache.move_to_end((operation, key))
+        return stored
+
+    def _cache_response(
+        self, operation: str, key: str, request_hash: str, response: StoredResponse
+    ) -> None:
+        self._cache[operation, key] = _CachedResponse(
+            request_hash, response, time.monotonic() + self.ttl
+        )
+        self._cache.move_to_end((operation, key))
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def reserve(
+        self, db_pool: Pool, operation: str, key: str, request_hash: str
+    ) -> Reservation:
+        """Reserve a key for a request about to run, unless it already ran.
+
+        Parameters
+        ----------
+        db_pool : Pool
+            Asyncpg database pool.
+        operation : str
+            The operation the key is used for, keys are unique per operation.
+        key : str
+            The idempotency key.
+        request_hash : str
+            Hash of the request, the same key may only be reused for the same request.
+
+        Returns
+        -------
+        Reservation
+            ``"reserved"`` if the request should run, the stored response if it
+            already ran, ``"in_progress"`` if it's running elsewhere or ``"mismatch"``
+            if the key was used for a different request.
+        """
+        stored = self._cached(operation, key)
+        if stored is not None:
+            return stored.response if stored.request_hash == request_hash else "mismatch"
+
+        async with db_pool.acquire() as db_connection:
+            reserved: list[Record] = await db_connection.fetch(
+                """
+                INSERT INTO idempotency_keys (operation, key, request_hash, expires_at)
+                VALUES ($1, $2, $3, NOW() + $4::interval)
+                ON CONFLICT (operation, key) DO UPDATE
+                SET
+                    request_hash = EXCLUDED.request_hash,
+                    status_code = NULL,
+                    headers = NULL,
+                    body = NULL,
+                    expires_at = EXCLUDED.expires_at
+                WHERE idempotency_keys.expires_at < NOW()
+                RETURNING 1;
+                """,
+                operation,
+                key,
+                request_hash,
+                datetime.timedelta(seconds=self.lock_timeout),
+            )
+            if len(reserved) != 0:
+                return "reserved"
+
+            selection: list[Record] = await db_connection.fetch(
+                """
+                SELECT request_hash, status_code, headers, body
+                FROM idempotency_keys
+                WHERE operation = $1 AND key = $2;
+                """,
+                operation,
+                key,
+            )
+
+        if len(selection) == 0:
+            # Expired and purged in between, rare enough to just have the client retry.
+            return "in_progress"
+
+        stored_hash, status_code, headers, body = selection[0]
+        if stored_hash != request_hash:
+            return "mismatch"
+        if status_code is None:
+            return "in_progress"
+
+        response = StoredResponse(status_code, _load_headers(headers), body)
+        self._cache_response(operation, key, request_hash, response)
+        return response
+
+    async def complete(
+        self,
+        db_pool: Pool,
+        operation: str,
+        key: str,
+        request_hash: str,
+        response: StoredResponse,
+    ) -> None:
+        """Store the response of a request that ran under a reserved key.
+
+        Parameters
+        ----------
+        db_pool : Pool
+            Asyncpg database pool.
+        operation : str
+            The operation the key is used for.
+        key : str
+            The idempotency key.
+        request_hash : str
+            Hash of the request.
+        response : StoredResponse
+            The response to return for retries.
+        """
+        self._cache_response(operation, key, request_hash, response)
+        async with db_pool.acquire() as db_connection:
+            await db_connection.execute(
+                """
+                UPDATE idempotency_keys
+                SET status_code = $4, headers = $5, body = $6, expires_at = NOW() + $7::interval
+                WHERE operation = $1 AND key = $2 AND request_hash = $3;
+                """,
+                operation,
+                key,
+                request_hash,
+                response.status_code,
+                _dump_headers(response.headers),
+                response.body,
+                datetime.timedelta(seconds=self.ttl),
+            )
+
+    async def release(self, db_pool: Pool, operation: str, key: str, request_hash: str) -> None:
+        """Release a reserved key without storing a response, so the request can be retried.
+
+        Parameters
+        ----------
+        db_pool : Pool
+            Asyncpg database pool.
+        operation : str
+            The operation the key is used for.
+        key : str
+            The idempotency key.
+        request_hash : str
+            Hash of the request.
+        """
+        async with db_pool.acquire() as db_connection:
+            await db_connection.execute(
+                """
+                DELETE FROM idempotency_keys
+                WHERE operation = $1 AND key = $2 AND request_hash = $3 AND status_code IS NULL;
+                """,
+                operation,
+                key,
+                request_hash,
+            )
+
+    @override
+    async def purge(self, db_connection: Connection | PoolConnectionProxy) -> int:
+        # Keys expire by the thousands a day, in batches they don't hold up the
+        # reservations of new requests.
+        purged: int = await db_connection.fetchval(
+            """
+            WITH purged AS (
+                DELETE FROM idempotency_keys
+                WHERE ctid IN (
+                    SELECT ctid
+                    FROM idempotency_keys
+                    WHERE expires_at < NOW()
+                    LIMIT $1
+                )
+                RETURNING 1
+            )
+            SELECT count(*) FROM purged;
+            """,
+            self.batch_size,
+        )
+        return purged
+
+
+class IdempotencyMiddleware(MiddlewareProtocol):
+    """Answers retried requests with the stored response, by ``Idempotency-Key`` header.
+
+    Only applies to route handlers with the ``idempotent`` opt. Responses with a
+    5xx status aren't stored, the request may then be retried with the same key.
+    A request that is cancelled still runs to completion, so its response is
+    stored. Without a response, e.g. if its worker died, the key stays reserved
+    until the lock timeout.
+    """
+
+    def __init__(self, app: ASGIApp, store: IdempotencyStore) -> None:
+        self.app: ASGIApp = app
+        self.store: IdempotencyStore = store
+
+    @override
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Run the request once per idempotency key, replaying the response for retries.
+
+        Raises
+        ------
+        CancelledError
+            If the request is cancelled, once the handler has completed.
+        """
+        db_pool = self.store.db_pool
+        if (
+            scope["type"] != "http"
+            or db_pool is None
+            or not scope["route_handler"].opt.get(IDEMPOTENT_OPT_KEY, False)
+        ):
+            await self.app(scope, receive, send)
+            return
+        key = Headers.from_scope(scope).get("idempotency-key")
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        if len(key) > MAX_KEY_LENGTH:
+            await _send_json(send, b'"Idempotency key is too long."', 400)
+            return
+
+        body, receive = await _read_body(receive)
+        operation = str(scope["route_handler"].operation_id)
+        request_hash = _request_hash(scope, body)
+
+        reservation = await self.store.reserve(db_pool, operation, key, request_hash)
+        match reservation:
+            case StoredResponse():
+                await _send_stored(send, reservation)
+                return
+            case "in_progress":
+                await _send_json(
+                    send, b'"A request with this idempotency key is in progress."', 409
+                )
+                return
+            case "mismatch":
+                await _send_json(send, b'"Idempotency key was used for a different request."', 422)
+                return
+            case "reserved":
+                pass
+
+        response_start: HTTPResponseStartEvent | None = None
+        chunks: list[bytes] = []
+        cancelled = False
+
+        async def capture(message: Message) -> None:
+            nonlocal response_start
+            if message["type"] == "http.response.start":
+                response_start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            # Once cancelled there's no one to send to, the response is only stored.
+            if not cancelled:
+                await send(message)
+
+        # The handler may have committed by the time the request is cancelled, so
+        # it isn't cancelled with it, and its response is stored for retries.
+        handler = asyncio.ensure_future(self.app(scope, receive, capture))
+        try:
+            await asyncio.shield(handler)
+        except asyncio.CancelledError:
+            cancelled = True
+            with contextlib.suppress(Exception):
+                await handler
+            raise
+        finally:
+            if response_start is None and not handler.done():
+                # Cancelled again while waiting, whether the request did anything is
+                # unknown, so the key stays reserved until the lock timeout.
+                pass
+            elif response_start is not None and response_start["status"] < 500:  # noqa: PLR2004
+                await self.store.complete(
+                    db_pool,
+                    operation,
+                    key,
+                    request_hash,
+                    StoredResponse(
+                        response_start["status"],
+                        list(response_start.get("headers", [])),
+                        b"".join(chunks),
+                    ),
+                )
+            else:
+                await self.store.release(db_pool, operation, key, request_hash)
+
+
+def _request_hash(scope: HTTPScope, body: bytes) -> str:
+    """Fingerprint a request, by its method, path, query string and body.
+
+    Returns
+    -------
+    str
+        Hex sha256 of the request.
+    """
+    return hashlib.sha256(
+        b"\0".join((scope["method"].encode(), scope["path"].encode(), scope["query_string"], body))
+    ).hexdigest()
+
+
+async def _read_body(receive: Receive) -> tuple[bytes, Receive]:
+    """Read the whole request body, returning it and a receive that replays it.
+
+    Returns
+    -------
+    tuple[bytes, Receive]
+        The body and the replaying receive.
+    """
+    chunks: list[bytes] = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    body = b"".join(chunks)
+
+    replayed = False
+
+    async def replay() -> ReceiveMessage:
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return body, replay
+
+
+async def _send_stored(send: Send, response: StoredResponse) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": response.status_code,
+        "headers": [*response.headers, (b"idempotent-replayed", b"true")],
+    })
+    await send({"type": "http.response.body", "body": response.body, "more_body": False})
+
+
+async def _send_json(send: Send, body: bytes, status_code: int) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body, "more_body": False})
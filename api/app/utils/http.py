@@ -0,0 +1,107 @@
+import re
+
+__all__ = (
+    "accepts_encoding",
+    "etag_matches",
+    "parse_byte_range",
+)
+
+_BYTE_RANGE = re.compile(r"bytes=(\d*)-(\d*)", re.IGNORECASE)
+
+
+def parse_byte_range(header: str, size: int) -> tuple[int, int] | None:
+    """Parse a ``Range`` header into the byte range to send.
+
+    Only single ranges are supported, for anything else the whole content
+    should be sent, which is allowed by RFC 9110.
+
+    Parameters
+    ----------
+    header : str
+        Value of the ``Range`` header.
+    size : int
+        Size of the content in bytes.
+
+    Returns
+    -------
+    tuple[int, int] | None
+        First and last byte of the range, inclusive, or ``None`` to send the whole content.
+
+    Raises
+    ------
+    ValueError
+        If the range can't be satisfied, which should be answered with a 416.
+    """
+    match = _BYTE_RANGE.fullmatch(header.strip())
+    if match is None or not any(match.groups()):
+        return None
+    first, last = match.groups()
+
+    if not first:
+        # A suffix range, the last n bytes.
+        length = int(last)
+        if length == 0 or size == 0:
+            msg = "Range not satisfiable."
+            raise ValueError(msg)
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        msg = "Range not satisfiable."
+        raise ValueError(msg)
+    if start > end:
+        return None
+    return start, end
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """Check whether an ``If-None-Match`` header matches an etag, using weak comparison.
+
+    Parameters
+    ----------
+    header : str
+        Value of the header, a comma separated list of etags or ``*``.
+    etag : str
+        The quoted etag of the current content.
+
+    Returns
+    -------
+    bool
+        Whether the header matches.
+    """
+    return any(
+        candidate.strip().removeprefix("W/") in {"*", etag} for candidate in header.split(",")
+    )
+
+
+def accepts_encoding(header: str, encoding: str) -> bool:
+    """Check whether an ``Accept-Encoding`` header allows a content coding.
+
+    Parameters
+    ----------
+    header : str
+        Value of the header, a comma separated list of codings with optional weights.
+    encoding : str
+        The content coding, e.g. ``gzip``.
+
+    Returns
+    -------
+    bool
+        Whether the coding is acceptable, named or through ``*``, with a non-zero weight.
+    """
+    # An explicitly named coding takes precedence over the wildcard.
+    weights: dict[str, float] = {}
+    for candidate in header.split(","):
+        name, *params = (part.strip() for part in candidate.split(";"))
+        weight = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0
+        weights[name.lower()] = weight
+
+    return weights.get(encoding, weights.get("*", 0)) > 0
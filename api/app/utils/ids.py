@@ -0,0 +1,47 @@
+import os
+import threading
+import time
+import uuid
+
+__all__ = ("uuid7",)
+
+_lock = threading.Lock()
+_last_timestamp = 0
+_counter = 0
+
+_COUNTER_BITS = 12
+_MAX_COUNTER = (1 << _COUNTER_BITS) - 1
+
+
+def uuid7() -> uuid.UUID:
+    """Generate a time-ordered UUIDv7 (RFC 9562), used for all primary keys.
+
+    The first 48 bits are the unix time in milliseconds, so new keys are appended
+    at the end of B-tree indexes instead of scattered over them like UUIDv4 keys.
+    Keys generated within the same millisecond are ordered by a 12-bit counter in
+    ``rand_a``, followed by 62 random bits.
+
+    Returns
+    -------
+    UUID
+        The UUID.
+    """
+    global _last_timestamp, _counter  # noqa: PLW0603
+
+    with _lock:
+        timestamp = time.time_ns() // 1_000_000
+        if timestamp > _last_timestamp:
+            _last_timestamp = timestamp
+            # Start low in the counter range, leaving room to count up within the ms.
+            _counter = int.from_bytes(os.urandom(2)) & (_MAX_COUNTER >> 1)
+        elif _counter < _MAX_COUNTER:
+            # Same millisecond, or the clock went backwards: keep counting on the last one.
+            _counter += 1
+        else:
+            _last_timestamp += 1
+            _counter = 0
+        timestamp, counter = _last_timestamp, _counter
+
+    random = int.from_bytes(os.urandom(8)) & ((1 << 62) - 1)
+    value = (timestamp << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | random
+    return uuid.UUID(int=value)
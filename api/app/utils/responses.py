@@ -0,0 +1,54 @@
+from dataclasses import dataclass
+from typing import Any, Self
+
+from litestar import MediaType, Response
+from pydantic_core import to_json
+
+__all__ = ("SerialisedResponse",)
+
+
+@dataclass(frozen=True, slots=True)
+class SerialisedResponse:
+    """A json response that has already been serialised.
+
+    These can be shared between requests, or stored, without serialising the
+    content again.
+
+    Attributes
+    ----------
+    content : :class:`bytes`
+        The serialised json body.
+    status_code : :class:`int`
+        Http status code of the response.
+    """
+
+    content: bytes
+    status_code: int = 200
+
+    @classmethod
+    def from_content(cls, content: Any, status_code: int = 200) -> Self:  # noqa: ANN401
+        """Serialise content into a response.
+
+        Parameters
+        ----------
+        content : Any
+            Anything pydantic can serialise to json, e.g. models, lists of models or strings.
+        status_code : int
+            Http status code of the response.
+
+        Returns
+        -------
+        Self
+            The serialised response.
+        """
+        return cls(to_json(content), status_code)
+
+    def to_response(self) -> Response[bytes]:
+        """Create a litestar response sending the serialised body as is.
+
+        Returns
+        -------
+        Response[bytes]
+            The response.
+        """
+        return Response(self.content, status_code=self.status_code, media_type=MediaType.JSON)
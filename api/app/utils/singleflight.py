@@ -0,0 +1,89 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+
+from app.errors import ServiceOverloadedError
+
+__all__ = ("SingleFlight",)
+
+
+@dataclass(slots=True)
+class _Flight[T]:
+    task: asyncio.Task[T]
+    waiters: int = 0
+
+
+class SingleFlight[T]:
+    """Coalesces concurrent calls with the same key into a single execution.
+
+    The first caller for a key starts the call, callers arriving while it is in
+    flight wait for and share its result. Once it completes the key is forgotten.
+    A caller can still join a call that started before a write, and get the data
+    from before it. Calling :meth:`invalidate` on writes stops later callers from
+    joining calls that are already in flight.
+
+    The call runs in its own task, so a caller going away (e.g. a client
+    disconnecting) doesn't cancel the call for everyone else.
+
+    Parameters
+    ----------
+    max_waiters : int
+        Maximum amount of callers sharing a single call.
+    timeout : float
+        Seconds a caller waits for the call to complete.
+    """
+
+    def __init__(self, max_waiters: int = 1000, timeout: float = 10.0) -> None:
+        self.max_waiters: int = max_waiters
+        self.timeout: float = timeout
+        self._flights: dict[Hashable, _Flight[T]] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """Run the call, or join the in-flight call with the same key.
+
+        Parameters
+        ----------
+        key : Hashable
+            Identifies calls that are interchangeable, e.g. operation id and parameters.
+        call : Callable[[], Awaitable[T]]
+            The call to run if none is in flight for this key.
+
+        Returns
+        -------
+        T
+            Result of the call.
+
+        Raises
+        ------
+        ServiceOverloadedError
+            If too many callers are already waiting on this key, or the call didn't
+            complete in time.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(call()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        elif flight.waiters >= self.max_waiters:
+            msg = "Too many requests waiting on the same data."
+            raise ServiceOverloadedError(msg)
+
+        flight.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.task), self.timeout)
+        except TimeoutError as e:
+            msg = "Timed out waiting on the data."
+            raise ServiceOverloadedError(msg) from e
+        finally:
+            flight.waiters -= 1
+
+    def invalidate(self) -> None:
+        """Make callers arriving from now on start new calls, e.g. after a write.
+
+        Calls in flight still complete for the callers already waiting on them.
+        """
+        self._flights.clear()
+
+    def _forget(self, key: Hashable, flight: _Flight[T]) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
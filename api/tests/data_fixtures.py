@@ -1,3 +1,5 @@
+from pathlib import Path
+
 import pytest
 from litestar import Litestar
 
@@ -7,5 +9,7 @@
 
 
 @pytest.fixture(name="app")
-def fx_app() -> Litestar:
+def fx_app(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Litestar:
+    monkeypatch.setenv("PASF_MEDIA_PATH", str(tmp_path / "media"))
+    monkeypatch.setenv("PASF_SNAPSHOT_PATH", str(tmp_path / "snapshots"))
     return create_app()
@@ -0,0 +1,176 @@
+import uuid
+from typing import TYPE_CHECKING
+
+import pytest
+from litestar import Litestar, Response
+from litestar.status_codes import HTTP_200_OK, HTTP_400_BAD_REQUEST
+from litestar.testing import AsyncTestClient
+
+from app.asgi import create_app
+from app.domain.cards import urls as cards_urls
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from httpx import Response
+
+
+pytestmark: pytest.MarkDecorator = pytest.mark.anyio
+
+
+async def test_apply_batch(client: AsyncTestClient[Litestar]) -> None:
+    response: Response = await client.post(
+        cards_urls.DECK_CREATE, json={"name": f"deck-{uuid.uuid4().hex[:16]}"}
+    )
+    deck_id: str = response.json()["id"]
+    response = await client.post(
+        cards_urls.TAG_CREATE, json={"name": f"tag-{uuid.uuid4().hex[:16]}"}
+    )
+    tag_id: str = response.json()["id"]
+    card_ids: list[str] = []
+    for name in ("a", "b"):
+        response = await client.post(
+            cards_urls.CARD_CREATE,
+            json={"name": name, "front_content": "front", "back_content": "back"},
+        )
+        card_ids.append(response.json()["id"])
+    await client.post(cards_urls.CARD_ADD_TAG, json={"card_id": card_ids[1], "tag_id": tag_id})
+
+    deck_name = f"renamed-{uuid.uuid4().hex[:16]}"
+    tag_name = f"renamed-{uuid.uuid4().hex[:16]}"
+    response = await client.post(
+        cards_urls.BATCH,
+        json={
+            "operations": [
+                {"op": "update_card", "card_id": card_ids[0], "name": "first"},
+                {"op": "update_card", "card_id": card_ids[1], "back_content": "edited"},
+                {"op": "update_card", "card_id": card_ids[0], "name": "second"},
+                {"op": "update_deck", "deck_id": deck_id, "name": deck_name},
+                {"op": "update_tag", "tag_id": tag_id, "name": tag_name},
+                {"op": "tag_card", "card_id": card_ids[0], "tag_id": tag_id},
+                {"op": "untag_card", "card_id": card_ids[1], "tag_id": tag_id},
+                {"op": "delete_card", "card_id": str(uuid.uuid4())},
+            ]
+        },
+    )
+    assert response.status_code == HTTP_200_OK
+    results = response.json()["results"]
+    assert [result["name"] for result in results[:3]] == ["first", "b", "second"]
+    assert results[1]["back_content"] == "edited"
+    assert results[3] == {"id": deck_id, "name": deck_name}
+    assert results[4] == {"id": tag_id, "name": tag_name}
+    assert results[5:] == [None, None, None]
+
+    response = await client.post(cards_urls.CARD_QUERY, json={"filter": {"tag": tag_name}})
+    assert [card["id"] for card in response.json()] == card_ids[:1]
+
+    # A failing operation rolls back the ones before it.
+    response = await client.post(
+        cards_urls.BATCH,
+        json={
+            "operations": [
+                {"op": "update_card", "card_id": card_ids[0], "name": "third"},
+                {"op": "delete_card", "card_id": card_ids[1]},
+                {"op": "tag_card", "card_id": card_ids[0], "tag_id": tag_id},
+            ]
+        },
+    )
+    assert response.status_code == HTTP_400_BAD_REQUEST
+    assert response.json() == {"index": 2, "error": "Card already has this tag."}
+    response = await client.get(
+        cards_urls.CARD_GET.replace("{card_id:uuid}", card_ids[0]), params={"fields": "name"}
+    )
+    assert response.json()["name"] == "second"
+    response = await client.get(cards_urls.CARD_GET.replace("{card_id:uuid}", card_ids[1]))
+    assert response.status_code == HTTP_200_OK
+
+
+@pytest.mark.parametrize("storage_backend", ["postgres", "memory"])
+async def test_apply_batch_in_order(
+    tmp_path: "Path", monkeypatch: pytest.MonkeyPatch, storage_backend: str
+) -> None:
+    monkeypatch.setenv("PASF_STORAGE_BACKEND", storage_backend)
+    monkeypatch.setenv("PASF_MEDIA_PATH", str(tmp_path / "media"))
+    monkeypatch.setenv("PASF_SNAPSHOT_PATH", str(tmp_path / "snapshots"))
+    async with AsyncTestClient(create_app()) as client:
+        x, y, z = (f"{name}-{uuid.uuid4().hex[:16]}" for name in "xyz")
+        response: Response = await client.post(cards_urls.TAG_CREATE, json={"name": x})
+        first_id: str = response.json()["id"]
+        response = await client.post(cards_urls.TAG_CREATE, json={"name": y})
+        second_id: str = response.json()["id"]
+
+        # A name freed by an earlier rename can be taken by a later one.
+        response = await client.post(
+            cards_urls.BATCH,
+            json={
+                "operations": [
+                    {"op": "update_tag", "tag_id": second_id, "name": z},
+                    {"op": "update_tag", "tag_id": first_id, "name": y},
+                ]
+            },
+        )
+        assert response.status_code == HTTP_200_OK
+        assert response.json()["results"] == [
+            {"id": second_id, "name": z},
+            {"id": first_id, "name": y},
+        ]
+
+        # But not before it's freed.
+        response = await client.post(
+            cards_urls.BATCH,
+            json={
+                "operations": [
+                    {"op": "update_tag", "tag_id": second_id, "name": y},
+                    {"op": "update_tag", "tag_id": first_id, "name": x},
+                ]
+            },
+        )
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert response.json()["index"] == 0
+
+        # Large batches are published as a reload of the changed decks.
+        response = await client.post(
+            cards_urls.DECK_CREATE, json={"name": f"deck-{uuid.uuid4().hex[:16]}"}
+        )
+        deck_id: str = response.json()["id"]
+        card_ids: list[str] = []
+        for _ in range(40):
+            response = await client.post(
+                cards_urls.CARD_CREATE,
+                json={"name": "card", "front_content": "front", "back_content": "back"},
+            )
+            card_ids.append(response.json()["id"])
+            await client.post(
+                cards_urls.DECK_ADD_CARD, json={"deck_id": deck_id, "card_id": card_ids[-1]}
+            )
+        response = await client.post(
+            cards_urls.BATCH,
+            json={
+                "operations": [
+                    {"op": "tag_card", "card_id": card_id, "tag_id": first_id}
+                    for card_id in card_ids
+                ]
+            },
+        )
+        assert response.status_code == HTTP_200_OK
+        response = await client.post(
+            cards_urls.BATCH,
+            json={
+                "operations": [
+                    *(
+                        {"op": "update_card", "card_id": card_id, "name": "renamed"}
+                        for card_id in card_ids
+                    ),
+                    *(
+                        {"op": "untag_card", "card_id": card_id, "tag_id": first_id}
+                        for card_id in card_ids[10:]
+                    ),
+                ]
+            },
+        )
+        assert response.status_code == HTTP_200_OK
+
+        response = await client.post(
+            cards_urls.CARD_QUERY, json={"filter": {"tag": y}, "limit": len(card_ids)}
+        )
+        assert sorted(card["id"] for card in response.json()) == sorted(card_ids[:10])
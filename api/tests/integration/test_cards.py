@@ -0,0 +1,148 @@
+import asyncio
+import uuid
+from typing import TYPE_CHECKING
+
+import pytest
+from litestar import Litestar, Response
+from litestar.status_codes import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_422_UNPROCESSABLE_ENTITY
+from litestar.testing import AsyncTestClient
+
+from app.domain.cards import urls as cards_urls
+
+if TYPE_CHECKING:
+    from httpx import Response
+
+
+pytestmark: pytest.MarkDecorator = pytest.mark.anyio
+
+
+async def test_query_cards_by_tags(client: AsyncTestClient[Litestar]) -> None:
+    tags: dict[str, str] = {}
+    for name in ("verbs", "chapter-3", "mastered"):
+        response: Response = await client.post(
+            cards_urls.TAG_CREATE, json={"name": f"{name}-{uuid.uuid4().hex[:16]}"}
+        )
+        tags[name] = response.json()["name"]
+        tags[f"{name}_id"] = response.json()["id"]
+
+    card_tags = [("verbs", "chapter-3"), ("verbs", "chapter-3", "mastered"), ("verbs",)]
+    card_ids: list[str] = []
+    for names in card_tags:
+        response = await client.post(
+            cards_urls.CARD_CREATE,
+            json={"name": "card", "front_content": "front", "back_content": "back"},
+        )
+        card_ids.append(response.json()["id"])
+        for name in names:
+            response = await client.post(
+                cards_urls.CARD_ADD_TAG,
+                json={"card_id": card_ids[-1], "tag_id": tags[f"{name}_id"]},
+            )
+            assert response.status_code == HTTP_200_OK
+
+    response = await client.post(
+        cards_urls.CARD_ADD_TAG, json={"card_id": card_ids[0], "tag_id": tags["verbs_id"]}
+    )
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+    response = await client.post(
+        cards_urls.CARD_QUERY,
+        json={
+            "filter": {
+                "and": [
+                    {"tag": tags["verbs"]},
+                    {"tag": tags["chapter-3"]},
+                    {"not": {"tag": tags["mastered"]}},
+                ]
+            }
+        },
+    )
+    assert response.status_code == HTTP_200_OK
+    assert [card["id"] for card in response.json()] == card_ids[:1]
+
+    response = await client.post(
+        cards_urls.CARD_QUERY,
+        json={"filter": {"or": [{"tag": tags["mastered"]}, {"tag": tags["chapter-3"]}]}},
+    )
+    assert sorted(card["id"] for card in response.json()) == sorted(card_ids[:2])
+
+    for card_id in card_ids:
+        await client.delete(cards_urls.CARD_DELETE.replace("{card_id:uuid}", card_id))
+    for name in ("verbs", "chapter-3", "mastered"):
+        await client.delete(cards_urls.TAG_DELETE.replace("{tag_id:uuid}", tags[f"{name}_id"]))
+
+
+async def test_tag_card_concurrently(client: AsyncTestClient[Litestar]) -> None:
+    response: Response = await client.post(
+        cards_urls.TAG_CREATE, json={"name": f"tag-{uuid.uuid4().hex[:16]}"}
+    )
+    tag_id: str = response.json()["id"]
+    response = await client.post(
+        cards_urls.CARD_CREATE, json={"name": "card", "front_content": "", "back_content": ""}
+    )
+    card_id: str = response.json()["id"]
+
+    # Only one of the concurrent requests can tag the card.
+    responses = await asyncio.gather(
+        *(
+            client.post(cards_urls.CARD_ADD_TAG, json={"card_id": card_id, "tag_id": tag_id})
+            for _ in range(8)
+        )
+    )
+    assert sorted(response.status_code for response in responses) == [
+        HTTP_200_OK,
+        *[HTTP_400_BAD_REQUEST] * (len(responses) - 1),
+    ]
+
+    await client.delete(cards_urls.CARD_DELETE.replace("{card_id:uuid}", card_id))
+    await client.delete(cards_urls.TAG_DELETE.replace("{tag_id:uuid}", tag_id))
+
+
+async def test_card_fields_and_preview(client: AsyncTestClient[Litestar]) -> None:
+    response: Response = await client.post(
+        cards_urls.CARD_CREATE,
+        json={"name": "card", "front_content": "front " * 100, "back_content": "back"},
+    )
+    card_id: str = response.json()["id"]
+    card_url = cards_urls.CARD_GET.replace("{card_id:uuid}", card_id)
+
+    response = await client.get(card_url, params={"fields": "front_content", "preview": 8})
+    assert response.status_code == HTTP_200_OK
+    assert response.json() == {"id": card_id, "front_content": "front fr"}
+
+    response = await client.get(cards_urls.CARD_LIST, params={"fields": "name"})
+    assert response.status_code == HTTP_200_OK
+    assert {"id": card_id, "name": "card"} in response.json()
+
+    response = await client.get(card_url, params={"fields": "name,secret"})
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+    await client.delete(cards_urls.CARD_DELETE.replace("{card_id:uuid}", card_id))
+
+
+async def test_create_card_idempotency(client: AsyncTestClient[Litestar]) -> None:
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    card = {"name": "card", "front_content": "front", "back_content": "back"}
+
+    first: Response = await client.post(cards_urls.CARD_CREATE, json=card, headers=headers)
+    retry: Response = await client.post(cards_urls.CARD_CREATE, json=card, headers=headers)
+    assert first.status_code == retry.status_code
+    assert first.json() == retry.json()
+    assert retry.headers["content-type"] == first.headers["content-type"]
+    assert retry.headers["idempotent-replayed"] == "true"
+
+    response: Response = await client.post(
+        cards_urls.CARD_CREATE, json={**card, "name": "other"}, headers=headers
+    )
+    assert response.status_code == HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = await client.post(
+        cards_urls.CARD_CREATE, json=card, params={"fields": "id"}, headers=headers
+    )
+    assert response.status_code == HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = await client.post(cards_urls.CARD_CREATE, json=card)
+    assert response.json()["id"] != first.json()["id"]
+
+    for card_id in (first.json()["id"], response.json()["id"]):
+        await client.delete(cards_urls.CARD_DELETE.replace("{card_id:uuid}", card_id))
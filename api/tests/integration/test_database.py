@@ -0,0 +1,26 @@
+import asyncpg
+import pytest
+
+from app.config import Settings
+from app.database.migrations import MigrationRunner, load_migrations
+from app.database.plans import HOT_PATH_QUERIES, check_plan
+
+pytestmark: pytest.MarkDecorator = pytest.mark.anyio
+
+
+async def test_migrate_and_check_plans() -> None:
+    settings = Settings.from_env()
+    db_connection = await asyncpg.connect(settings.database_dsn)
+    try:
+        runner = MigrationRunner(db_connection, load_migrations(settings.migrations_path))
+        await runner.migrate()
+        assert await runner.pending() == []
+        # Migrating an up to date database is a no-op.
+        assert await runner.migrate() == []
+
+        await db_connection.execute("VACUUM (ANALYZE);")
+        for query in HOT_PATH_QUERIES:
+            check = await check_plan(db_connection, query)
+            assert check.ok, (query.name, check.indexes)
+    finally:
+        await db_connection.close()
@@ -0,0 +1,207 @@
+import uuid
+from typing import TYPE_CHECKING
+
+import anyio
+import pytest
+from litestar import Litestar, Response
+from litestar.status_codes import HTTP_200_OK, HTTP_304_NOT_MODIFIED, HTTP_400_BAD_REQUEST
+from litestar.testing import AsyncTestClient
+
+from app.domain.cards import urls as cards_urls
+
+if TYPE_CHECKING:
+    from httpx import Response
+
+
+pytestmark: pytest.MarkDecorator = pytest.mark.anyio
+
+
+async def test_get_deck_with_cards(client: AsyncTestClient[Litestar]) -> None:
+    response: Response = await client.post(
+        cards_urls.DECK_CREATE, json={"name": f"deck-{uuid.uuid4().hex[:16]}"}
+    )
+    deck = response.json()
+
+    card_ids: list[str] = []
+    for i in range(3):
+        response = await client.post(
+            cards_urls.CARD_CREATE,
+            json={"name": f"card {i}", "front_content": "front", "back_content": "back"},
+        )
+        card_ids.append(response.json()["id"])
+        response = await client.post(
+            cards_urls.DECK_ADD_CARD, json={"deck_id": deck["id"], "card_id": card_ids[-1]}
+        )
+        assert response.status_code == HTTP_200_OK
+
+    response = await client.post(
+        cards_urls.DECK_ADD_CARD, json={"deck_id": deck["id"], "card_id": card_ids[0]}
+    )
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+    response = await client.get(
+        cards_urls.DECK_GET_WITH_CARDS.replace("{deck_id:uuid}", deck["id"]),
+        params={"limit": 2, "offset": 1},
+    )
+    assert response.status_code == HTTP_200_OK
+
+    deck_with_cards = response.json()
+    assert deck_with_cards["id"] == deck["id"]
+    assert deck_with_cards["card_count"] == len(card_ids)
+    assert [card["id"] for card in deck_with_cards["cards"]] == card_ids[1:]
+    assert all(card["tags"] == [] for card in deck_with_cards["cards"])
+
+    response = await client.get(
+        cards_urls.DECK_GET_WITH_CARDS.replace("{deck_id:uuid}", deck["id"]),
+        params={"fields": "name", "limit": 1},
+    )
+    assert response.json()["cards"] == [{"id": card_ids[0], "name": "card 0"}]
+
+    await client.delete(cards_urls.DECK_DELETE.replace("{deck_id:uuid}", deck["id"]))
+    for card_id in card_ids:
+        await client.delete(cards_urls.CARD_DELETE.replace("{card_id:uuid}", card_id))
+
+
+async def test_get_deck_snapshot(client: AsyncTestClient[Litestar]) -> None:
+    response: Response = await client.post(
+        cards_urls.DECK_CREATE, json={"name": f"deck-{uuid.uuid4().hex[:16]}"}
+    )
+    deck = response.json()
+    url = cards_urls.DECK_SNAPSHOT.replace("{deck_id:uuid}", deck["id"])
+
+    card_ids: list[str] = []
+    for name in ("b", "a"):
+        response = await client.post(
+            cards_urls.CARD_CREATE,
+            json={"name": name, "front_content": "front", "back_content": "back"},
+        )
+        card_ids.append(response.json()["id"])
+        await client.post(
+            cards_urls.DECK_ADD_CARD, json={"deck_id": deck["id"], "card_id": card_ids[-1]}
+        )
+
+    response = await client.get(url)
+    assert response.status_code == HTTP_200_OK
+    assert response.headers["content-encoding"] == "gzip"
+    snapshot = response.json()
+    assert snapshot["card_count"] == len(card_ids)
+    assert [card["name"] for card in snapshot["cards"]] == ["a", "b"]
+
+    response = await client.get(url, headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == HTTP_304_NOT_MODIFIED
+
+    response = await client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == snapshot
+
+    # Changes reach the snapshot through the change feed, shortly after they're made.
+    name = f"renamed-{uuid.uuid4().hex[:16]}"
+    await client.patch(
+        cards_urls.DECK_UPDATE.replace("{deck_id:uuid}", deck["id"]), json={"name": name}
+    )
+    for _ in range(50):
+        response = await client.get(url)
+        if response.json()["name"] == name:
+            break
+        await anyio.sleep(0.1)
+    assert response.json()["name"] == name
+
+    response = await client.get(
+        cards_urls.DECK_SNAPSHOT.replace("{deck_id:uuid}", str(uuid.uuid4()))
+    )
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+    await client.delete(cards_urls.DECK_DELETE.replace("{deck_id:uuid}", deck["id"]))
+    for card_id in card_ids:
+        await client.delete(cards_urls.CARD_DELETE.replace("{card_id:uuid}", card_id))
+
+
+async def test_clone_deck(client: AsyncTestClient[Litestar]) -> None:
+    response: Response = await client.post(
+        cards_urls.DECK_CREATE, json={"name": f"deck-{uuid.uuid4().hex[:16]}"}
+    )
+    deck = response.json()
+    response = await client.post(
+        cards_urls.TAG_CREATE, json={"name": f"tag-{uuid.uuid4().hex[:16]}"}
+    )
+    tag = response.json()
+
+    for i in range(2):
+        response = await client.post(
+            cards_urls.CARD_CREATE,
+            json={"name": f"card {i}", "front_content": "front", "back_content": "back"},
+        )
+        card_id: str = response.json()["id"]
+        await client.post(
+            cards_urls.DECK_ADD_CARD, json={"deck_id": deck["id"], "card_id": card_id}
+        )
+        await client.post(cards_urls.CARD_ADD_TAG, json={"card_id": card_id, "tag_id": tag["id"]})
+
+    clone_url = cards_urls.DECK_CLONE.replace("{deck_id:uuid}", deck["id"])
+    clone_name = f"clone-{uuid.uuid4().hex[:16]}"
+    response = await client.post(clone_url, json={"name": clone_name})
+    assert response.status_code == HTTP_200_OK
+    clone = response.json()
+    assert clone["name"] == clone_name
+
+    response = await client.post(clone_url, json={"name": clone_name})
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+    original, cloned = [
+        (
+            await client.get(cards_urls.DECK_GET_WITH_CARDS.replace("{deck_id:uuid}", deck_id))
+        ).json()["cards"]
+        for deck_id in (deck["id"], clone["id"])
+    ]
+    assert [card["name"] for card in cloned] == [card["name"] for card in original]
+    assert {card["id"] for card in cloned}.isdisjoint(card["id"] for card in original)
+    assert all(card["tags"] == [tag] for card in cloned)
+
+
+async def test_deck_duplicates(client: AsyncTestClient[Litestar]) -> None:
+    response: Response = await client.post(
+        cards_urls.DECK_CREATE, json={"name": f"deck-{uuid.uuid4().hex[:16]}"}
+    )
+    deck_id: str = response.json()["id"]
+
+    # Unique contents, so cards of earlier runs aren't duplicates.
+    word = uuid.uuid4().hex
+    card_ids: list[str] = []
+    for front_content in (
+        f"What does {word} mean in the periodic table of elements?",
+        f"what does {word} mean in the periodic table of elements",
+        f"What does {word} mean on the periodic table of elements?",
+        f"Spell {uuid.uuid4().hex} backwards.",
+    ):
+        response = await client.post(
+            cards_urls.CARD_CREATE,
+            json={"name": "card", "front_content": front_content, "back_content": "back"},
+        )
+        card_ids.append(response.json()["id"])
+        await client.post(
+            cards_urls.DECK_ADD_CARD, json={"deck_id": deck_id, "card_id": card_ids[-1]}
+        )
+
+    response = await client.patch(
+        cards_urls.CARD_UPDATE.replace("{card_id:uuid}", card_ids[3]),
+        json={"front_content": f"What does {word} mean on the periodic table of elements!"},
+    )
+    assert response.status_code == HTTP_200_OK
+
+    response = await client.get(
+        cards_urls.CARD_DUPLICATES.replace("{card_id:uuid}", card_ids[0]),
+        params={"similarity": 0.7},
+    )
+    assert response.status_code == HTTP_200_OK
+    assert {duplicate["id"] for duplicate in response.json()} == set(card_ids[1:])
+
+    response = await client.get(
+        cards_urls.DECK_DUPLICATES.replace("{deck_id:uuid}", deck_id), params={"similarity": 0.7}
+    )
+    assert response.status_code == HTTP_200_OK
+    assert response.json() == [{"card_ids": sorted(card_ids)}]
+
+    response = await client.get(
+        cards_urls.DECK_DUPLICATES.replace("{deck_id:uuid}", str(uuid.uuid4()))
+    )
+    assert response.status_code == HTTP_400_BAD_REQUEST
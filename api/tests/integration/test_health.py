@@ -2,7 +2,7 @@
 
 import pytest
 from litestar import Litestar, Response
-from litestar.status_codes import HTTP_200_OK
+from litestar.status_codes import HTTP_200_OK, HTTP_204_NO_CONTENT
 from litestar.testing import AsyncTestClient
 
 from app import __version__
@@ -24,3 +24,18 @@ async def test_system_health(client: AsyncTestClient[Litestar]) -> None:
         "version": __version__,
     }
     assert response.json() == expected_response
+
+
+async def test_system_liveness(client: AsyncTestClient[Litestar]) -> None:
+    response: Response = await client.get(system_urls.SYSTEM_LIVENESS)
+    assert response.status_code == HTTP_204_NO_CONTENT
+
+
+async def test_system_readiness(client: AsyncTestClient[Litestar]) -> None:
+    response: Response = await client.get(system_urls.SYSTEM_READINESS)
+    assert response.status_code == HTTP_200_OK
+
+    snapshot = response.json()
+    assert snapshot["database_status"] == "online"
+    assert snapshot["database_latency_ms"] >= 0
+    assert snapshot["pool_max_size"] >= snapshot["pool_size"] >= snapshot["pool_in_use"]
@@ -0,0 +1,86 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, cast
+
+import asyncpg
+import pytest
+from litestar.status_codes import HTTP_201_CREATED
+
+from app.config import Settings
+from app.middleware.idempotency import IDEMPOTENT_OPT_KEY, IdempotencyMiddleware, IdempotencyStore
+
+if TYPE_CHECKING:
+    from litestar.types import Message, Receive, ReceiveMessage, Scope, Send
+
+
+pytestmark: pytest.MarkDecorator = pytest.mark.anyio
+
+
+async def test_cancelled_request_is_not_run_again() -> None:
+    calls = 0
+    started = asyncio.Event()
+
+    async def handler(_scope: "Scope", _receive: "Receive", send: "Send") -> None:
+        nonlocal calls
+        calls += 1
+        started.set()
+        # E.g. committed, and the client disconnects before the response is sent.
+        await asyncio.sleep(0.05)
+        await send({
+            "type": "http.response.start",
+            "status": HTTP_201_CREATED,
+            "headers": [(b"content-type", b"application/json")],
+        })
+        await send({"type": "http.response.body", "body": b'"created"', "more_body": False})
+
+    async def receive() -> "ReceiveMessage":  # noqa: RUF029
+        return {"type": "http.request", "body": b"{}", "more_body": False}
+
+    sent: list[Message] = []
+
+    async def send(message: "Message") -> None:  # noqa: RUF029
+        sent.append(message)
+
+    scope = cast(
+        "Scope",
+        {
+            "type": "http",
+            "method": "POST",
+            "path": "/cards",
+            "query_string": b"",
+            "headers": [(b"idempotency-key", uuid.uuid4().hex.encode())],
+            "route_handler": SimpleNamespace(
+                opt={IDEMPOTENT_OPT_KEY: True}, operation_id="CreateCard"
+            ),
+        },
+    )
+
+    db_pool = await asyncpg.create_pool(Settings.from_env().database_dsn)
+    try:
+        store = IdempotencyStore()
+        store.db_pool = db_pool
+        request = asyncio.ensure_future(
+            IdempotencyMiddleware(handler, store)(scope, receive, send)
+        )
+        await started.wait()
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        assert sent == []
+
+        # The retry, on another worker.
+        other_store = IdempotencyStore()
+        other_store.db_pool = db_pool
+        await IdempotencyMiddleware(handler, other_store)(scope, receive, send)
+    finally:
+        await db_pool.close()
+
+    assert calls == 1
+    start, body = sent
+    assert start["type"] == "http.response.start"
+    assert start["status"] == HTTP_201_CREATED
+    assert (b"content-type", b"application/json") in start["headers"]
+    assert (b"idempotent-replayed", b"true") in start["headers"]
+    assert body["type"] == "http.response.body"
+    assert body["body"] == b'"created"'
@@ -0,0 +1,109 @@
+import asyncio
+import uuid
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from litestar import Litestar, Response
+from litestar.status_codes import HTTP_202_ACCEPTED, HTTP_400_BAD_REQUEST
+from litestar.testing import AsyncTestClient
+
+from app.domain.cards import urls as cards_urls
+from app.domain.jobs import urls as jobs_urls
+
+if TYPE_CHECKING:
+    from httpx import Response
+
+
+pytestmark: pytest.MarkDecorator = pytest.mark.anyio
+
+
+async def wait_for_job(client: AsyncTestClient[Litestar], job: dict[str, Any]) -> dict[str, Any]:
+    for _ in range(100):
+        response: Response = await client.get(
+            jobs_urls.JOB_GET.replace("{job_id:uuid}", job["id"])
+        )
+        job = response.json()
+        if job["status"] in {"succeeded", "failed"}:
+            return job
+        await asyncio.sleep(0.05)
+    pytest.fail("Job didn't finish in time.")
+
+
+async def test_delete_deck_with_orphaned_cards(client: AsyncTestClient[Litestar]) -> None:
+    decks: list[dict[str, Any]] = []
+    for _ in range(2):
+        response: Response = await client.post(
+            cards_urls.DECK_CREATE, json={"name": f"deck-{uuid.uuid4().hex[:16]}"}
+        )
+        decks.append(response.json())
+
+    card_ids: list[str] = []
+    for i in range(3):
+        response = await client.post(
+            cards_urls.CARD_CREATE,
+            json={"name": f"card {i}", "front_content": "front", "back_content": "back"},
+        )
+        card_ids.append(response.json()["id"])
+        await client.post(
+            cards_urls.DECK_ADD_CARD, json={"deck_id": decks[0]["id"], "card_id": card_ids[-1]}
+        )
+    # The first card is shared with another deck, so it isn't orphaned.
+    await client.post(
+        cards_urls.DECK_ADD_CARD, json={"deck_id": decks[1]["id"], "card_id": card_ids[0]}
+    )
+
+    response = await client.delete(
+        cards_urls.DECK_DELETE.replace("{deck_id:uuid}", decks[0]["id"]),
+        params={"delete_orphaned_cards": True},
+    )
+    assert response.status_code == HTTP_202_ACCEPTED
+
+    job = await wait_for_job(client, response.json())
+    assert job["status"] == "succeeded"
+    assert job["progress"] == job["total"] == len(card_ids)
+
+    response = await client.get(cards_urls.DECK_GET.replace("{deck_id:uuid}", decks[0]["id"]))
+    assert response.status_code == HTTP_400_BAD_REQUEST
+    remaining = [
+        (await client.get(cards_urls.CARD_GET.replace("{card_id:uuid}", card_id))).status_code
+        for card_id in card_ids
+    ]
+    assert remaining == [200, 400, 400]
+
+    response = await client.delete(
+        cards_urls.DECK_DELETE.replace("{deck_id:uuid}", decks[0]["id"])
+    )
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+    await wait_for_job(
+        client,
+        (
+            await client.delete(cards_urls.DECK_DELETE.replace("{deck_id:uuid}", decks[1]["id"]))
+        ).json(),
+    )
+    await client.delete(cards_urls.CARD_DELETE.replace("{card_id:uuid}", card_ids[0]))
+
+
+async def test_delete_tag(client: AsyncTestClient[Litestar]) -> None:
+    response: Response = await client.post(
+        cards_urls.TAG_CREATE, json={"name": f"tag-{uuid.uuid4().hex[:16]}"}
+    )
+    tag = response.json()
+    response = await client.post(
+        cards_urls.CARD_CREATE,
+        json={"name": "card", "front_content": "front", "back_content": "back"},
+    )
+    card_id: str = response.json()["id"]
+    await client.post(cards_urls.CARD_ADD_TAG, json={"card_id": card_id, "tag_id": tag["id"]})
+
+    response = await client.delete(cards_urls.TAG_DELETE.replace("{tag_id:uuid}", tag["id"]))
+    assert response.status_code == HTTP_202_ACCEPTED
+
+    job = await wait_for_job(client, response.json())
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 1
+
+    response = await client.get(cards_urls.TAG_GET.replace("{tag_id:uuid}", tag["id"]))
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+    await client.delete(cards_urls.CARD_DELETE.replace("{card_id:uuid}", card_id))
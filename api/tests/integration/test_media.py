@@ -0,0 +1,142 @@
+import os
+from datetime import timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import asyncpg
+import pytest
+from litestar import Litestar, Response
+from litestar.status_codes import (
+    HTTP_200_OK,
+    HTTP_201_CREATED,
+    HTTP_206_PARTIAL_CONTENT,
+    HTTP_304_NOT_MODIFIED,
+    HTTP_400_BAD_REQUEST,
+    HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+)
+from litestar.testing import AsyncTestClient
+
+from app.config import Settings
+from app.domain.cards import urls as cards_urls
+from app.domain.cards.media_store import MediaStore, MediaSweeper
+
+if TYPE_CHECKING:
+    from httpx import Response
+
+
+pytestmark: pytest.MarkDecorator = pytest.mark.anyio
+
+
+async def test_upload_and_download_media(client: AsyncTestClient[Litestar]) -> None:
+    response: Response = await client.post(
+        cards_urls.CARD_CREATE,
+        json={"name": "card", "front_content": "front", "back_content": "back"},
+    )
+    card_id: str = response.json()["id"]
+    upload_url = cards_urls.CARD_MEDIA_UPLOAD.replace("{card_id:uuid}", card_id)
+    content = os.urandom(3000)
+
+    media_ids: list[str] = []
+    for _ in range(2):
+        response = await client.post(
+            upload_url,
+            content=content,
+            headers={"Content-Type": "audio/ogg"},
+            params={"filename": "word.ogg"},
+        )
+        assert response.status_code == HTTP_201_CREATED
+        media_ids.append(response.json()["id"])
+    assert response.json()["size"] == len(content)
+    assert response.json()["media_type"] == "audio/ogg"
+
+    response = await client.get(upload_url)
+    assert response.status_code == HTTP_200_OK
+    assert [media["id"] for media in response.json()] == media_ids
+    # Identical uploads share their content.
+    assert len({media["sha256"] for media in response.json()}) == 1
+
+    get_url = cards_urls.CARD_MEDIA_GET.replace("{media_id:uuid}", media_ids[0])
+    response = await client.get(get_url)
+    assert response.status_code == HTTP_200_OK
+    assert response.content == content
+    assert response.headers["content-type"] == "audio/ogg"
+    etag = response.headers["etag"]
+
+    response = await client.get(get_url, headers={"If-None-Match": etag})
+    assert response.status_code == HTTP_304_NOT_MODIFIED
+
+    response = await client.get(get_url, headers={"Range": "bytes=100-199"})
+    assert response.status_code == HTTP_206_PARTIAL_CONTENT
+    assert response.content == content[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(content)}"
+
+    response = await client.get(get_url, headers={"Range": "bytes=-10"})
+    assert response.status_code == HTTP_206_PARTIAL_CONTENT
+    assert response.content == content[-10:]
+
+    response = await client.get(get_url, headers={"Range": "bytes=100-199", "If-Range": '"x"'})
+    assert response.status_code == HTTP_200_OK
+
+    response = await client.get(get_url, headers={"Range": f"bytes={len(content)}-"})
+    assert response.status_code == HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+
+
+async def test_upload_media_for_missing_card(client: AsyncTestClient[Litestar]) -> None:
+    response: Response = await client.post(
+        cards_urls.CARD_MEDIA_UPLOAD.replace(
+            "{card_id:uuid}", "00000000-0000-0000-0000-000000000000"
+        ),
+        content=b"content",
+    )
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+
+async def test_download_untrusted_media(client: AsyncTestClient[Litestar]) -> None:
+    response: Response = await client.post(
+        cards_urls.CARD_CREATE,
+        json={"name": "card", "front_content": "front", "back_content": "back"},
+    )
+    card_id: str = response.json()["id"]
+    response = await client.post(
+        cards_urls.CARD_MEDIA_UPLOAD.replace("{card_id:uuid}", card_id),
+        content=b"<script>alert(1)</script>",
+        headers={"Content-Type": "text/html"},
+    )
+    assert response.status_code == HTTP_201_CREATED
+
+    response = await client.get(
+        cards_urls.CARD_MEDIA_GET.replace("{media_id:uuid}", response.json()["id"])
+    )
+    assert response.status_code == HTTP_200_OK
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert response.headers["content-disposition"].startswith("attachment")
+    assert response.headers["x-content-type-options"] == "nosniff"
+    assert response.headers["content-security-policy"] == "sandbox"
+
+
+async def test_sweep_unreferenced_media(client: AsyncTestClient[Litestar], tmp_path: Path) -> None:
+    response: Response = await client.post(
+        cards_urls.CARD_CREATE,
+        json={"name": "card", "front_content": "front", "back_content": "back"},
+    )
+    card_id: str = response.json()["id"]
+    response = await client.post(
+        cards_urls.CARD_MEDIA_UPLOAD.replace("{card_id:uuid}", card_id),
+        content=os.urandom(100),
+        headers={"Content-Type": "image/png"},
+    )
+    media_store = MediaStore(tmp_path / "media", max_size=1024)
+    blob = media_store.path(response.json()["sha256"])
+
+    sweeper = MediaSweeper(media_store, grace=timedelta(0))
+    sweeper.db_pool = await asyncpg.create_pool(Settings.from_env().database_dsn)
+    try:
+        assert await sweeper.sweep() == 0
+        assert blob.exists()
+
+        # Its attachment is deleted with the card.
+        await client.delete(cards_urls.CARD_DELETE.replace("{card_id:uuid}", card_id))
+        assert await sweeper.sweep() == 1
+        assert not blob.exists()
+    finally:
+        await sweeper.db_pool.close()
@@ -0,0 +1,98 @@
+import uuid
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from litestar import Litestar, Response
+from litestar.status_codes import HTTP_200_OK, HTTP_400_BAD_REQUEST
+from litestar.testing import AsyncTestClient
+
+from app.domain.cards import urls as cards_urls
+from app.domain.cards.sync import SyncToken
+from tests.integration.test_jobs import wait_for_job
+
+if TYPE_CHECKING:
+    from httpx import Response
+
+
+pytestmark: pytest.MarkDecorator = pytest.mark.anyio
+
+
+async def sync(
+    client: AsyncTestClient[Litestar], token: str | None, limit: int = 1000
+) -> tuple[str, list[dict[str, Any]]]:
+    pages: list[dict[str, Any]] = []
+    while True:
+        params: dict[str, Any] = {"limit": limit}
+        if token is not None:
+            params["token"] = token
+        response: Response = await client.get(cards_urls.SYNC, params=params)
+        assert response.status_code == HTTP_200_OK
+        page: dict[str, Any] = response.json()
+        pages.append(page)
+        if not page["has_more"]:
+            return page["token"], pages
+        token = page["token"]
+
+
+async def test_sync_changes(client: AsyncTestClient[Litestar]) -> None:
+    token, _ = await sync(client, None)
+
+    response: Response = await client.post(
+        cards_urls.DECK_CREATE, json={"name": f"deck-{uuid.uuid4().hex[:16]}"}
+    )
+    deck_id: str = response.json()["id"]
+    response = await client.post(
+        cards_urls.CARD_CREATE,
+        json={"name": "card", "front_content": "front", "back_content": "back"},
+    )
+    card_id: str = response.json()["id"]
+    await client.post(cards_urls.DECK_ADD_CARD, json={"deck_id": deck_id, "card_id": card_id})
+    response = await client.post(
+        cards_urls.TAG_CREATE, json={"name": f"tag-{uuid.uuid4().hex[:16]}"}
+    )
+    tag_id: str = response.json()["id"]
+    await client.post(cards_urls.CARD_ADD_TAG, json={"card_id": card_id, "tag_id": tag_id})
+    await client.patch(
+        cards_urls.CARD_UPDATE.replace("{card_id:uuid}", card_id), json={"name": "renamed"}
+    )
+    response = await client.delete(cards_urls.TAG_DELETE.replace("{tag_id:uuid}", tag_id))
+    await wait_for_job(client, response.json())
+
+    # Paging through the changes one at a time gets the same changes.
+    for limit in (1000, 1):
+        _, pages = await sync(client, token, limit)
+        decks = [deck for page in pages for deck in page["decks"]]
+        cards = [card for page in pages for card in page["cards"]]
+        deck_cards = [deck_card for page in pages for deck_card in page["deck_cards"]]
+        deleted = [tombstone for page in pages for tombstone in page["deleted"]]
+
+        assert {"id": deck_id, "name": decks[0]["name"]} in decks
+        assert [card for card in cards if card["id"] == card_id] == [
+            {"id": card_id, "name": "renamed", "front_content": "front", "back_content": "back"}
+        ]
+        assert [dc["card_id"] for dc in deck_cards if dc["deck_id"] == deck_id] == [card_id]
+        assert {"entity": "tag", "id": tag_id} in deleted
+        assert any(tombstone["entity"] == "card_tag" for tombstone in deleted)
+        assert all(tag["id"] != tag_id for page in pages for tag in page["tags"])
+
+    token, _ = await sync(client, token)
+    await client.delete(cards_urls.CARD_DELETE.replace("{card_id:uuid}", card_id))
+    token, pages = await sync(client, token)
+    assert {"entity": "card", "id": card_id} in pages[0]["deleted"]
+
+    token, pages = await sync(client, token)
+    assert pages[0]["deleted"] == []
+    assert pages[0]["cards"] == []
+
+    await client.delete(cards_urls.DECK_DELETE.replace("{deck_id:uuid}", deck_id))
+
+
+async def test_sync_malformed_token(client: AsyncTestClient[Litestar]) -> None:
+    response: Response = await client.get(cards_urls.SYNC, params={"token": "nonsense"})
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+    response = await client.get(
+        cards_urls.SYNC,
+        params={"token": SyncToken("not a snapshot").encode()},
+    )
+    assert response.status_code == HTTP_400_BAD_REQUEST
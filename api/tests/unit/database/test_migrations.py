@@ -0,0 +1,59 @@
+from pathlib import Path
+
+import pytest
+
+from app.config import Settings
+from app.database.migrations import Migration, load_migrations
+from app.errors import MigrationError
+
+
+def test_load_migrations_orders_by_version(tmp_path: Path) -> None:
+    (tmp_path / "010_second.sql").write_text("SELECT 2;")
+    (tmp_path / "002_first.sql").write_text("SELECT 1;")
+
+    migrations = load_migrations(tmp_path)
+
+    assert [(migration.version, migration.name) for migration in migrations] == [
+        (2, "first"),
+        (10, "second"),
+    ]
+
+
+@pytest.mark.parametrize("names", [["first.sql"], ["001_first.sql", "1_second.sql"]])
+def test_load_migrations_rejects_bad_versions(tmp_path: Path, names: list[str]) -> None:
+    for name in names:
+        (tmp_path / name).write_text("SELECT 1;")
+
+    with pytest.raises(MigrationError):
+        load_migrations(tmp_path)
+
+
+def test_no_transaction_migration() -> None:
+    migration = Migration(
+        1,
+        "indexes",
+        """-- migrate: no-transaction
+
+-- The first index.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS a_index ON a (x);
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS b_index
+	ON b (y);
+-- Trailing comment.
+""",
+    )
+
+    assert not migration.transactional
+    assert migration.concurrent_indexes() == ["a_index", "b_index"]
+    assert migration.statements() == [
+        "-- migrate: no-transaction\n\n-- The first index.\n"
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS a_index ON a (x)",
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS b_index\n\tON b (y)",
+    ]
+
+
+def test_repository_migrations_load() -> None:
+    migrations = load_migrations(Settings().migrations_path)
+
+    assert migrations
+    assert [migration.version for migration in migrations] == list(range(1, len(migrations) + 1))
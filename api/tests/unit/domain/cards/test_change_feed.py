@@ -0,0 +1,34 @@
+import uuid
+
+import pytest
+
+from app.domain.cards.change_feed import ChangeSubscription
+from app.domain.cards.schemas import Change
+
+pytestmark: pytest.MarkDecorator = pytest.mark.anyio
+
+
+def test_subscription_filters_by_deck() -> None:
+    deck_id = uuid.uuid4()
+    subscription = ChangeSubscription(frozenset([deck_id]), max_queue_size=10)
+
+    assert subscription.matches(
+        Change(entity="card", operation="update", id=uuid.uuid4(), deck_ids=[deck_id])
+    )
+    assert not subscription.matches(
+        Change(entity="card", operation="update", id=uuid.uuid4(), deck_ids=[uuid.uuid4()])
+    )
+    assert subscription.matches(Change(entity="tag", operation="create", id=uuid.uuid4()))
+
+
+async def test_lagging_subscription_resyncs() -> None:
+    subscription = ChangeSubscription(None, max_queue_size=2)
+    changes = [Change(entity="deck", operation="create", id=uuid.uuid4()) for _ in range(3)]
+
+    for change in changes:
+        subscription.put(change)
+
+    assert await subscription.get() is None
+
+    subscription.put(changes[0])
+    assert await subscription.get() == changes[0]
@@ -0,0 +1,149 @@
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+from litestar.status_codes import HTTP_200_OK, HTTP_304_NOT_MODIFIED
+from litestar.testing import AsyncTestClient
+
+from app.asgi import create_app
+from app.domain.cards import urls as cards_urls
+from app.domain.cards.schemas import CardCreate, CardUpdate
+from app.domain.cards.snapshots import DeckSnapshotStore
+from app.domain.cards.storage import MemoryCardStorage
+
+pytestmark: pytest.MarkDecorator = pytest.mark.anyio
+
+
+async def test_snapshots_follow_changes(tmp_path: Path) -> None:
+    storage = MemoryCardStorage()
+    store = DeckSnapshotStore(tmp_path)
+    store.storage = storage
+    storage.add_listener(store.apply_change)
+    store.start()
+
+    deck = await storage.create_deck("deck")
+    card = await storage.create_card(CardCreate(name="card", front_content="", back_content=""))
+    await storage.add_card_to_deck(deck.id, card.id)
+
+    snapshot = await store.get(deck.id)
+    assert snapshot is not None
+    assert json.loads(gzip.decompress(snapshot.content))["cards"][0]["name"] == "card"
+    assert [path.name for path in tmp_path.rglob("*.json.gz")] == [f"{deck.id}-0.json.gz"]
+    assert await store.get(deck.id) is snapshot
+
+    # Tags of the deck's cards are part of its snapshot.
+    tag = await storage.create_tag("tag")
+    await storage.tag_card(card.id, tag.id)
+    await storage.update_tag(tag.id, "renamed")
+    await storage.update_card(card.id, CardUpdate(name="edited"))
+    snapshot = await store.get(deck.id)
+    assert snapshot is not None
+    assert json.loads(gzip.decompress(snapshot.content))["cards"][0] == {
+        "id": str(card.id),
+        "name": "edited",
+        "front_content": "",
+        "back_content": "",
+        "tags": [{"id": str(tag.id), "name": "renamed"}],
+    }
+    assert [path.name for path in tmp_path.rglob("*.json.gz")] == [
+        f"{deck.id}-{snapshot.version}.json.gz"
+    ]
+
+    await storage.delete_deck(deck.id, delete_orphaned_cards=False)
+    assert await store.get(deck.id) is None
+    assert list(tmp_path.rglob("*.json.gz")) == []
+
+    await store.stop()
+    assert list(tmp_path.iterdir()) == []
+
+
+async def test_snapshots_are_evicted_by_size(tmp_path: Path) -> None:
+    storage = MemoryCardStorage()
+    decks = [await storage.create_deck(name) for name in ("a", "b")]
+    # Nothing fits in memory, and a single snapshot fits on disk.
+    store = DeckSnapshotStore(tmp_path, max_memory_size=0, max_disk_size=100)
+    store.storage = storage
+    store.start()
+
+    for deck in decks:
+        snapshot = await store.get(deck.id)
+        assert snapshot is not None
+        assert [path.name for path in tmp_path.rglob("*.json.gz")] == [f"{deck.id}-0.json.gz"]
+
+    # Evicted snapshots are built again.
+    snapshot = await store.get(decks[0].id)
+    assert snapshot is not None
+    assert json.loads(gzip.decompress(snapshot.content))["name"] == "a"
+    await store.stop()
+
+
+async def test_get_deck_snapshot(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setenv("PASF_STORAGE_BACKEND", "memory")
+    monkeypatch.setenv("PASF_SNAPSHOT_PATH", str(tmp_path))
+    async with AsyncTestClient(create_app()) as client:
+        response = await client.post(cards_urls.DECK_CREATE, json={"name": "deck"})
+        deck_id = response.json()["id"]
+        url = cards_urls.DECK_SNAPSHOT.replace("{deck_id:uuid}", deck_id)
+
+        response = await client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == HTTP_200_OK
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json() == {"id": deck_id, "name": "deck", "card_count": 0, "cards": []}
+        etag = response.headers["etag"]
+
+        response = await client.get(
+            url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+        )
+        assert response.status_code == HTTP_304_NOT_MODIFIED
+
+        # Changes apply synchronously to the in-memory storage.
+        await client.patch(
+            cards_urls.DECK_UPDATE.replace("{deck_id:uuid}", deck_id), json={"name": "renamed"}
+        )
+        response = await client.get(url, headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+        assert response.json()["name"] == "renamed"
+        assert response.headers["etag"] != etag
+
+
+async def test_cleared_snapshots_are_rebuilt(tmp_path: Path) -> None:
+    storage = MemoryCardStorage()
+    store = DeckSnapshotStore(tmp_path)
+    store.storage = storage
+    store.start()
+
+    deck = await storage.create_deck("deck")
+    snapshot = await store.get(deck.id)
+    assert snapshot is not None
+
+    # Changes the store missed are only picked up once it's cleared.
+    card = await storage.create_card(CardCreate(name="card", front_content="", back_content=""))
+    await storage.add_card_to_deck(deck.id, card.id)
+    assert await store.get(deck.id) is snapshot
+
+    store.clear()
+    snapshot = await store.get(deck.id)
+    assert snapshot is not None
+    assert json.loads(gzip.decompress(snapshot.content))["cards"][0]["name"] == "card"
+
+    await store.stop()
+
+
+async def test_abandoned_directories_are_removed(tmp_path: Path) -> None:
+    running = DeckSnapshotStore(tmp_path)
+    running.start()
+    # Left by a worker that was killed, nothing holds its lock anymore.
+    abandoned = tmp_path / "decks-abandoned"
+    abandoned.mkdir()
+    (abandoned / ".lock").touch()
+    (abandoned / "deck-0.json.gz").touch()
+
+    store = DeckSnapshotStore(tmp_path)
+    store.start()
+    assert not abandoned.exists()
+    assert len(list(tmp_path.glob("decks-*"))) == 2  # noqa: PLR2004
+
+    await store.stop()
+    await running.stop()
+    assert list(tmp_path.iterdir()) == []
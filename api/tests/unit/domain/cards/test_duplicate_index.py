@@ -0,0 +1,58 @@
+from typing import TYPE_CHECKING
+
+import pytest
+
+from app.domain.cards.duplicate_index import DuplicateIndex, normalise_content
+from app.domain.cards.schemas import CardCreate, CardUpdate
+from app.domain.cards.storage import MemoryCardStorage
+
+if TYPE_CHECKING:
+    import uuid
+
+pytestmark: pytest.MarkDecorator = pytest.mark.anyio
+
+
+def test_normalise_content() -> None:
+    assert (
+        normalise_content("  What's the   CAPITAL of France?!\n") == "what s the capital of france"
+    )
+
+
+async def test_duplicates_and_clusters() -> None:
+    storage = MemoryCardStorage()
+    index = DuplicateIndex()
+    storage.add_listener(index.apply_change)
+
+    deck = await storage.create_deck("deck")
+    card_ids: list[uuid.UUID] = []
+    for front_content in (
+        "Which element has the chemical symbol Fe on the periodic table?",
+        "which element has the chemical symbol fe   on the periodic table",
+        "Which element has the chemical symbol Fe in the periodic table?",
+        "Name the largest ocean on Earth.",
+        "Name the largest ocean on Earth!",
+    ):
+        card = await storage.create_card(
+            CardCreate(name="card", front_content=front_content, back_content="")
+        )
+        await storage.add_card_to_deck(deck.id, card.id)
+        card_ids.append(card.id)
+
+    await index.rebuild(storage, batch_size=2)
+    assert index.ready
+
+    duplicates = index.duplicates(card_ids[0], similarity=0.7, limit=10)
+    assert duplicates is not None
+    assert duplicates[0] == (card_ids[1], 1.0)
+    assert [card_id for card_id, _ in duplicates] == card_ids[1:3]
+
+    deck_card_ids = await storage.get_deck_card_ids(deck.id)
+    assert deck_card_ids is not None
+    assert index.clusters(deck_card_ids, similarity=0.7) == [card_ids[:3], card_ids[3:]]
+
+    # Changes from the feed only mark cards stale, they are read again on refresh.
+    await storage.update_card(card_ids[1], CardUpdate(front_content="Who painted the Mona Lisa?"))
+    await storage.delete_card(card_ids[4])
+    await index.refresh(storage)
+    assert index.duplicates(card_ids[4], similarity=0.7, limit=10) is None
+    assert index.clusters(card_ids, similarity=0.7) == [[card_ids[0], card_ids[2]]]
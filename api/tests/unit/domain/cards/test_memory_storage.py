@@ -0,0 +1,202 @@
+import json
+import uuid
+
+import pytest
+from litestar.status_codes import (
+    HTTP_200_OK,
+    HTTP_202_ACCEPTED,
+    HTTP_204_NO_CONTENT,
+    HTTP_400_BAD_REQUEST,
+)
+from litestar.testing import AsyncTestClient
+
+from app.asgi import create_app
+from app.domain.cards import urls as cards_urls
+from app.domain.cards.dependencies import CARD_FIELDS, DECK_CARD_FIELDS, FieldSelection, Pagination
+from app.domain.cards.schemas import (
+    BatchDeleteCard,
+    BatchTagCard,
+    BatchUntagCard,
+    BatchUpdateCard,
+    BatchUpdateDeck,
+    BatchUpdateTag,
+    CardCreate,
+    CardUpdate,
+    TagFilterNot,
+    TagFilterTag,
+)
+from app.domain.cards.storage import MemoryCardStorage
+from app.domain.system import urls as system_urls
+from app.errors import (
+    AlreadyExistsError,
+    BatchOperationError,
+    CardNotFoundError,
+    DeckNotFoundError,
+)
+
+pytestmark: pytest.MarkDecorator = pytest.mark.anyio
+
+
+async def test_deck_cards_stay_sorted_by_name() -> None:
+    storage = MemoryCardStorage()
+    deck = await storage.create_deck("deck")
+    tag_b = await storage.create_tag("b")
+    tag_a = await storage.create_tag("a")
+    card_ids: dict[str, uuid.UUID] = {}
+    for name in ("c", "a", "b"):
+        card = await storage.create_card(
+            CardCreate(name=name, front_content="front", back_content="back")
+        )
+        card_ids[name] = card.id
+        await storage.add_card_to_deck(deck.id, card.id)
+    await storage.tag_card(card_ids["a"], tag_b.id)
+    await storage.tag_card(card_ids["a"], tag_a.id)
+    await storage.update_card(card_ids["c"], CardUpdate(name="0"))
+
+    content = await storage.get_deck_with_cards(
+        deck.id, Pagination(limit=2, offset=0), FieldSelection(DECK_CARD_FIELDS, preview=2)
+    )
+    assert content is not None
+    page = json.loads(content)
+    assert page["card_count"] == len(card_ids)
+    assert [card["name"] for card in page["cards"]] == ["0", "a"]
+    assert page["cards"][1]["front_content"] == "fr"
+    assert [tag["name"] for tag in page["cards"][1]["tags"]] == ["a", "b"]
+
+    await storage.delete_card(card_ids["a"])
+    content = await storage.get_deck_with_cards(
+        deck.id, Pagination(limit=10, offset=1), FieldSelection(("id", "name"))
+    )
+    assert content is not None
+    assert json.loads(content)["cards"] == [{"id": str(card_ids["b"]), "name": "b"}]
+
+
+async def test_constraints() -> None:
+    storage = MemoryCardStorage()
+    deck = await storage.create_deck("deck")
+    card = await storage.create_card(CardCreate(name="card", front_content="f", back_content="b"))
+    await storage.add_card_to_deck(deck.id, card.id)
+
+    with pytest.raises(AlreadyExistsError):
+        await storage.create_deck("deck")
+    with pytest.raises(AlreadyExistsError):
+        await storage.add_card_to_deck(deck.id, card.id)
+    with pytest.raises(DeckNotFoundError):
+        await storage.add_card_to_deck(uuid.uuid4(), card.id)
+    with pytest.raises(CardNotFoundError):
+        await storage.tag_card(uuid.uuid4(), uuid.uuid4())
+    with pytest.raises(DeckNotFoundError):
+        await storage.clone_deck(uuid.uuid4(), "clone")
+
+    await storage.update_deck(deck.id, "renamed")
+    clone = await storage.create_deck("deck")
+    assert clone.name == "deck"
+
+
+async def test_delete_deck_and_tag() -> None:
+    storage = MemoryCardStorage()
+    deck = await storage.create_deck("deck")
+    other_deck = await storage.create_deck("other")
+    tag = await storage.create_tag("tag")
+    shared = await storage.create_card(
+        CardCreate(name="shared", front_content="", back_content="")
+    )
+    orphan = await storage.create_card(
+        CardCreate(name="orphan", front_content="", back_content="")
+    )
+    for card in (shared, orphan):
+        await storage.add_card_to_deck(deck.id, card.id)
+        await storage.tag_card(card.id, tag.id)
+    await storage.add_card_to_deck(other_deck.id, shared.id)
+
+    clone = await storage.clone_deck(deck.id, "clone")
+    query = await storage.query_cards(
+        TagFilterTag(tag="tag"), limit=10, offset=0, selection=FieldSelection(("id",))
+    )
+    # The clone has copies of both cards, tagged as well.
+    assert len(json.loads(query)) == 2 * len((shared, orphan))
+
+    job = await storage.delete_deck(deck.id, delete_orphaned_cards=True)
+    assert job is not None
+    assert job.status == "succeeded"
+    assert (job.progress, job.total) == (2, 2)
+    assert await storage.get_card(orphan.id, FieldSelection(CARD_FIELDS)) is None
+    assert await storage.get_card(shared.id, FieldSelection(CARD_FIELDS)) is not None
+    assert await storage.delete_deck(deck.id, delete_orphaned_cards=False) is None
+
+    job = await storage.delete_tag(tag.id)
+    assert job is not None
+    assert (job.progress, job.total) == (3, 3)
+    query = await storage.query_cards(
+        TagFilterNot.model_validate({"not": {"tag": "tag"}}),
+        limit=10,
+        offset=0,
+        selection=FieldSelection(("id",)),
+    )
+    snapshot = await storage.snapshot_tags()
+    assert snapshot.card_tags == []
+    assert sorted(card["id"] for card in json.loads(query)) == [
+        str(card_id) for card_id in snapshot.card_ids
+    ]
+    assert await storage.get_deck(clone.id, FieldSelection(("name",))) == b'{"name":"clone"}'
+
+
+async def test_app_without_database(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("PASF_STORAGE_BACKEND", "memory")
+    async with AsyncTestClient(create_app()) as client:
+        response = await client.post(cards_urls.TAG_CREATE, json={"name": "verbs"})
+        tag_id = response.json()["id"]
+        response = await client.post(
+            cards_urls.CARD_CREATE,
+            json={"name": "card", "front_content": "front", "back_content": "back"},
+        )
+        card_id = response.json()["id"]
+        response = await client.post(
+            cards_urls.CARD_ADD_TAG, json={"card_id": card_id, "tag_id": tag_id}
+        )
+        assert response.status_code == HTTP_200_OK
+        response = await client.post(
+            cards_urls.CARD_ADD_TAG, json={"card_id": card_id, "tag_id": tag_id}
+        )
+        assert response.status_code == HTTP_400_BAD_REQUEST
+
+        response = await client.post(cards_urls.CARD_QUERY, json={"filter": {"tag": "verbs"}})
+        assert [card["id"] for card in response.json()] == [card_id]
+
+        response = await client.delete(cards_urls.TAG_DELETE.replace("{tag_id:uuid}", tag_id))
+        assert response.status_code == HTTP_202_ACCEPTED
+        assert response.json()["status"] == "succeeded"
+
+        response = await client.post(cards_urls.CARD_QUERY, json={"filter": {"tag": "verbs"}})
+        assert response.json() == []
+
+        response = await client.get(system_urls.SYSTEM_LIVENESS)
+        assert response.status_code == HTTP_204_NO_CONTENT
+
+
+async def test_batch_is_checked_before_applying() -> None:
+    storage = MemoryCardStorage()
+    decks = [await storage.create_deck(name) for name in ("a", "b")]
+    tag = await storage.create_tag("tag")
+    card = await storage.create_card(CardCreate(name="card", front_content="", back_content=""))
+
+    # Names freed earlier in the batch can be taken, cards deleted earlier can't be used.
+    results = await storage.apply_batch([
+        BatchUpdateDeck(op="update_deck", deck_id=decks[0].id, name="c"),
+        BatchUpdateDeck(op="update_deck", deck_id=decks[1].id, name="a"),
+        BatchTagCard(op="tag_card", card_id=card.id, tag_id=tag.id),
+        BatchUntagCard(op="untag_card", card_id=card.id, tag_id=tag.id),
+        BatchTagCard(op="tag_card", card_id=card.id, tag_id=tag.id),
+    ])
+    assert [result.name for result in results[:2] if result is not None] == ["c", "a"]
+
+    with pytest.raises(BatchOperationError) as error:
+        await storage.apply_batch([
+            BatchUpdateTag(op="update_tag", tag_id=tag.id, name="renamed"),
+            BatchDeleteCard(op="delete_card", card_id=card.id),
+            BatchUpdateCard(op="update_card", card_id=card.id, name="renamed"),
+        ])
+    assert error.value.index == len(["update_tag", "delete_card"])
+    assert await storage.get_tag(tag.id, FieldSelection(("name",))) == b'{"name":"tag"}'
+    snapshot = await storage.snapshot_tags()
+    assert snapshot.card_tags == [(card.id, tag.id)]
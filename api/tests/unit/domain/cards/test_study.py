@@ -0,0 +1,132 @@
+import asyncio
+from typing import TYPE_CHECKING
+
+import pytest
+from litestar.status_codes import HTTP_200_OK, HTTP_400_BAD_REQUEST
+from litestar.testing import AsyncTestClient
+
+from app.asgi import create_app
+from app.domain.cards import urls as cards_urls
+from app.domain.cards.dependencies import FieldSelection
+from app.domain.cards.schemas import CardCreate, TagFilterTag
+from app.domain.cards.storage import MemoryCardStorage
+from app.domain.cards.study import StudySessionStore, sample_matching_cards
+
+if TYPE_CHECKING:
+    import uuid
+
+pytestmark: pytest.MarkDecorator = pytest.mark.anyio
+
+
+async def test_cards_are_prefetched_in_batches() -> None:
+    storage = MemoryCardStorage()
+    card_ids = [
+        (await storage.create_card(CardCreate(name=str(i), front_content="", back_content=""))).id
+        for i in range(10)
+    ]
+    store = StudySessionStore(batch_size=4)
+    session_id = store.start(card_ids, FieldSelection(("id", "name")))
+    deleted = card_ids[5]
+    await storage.delete_card(deleted)
+
+    served: list[str] = []
+    result = await store.next_cards(session_id, storage, 3)
+    assert result is not None
+    cards, remaining = result
+    served.extend(card["name"] for card in cards)
+    # The first batch is read at once, the second one in the background.
+    assert remaining == len(card_ids) - len(served)
+    await asyncio.sleep(0)
+
+    while remaining:
+        result = await store.next_cards(session_id, storage, 2)
+        assert result is not None
+        cards, remaining = result
+        served.extend(card["name"] for card in cards)
+
+    # The deleted card is skipped.
+    assert served == [str(i) for i, card_id in enumerate(card_ids) if card_id != deleted]
+    assert store.end(session_id)
+    assert await store.next_cards(session_id, storage, 1) is None
+
+
+async def test_sessions_expire() -> None:
+    storage = MemoryCardStorage()
+    store = StudySessionStore(ttl=0)
+    session_id = store.start([], FieldSelection(("id",)))
+    await asyncio.sleep(0.01)
+    assert await store.next_cards(session_id, storage, 1) is None
+
+    store = StudySessionStore(max_sessions=1)
+    session_id = store.start([], FieldSelection(("id",)))
+    store.start([], FieldSelection(("id",)))
+    assert await store.next_cards(session_id, storage, 1) is None
+
+
+async def test_matching_cards_are_sampled() -> None:
+    storage = MemoryCardStorage()
+    tag = await storage.create_tag("tag")
+    tagged: set[uuid.UUID] = set()
+    for i in range(30):
+        card = await storage.create_card(
+            CardCreate(name=str(i), front_content="", back_content="")
+        )
+        if i % 3 != 0:
+            await storage.tag_card(card.id, tag.id)
+            tagged.add(card.id)
+
+    sample = await sample_matching_cards(storage, TagFilterTag(tag="tag"), 5, page_size=4)
+    assert len(sample) == len(set(sample)) == 5  # noqa: PLR2004
+    assert set(sample) <= tagged
+
+    # Cards past the first pages are picked too.
+    picked: set[uuid.UUID] = set()
+    for _ in range(50):
+        picked.update(
+            await sample_matching_cards(storage, TagFilterTag(tag="tag"), 5, page_size=4)
+        )
+    assert picked == tagged
+
+    sample = await sample_matching_cards(storage, TagFilterTag(tag="tag"), 100, page_size=4)
+    assert set(sample) == tagged
+
+
+async def test_study_deck(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("PASF_STORAGE_BACKEND", "memory")
+    async with AsyncTestClient(create_app()) as client:
+        response = await client.post(cards_urls.DECK_CREATE, json={"name": "deck"})
+        deck_id = response.json()["id"]
+        for name in ("b", "a"):
+            response = await client.post(
+                cards_urls.CARD_CREATE,
+                json={"name": name, "front_content": "front", "back_content": "back"},
+            )
+            await client.post(
+                cards_urls.DECK_ADD_CARD,
+                json={"deck_id": deck_id, "card_id": response.json()["id"]},
+            )
+
+        response = await client.post(
+            cards_urls.STUDY_START,
+            json={"deck_id": deck_id, "filter": {"tag": "verbs"}},
+        )
+        assert response.status_code == HTTP_400_BAD_REQUEST
+
+        response = await client.post(
+            cards_urls.STUDY_START,
+            params={"fields": "name"},
+            json={"deck_id": deck_id, "shuffle": False},
+        )
+        assert response.status_code == HTTP_200_OK
+        session_id = response.json()["id"]
+        assert response.json()["card_count"] == len(("a", "b"))
+
+        next_url = cards_urls.STUDY_NEXT.replace("{session_id:uuid}", session_id)
+        response = await client.post(next_url, params={"count": 10})
+        assert response.status_code == HTTP_200_OK
+        assert [card["name"] for card in response.json()["cards"]] == ["a", "b"]
+        assert response.json()["remaining"] == 0
+
+        await client.delete(cards_urls.STUDY_END.replace("{session_id:uuid}", session_id))
+        response = await client.post(next_url)
+        assert response.status_code == HTTP_400_BAD_REQUEST
@@ -0,0 +1,57 @@
+import pytest
+
+from app.domain.cards.schemas import BatchUntagCard, CardCreate, Change, TagFilterTag
+from app.domain.cards.storage import MemoryCardStorage
+from app.domain.cards.tag_index import TagIndex
+
+pytestmark: pytest.MarkDecorator = pytest.mark.anyio
+
+
+async def test_replayed_changes_keep_the_names_of_other_tags() -> None:
+    storage = MemoryCardStorage()
+    card = await storage.create_card(CardCreate(name="card", front_content="", back_content=""))
+    tag_a = await storage.create_tag("a")
+    tag_b = await storage.create_tag("b")
+    await storage.tag_card(card.id, tag_b.id)
+    index = TagIndex()
+    await index.rebuild(storage)
+
+    # Renames are applied by the worker that made them, then again from the change feed.
+    index.rename_tag(tag_a.id, "c")
+    index.rename_tag(tag_b.id, "a")
+    for change in (
+        Change(entity="tag", operation="create", id=tag_a.id, name="a"),
+        Change(entity="tag", operation="update", id=tag_a.id, name="c"),
+        Change(entity="tag", operation="update", id=tag_b.id, name="a"),
+    ):
+        index.apply_change(change)
+
+    assert index.query(TagFilterTag(tag="a"), limit=10, offset=0) == [card.id]
+    assert index.query(TagFilterTag(tag="c"), limit=10, offset=0) == []
+
+    index.apply_change(Change(entity="tag", operation="delete", id=tag_a.id))
+    assert index.query(TagFilterTag(tag="a"), limit=10, offset=0) == [card.id]
+
+
+async def test_reloaded_decks_are_read_on_refresh() -> None:
+    storage = MemoryCardStorage()
+    index = TagIndex()
+    await index.rebuild(storage)
+
+    # Written without the index hearing of it, like a clone in postgres.
+    deck = await storage.create_deck("deck")
+    card = await storage.create_card(CardCreate(name="card", front_content="", back_content=""))
+    tag = await storage.create_tag("tag")
+    await storage.add_card_to_deck(deck.id, card.id)
+    await storage.tag_card(card.id, tag.id)
+    assert index.query(TagFilterTag(tag="tag"), limit=10, offset=0) == []
+
+    index.apply_change(Change(entity="deck", operation="reload", id=deck.id, deck_ids=[deck.id]))
+    await index.refresh(storage)
+    assert index.query(TagFilterTag(tag="tag"), limit=10, offset=0) == [card.id]
+
+    # So are the tags removed from its cards.
+    await storage.apply_batch([BatchUntagCard(op="untag_card", card_id=card.id, tag_id=tag.id)])
+    index.apply_change(Change(entity="deck", operation="reload", id=deck.id, deck_ids=[deck.id]))
+    await index.refresh(storage)
+    assert index.query(TagFilterTag(tag="tag"), limit=10, offset=0) == []
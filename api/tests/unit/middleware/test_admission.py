@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from app.errors import ServiceOverloadedError
+from app.middleware.admission import AdmissionController
+
+pytestmark: pytest.MarkDecorator = pytest.mark.anyio
+
+
+async def test_requests_queue_for_a_slot() -> None:
+    controller = AdmissionController(limits={"read": 1})
+
+    async def request() -> None:
+        async with controller.admit("read"):
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(request(), request())
+
+
+async def test_requests_are_shed_after_waiting() -> None:
+    controller = AdmissionController(limits={"read": 1}, max_queue_wait=0.01)
+
+    async with controller.admit("read"):
+        with pytest.raises(ServiceOverloadedError) as exc_info:
+            async with controller.admit("read"):
+                pass
+
+    assert exc_info.value.retry_after >= 1
+
+
+async def test_requests_are_shed_immediately_when_queueing_is_slow() -> None:
+    controller = AdmissionController(limits={"read": 1}, max_queue_wait=0.01, target_wait=0.0)
+
+    async with controller.admit("read"):
+        with pytest.raises(ServiceOverloadedError):
+            async with controller.admit("read"):
+                pass
+        # The wait is now above target, so the next one doesn't queue at all.
+        with pytest.raises(ServiceOverloadedError):
+            await asyncio.wait_for(controller.admit("read").__aenter__(), 0.005)
+
+
+async def test_unlimited_route_classes_are_always_admitted() -> None:
+    controller = AdmissionController(limits={"read": 1})
+
+    async with controller.admit("read"), controller.admit("exempt"), controller.admit("exempt"):
+        pass
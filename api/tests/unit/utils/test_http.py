@@ -0,0 +1,41 @@
+import pytest
+
+from app.utils.http import accepts_encoding, etag_matches, parse_byte_range
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        ("bytes=0-9", (0, 9)),
+        ("bytes=90-", (90, 99)),
+        ("bytes=-10", (90, 99)),
+        ("bytes=-1000", (0, 99)),
+        ("bytes=90-1000", (90, 99)),
+        ("bytes=0-9,20-29", None),
+        ("bytes=9-0", None),
+        ("items=0-9", None),
+        ("bytes=-", None),
+    ],
+)
+def test_parse_byte_range(header: str, expected: tuple[int, int] | None) -> None:
+    assert parse_byte_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=-0"])
+def test_parse_unsatisfiable_byte_range(header: str) -> None:
+    with pytest.raises(ValueError, match="not satisfiable"):
+        parse_byte_range(header, 100)
+
+
+def test_etag_matches() -> None:
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+
+
+def test_accepts_encoding() -> None:
+    assert accepts_encoding("gzip, deflate, br", "gzip")
+    assert accepts_encoding("br;q=1.0, *;q=0.5", "gzip")
+    assert not accepts_encoding("gzip;q=0, *", "gzip")
+    assert not accepts_encoding("identity", "gzip")
+    assert not accepts_encoding("", "gzip")
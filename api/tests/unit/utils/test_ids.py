@@ -0,0 +1,26 @@
+import time
+import uuid
+
+from app.utils.ids import uuid7
+
+
+def test_uuid7_version_and_variant() -> None:
+    value = uuid7()
+
+    assert value.version == 7  # noqa: PLR2004
+    assert value.variant == uuid.RFC_4122
+
+
+def test_uuid7_timestamp() -> None:
+    before = time.time_ns() // 1_000_000
+    value = uuid7()
+    after = time.time_ns() // 1_000_000
+
+    assert before <= value.int >> 80 <= after
+
+
+def test_uuid7_is_monotonic() -> None:
+    values = [uuid7() for _ in range(10_000)]
+
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from app.errors import ServiceOverloadedError
+from app.utils.singleflight import SingleFlight
+
+pytestmark: pytest.MarkDecorator = pytest.mark.anyio
+
+
+async def test_concurrent_calls_are_coalesced() -> None:
+    single_flight: SingleFlight[int] = SingleFlight()
+    calls = 0
+
+    async def call() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(single_flight.do("key", call) for _ in range(10)))
+
+    assert results == [1] * 10
+    assert await single_flight.do("key", call) == 2  # noqa: PLR2004
+
+
+async def test_waiters_are_bounded() -> None:
+    single_flight: SingleFlight[None] = SingleFlight(max_waiters=1)
+
+    first = asyncio.ensure_future(single_flight.do("key", lambda: asyncio.sleep(0.01)))
+    await asyncio.sleep(0)
+
+    with pytest.raises(ServiceOverloadedError):
+        await single_flight.do("key", lambda: asyncio.sleep(0.01))
+
+    await first
+
+
+async def test_waiters_time_out() -> None:
+    single_flight: SingleFlight[None] = SingleFlight(timeout=0.01)
+
+    with pytest.raises(ServiceOverloadedError):
+        await single_flight.do("key", lambda: asyncio.sleep(1))
+
+
+async def test_invalidated_calls_are_not_joined() -> None:
+    single_flight: SingleFlight[int] = SingleFlight()
+    calls = 0
+
+    async def call() -> int:
+        nonlocal calls
+        calls += 1
+        result = calls
+        await asyncio.sleep(0.01)
+        return result
+
+    first = asyncio.ensure_future(single_flight.do("key", call))
+    await asyncio.sleep(0)
+    single_flight.invalidate()
+
+    assert await single_flight.do("key", call) == 2  # noqa: PLR2004
+    assert await first == 1
@@ -0,0 +1,55 @@
+-- Compares random (v4) and time-ordered (v7) uuid primary keys.
+--
+-- Run against a scratch database migrated with `pasf database migrate`:
+--   psql -d pasf -f db/benchmarks/uuid_keys.sql
+
+\set rows 1000000
+\set new_rows 100000
+\timing on
+
+DROP TABLE IF EXISTS bench_uuid_v4, bench_uuid_v7, bench_new_v4, bench_new_v7;
+CREATE UNLOGGED TABLE bench_uuid_v4 (id uuid PRIMARY KEY, payload text NOT NULL);
+CREATE UNLOGGED TABLE bench_uuid_v7 (id uuid PRIMARY KEY, payload text NOT NULL);
+
+\echo 'Initial load, random keys'
+INSERT INTO bench_uuid_v4 SELECT gen_random_uuid(), repeat('x', 100) FROM generate_series(1, :rows);
+\echo 'Initial load, time-ordered keys'
+INSERT INTO bench_uuid_v7 SELECT uuid_generate_v7(), repeat('x', 100) FROM generate_series(1, :rows);
+VACUUM ANALYZE bench_uuid_v4, bench_uuid_v7;
+
+-- Inserts into an existing index, the newest keys are kept for the scans below.
+\echo 'Insert into a loaded table, random keys'
+CREATE UNLOGGED TABLE bench_new_v4 AS
+WITH inserted AS (
+	INSERT INTO bench_uuid_v4 SELECT gen_random_uuid(), repeat('x', 100) FROM generate_series(1, :new_rows)
+	RETURNING id
+)
+SELECT id FROM inserted;
+\echo 'Insert into a loaded table, time-ordered keys'
+CREATE UNLOGGED TABLE bench_new_v7 AS
+WITH inserted AS (
+	INSERT INTO bench_uuid_v7 SELECT uuid_generate_v7(), repeat('x', 100) FROM generate_series(1, :new_rows)
+	RETURNING id
+)
+SELECT id FROM inserted;
+\timing off
+VACUUM ANALYZE bench_uuid_v4, bench_uuid_v7;
+
+SELECT indexrelname AS index, pg_size_pretty(pg_relation_size(indexrelid)) AS size
+FROM pg_stat_user_indexes
+WHERE relname IN ('bench_uuid_v4', 'bench_uuid_v7');
+
+-- Reading back the newest rows, e.g. for a sync. Random keys are spread over the
+-- whole index, time-ordered keys are a single key range at its end.
+SET enable_seqscan = off;
+SET enable_bitmapscan = off;
+\echo 'Read the newest rows, random keys'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF, TIMING OFF)
+SELECT count(payload) FROM bench_uuid_v4 WHERE id = ANY (ARRAY(SELECT id FROM bench_new_v4));
+\echo 'Read the newest rows, time-ordered keys'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF, TIMING OFF)
+SELECT count(payload) FROM bench_uuid_v7 WHERE id >= (SELECT id FROM bench_new_v7 ORDER BY id LIMIT 1);
+RESET enable_seqscan;
+RESET enable_bitmapscan;
+
+DROP TABLE bench_uuid_v4, bench_uuid_v7, bench_new_v4, bench_new_v7;
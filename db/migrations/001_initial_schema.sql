@@ -1,3 +1,6 @@
+-- Tables as they were set up by hand before migrations, every statement is a
+-- no-op on databases that already have them.
+
 -- CREATE SCHEMA IF NOT EXISTS api AUTHORIZATION pasf;
 
 -- SET search_path TO api;
@@ -76,3 +79,50 @@ CREATE TABLE IF NOT EXISTS card_tags(
 		ON UPDATE CASCADE
 		ON DELETE CASCADE
 );
+
+-- DROP TABLE IF EXISTS card_media;
+
+CREATE TABLE IF NOT EXISTS card_media (
+	id uuid PRIMARY KEY,
+	card_id uuid NOT NULL
+		REFERENCES cards (id)
+		ON UPDATE CASCADE
+		ON DELETE CASCADE,
+	sha256 char(64) NOT NULL,
+	size bigint NOT NULL,
+	media_type varchar(255) NOT NULL,
+	filename varchar(255),
+	created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- DROP TABLE IF EXISTS jobs;
+
+CREATE TABLE IF NOT EXISTS jobs (
+	id uuid PRIMARY KEY,
+	kind varchar(32) NOT NULL,
+	target_id uuid NOT NULL,
+	options jsonb NOT NULL DEFAULT '{}',
+	status varchar(16) NOT NULL DEFAULT 'pending',
+	progress bigint NOT NULL DEFAULT 0,
+	total bigint,
+	error text,
+	created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+	updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- At most one unfinished job per target, resubmitting returns the existing one.
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_unfinished_unique
+	ON jobs (kind, target_id)
+	WHERE status IN ('pending', 'running');
+
+-- DROP TABLE IF EXISTS idempotency_keys;
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+	operation varchar(64) NOT NULL,
+	key varchar(255) NOT NULL,
+	request_hash char(64) NOT NULL,
+	status_code smallint,
+	body bytea,
+	expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+	PRIMARY KEY (operation, key)
+);
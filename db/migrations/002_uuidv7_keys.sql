@@ -0,0 +1,30 @@
+-- Switch primary keys to time-ordered UUIDv7.
+--
+-- Existing keys are kept, clients may hold on to them. New keys all sort within
+-- a narrow, growing range, so inserts only touch the right edge of that range
+-- in each primary key index instead of random pages all over it.
+
+CREATE OR REPLACE FUNCTION uuid_generate_v7() RETURNS uuid AS $$
+	SELECT encode(
+		set_bit(
+			set_bit(
+				overlay(
+					uuid_send(gen_random_uuid())
+					PLACING substring(int8send(floor(extract(epoch FROM clock_timestamp()) * 1000)::bigint) FROM 3)
+					FROM 1 FOR 6
+				),
+				52, 1
+			),
+			53, 1
+		),
+		'hex'
+	)::uuid;
+$$ LANGUAGE sql VOLATILE;
+
+ALTER TABLE decks ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE cards ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE deck_cards ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE tags ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE card_tags ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE card_media ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE jobs ALTER COLUMN id SET DEFAULT uuid_generate_v7();
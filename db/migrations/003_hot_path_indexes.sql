@@ -0,0 +1,36 @@
+-- migrate: no-transaction
+--
+-- Indexes for every lookup the api runs, built without blocking writes.
+-- `pasf database check-plans` verifies the queries actually use them.
+
+-- Foreign keys aren't indexed by postgres, without these cascading card and
+-- tag deletes and reverse lookups scan the whole table.
+
+-- Decks of a card, on every card update and delete.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS deck_cards_card_id_index ON deck_cards (card_id);
+
+-- Tags of a card on deck pages, and checking a card isn't tagged twice.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS card_tags_card_id_tag_id_index ON card_tags (card_id, tag_id);
+
+DROP INDEX CONCURRENTLY IF EXISTS card_tags_card_id_index;
+
+-- Deleting a tag's card tags in batches.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS card_tags_tag_id_index ON card_tags (tag_id);
+
+-- Listing a card's media in upload order, without a sort.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS card_media_card_id_created_at_index
+	ON card_media (card_id, created_at, id);
+
+DROP INDEX CONCURRENTLY IF EXISTS card_media_card_id_index;
+
+-- Claiming the oldest unfinished job, finished jobs are most of the table.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS jobs_unfinished_created_at_index
+	ON jobs (created_at)
+	WHERE status IN ('pending', 'running');
+
+-- Listing the newest jobs.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS jobs_created_at_index ON jobs (created_at);
+
+-- Purging expired idempotency keys.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idempotency_keys_expires_at_index
+	ON idempotency_keys (expires_at);
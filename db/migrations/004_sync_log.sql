@@ -0,0 +1,91 @@
+-- Delta sync log, with the latest change to every card, deck, tag and relation.
+--
+-- Kept up to date by triggers, so changes made by cascades, jobs and plain sql
+-- are logged too. Deleted rows stay behind as tombstones until they're purged.
+
+CREATE SEQUENCE IF NOT EXISTS sync_log_seq;
+
+CREATE TABLE IF NOT EXISTS sync_log (
+	entity varchar(16) NOT NULL,
+	id uuid NOT NULL,
+	deleted boolean NOT NULL,
+	-- Orders changes for paging, it's assigned before commit so it isn't
+	-- enough to tell what a client has seen. The transaction id is used for that.
+	seq bigint NOT NULL DEFAULT nextval('sync_log_seq'),
+	xid xid8 NOT NULL DEFAULT pg_current_xact_id(),
+	changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+	PRIMARY KEY (entity, id)
+);
+
+CREATE INDEX IF NOT EXISTS sync_log_xid_index ON sync_log (xid);
+
+CREATE INDEX IF NOT EXISTS sync_log_tombstones_index ON sync_log (changed_at) WHERE deleted;
+
+-- Newest transaction id of a purged tombstone, older sync tokens can't be served.
+CREATE TABLE IF NOT EXISTS sync_horizon (
+	id boolean PRIMARY KEY DEFAULT TRUE CHECK (id),
+	xid xid8 NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION log_sync_changes() RETURNS trigger AS $$
+BEGIN
+	INSERT INTO sync_log (entity, id, deleted)
+	SELECT TG_ARGV[0], changed_rows.id, TG_OP = 'DELETE'
+	FROM changed_rows
+	ON CONFLICT (entity, id) DO UPDATE
+	SET deleted = EXCLUDED.deleted,
+		seq = EXCLUDED.seq,
+		xid = EXCLUDED.xid,
+		changed_at = EXCLUDED.changed_at;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement level, so bulk writes log all their rows with a single insert.
+DO $$
+DECLARE
+	synced record;
+BEGIN
+	FOR synced IN
+		SELECT * FROM (VALUES
+			('decks', 'deck'),
+			('cards', 'card'),
+			('tags', 'tag'),
+			('deck_cards', 'deck_card'),
+			('card_tags', 'card_tag')
+		) AS t (table_name, entity)
+	LOOP
+		EXECUTE format(
+			'CREATE OR REPLACE TRIGGER %1$I AFTER INSERT ON %2$I '
+			'REFERENCING NEW TABLE AS changed_rows '
+			'FOR EACH STATEMENT EXECUTE FUNCTION log_sync_changes(%3$L);',
+			synced.table_name || '_sync_insert', synced.table_name, synced.entity
+		);
+		EXECUTE format(
+			'CREATE OR REPLACE TRIGGER %1$I AFTER UPDATE ON %2$I '
+			'REFERENCING NEW TABLE AS changed_rows '
+			'FOR EACH STATEMENT EXECUTE FUNCTION log_sync_changes(%3$L);',
+			synced.table_name || '_sync_update', synced.table_name, synced.entity
+		);
+		EXECUTE format(
+			'CREATE OR REPLACE TRIGGER %1$I AFTER DELETE ON %2$I '
+			'REFERENCING OLD TABLE AS changed_rows '
+			'FOR EACH STATEMENT EXECUTE FUNCTION log_sync_changes(%3$L);',
+			synced.table_name || '_sync_delete', synced.table_name, synced.entity
+		);
+	END LOOP;
+END;
+$$;
+
+-- Rows that existed before the log did.
+INSERT INTO sync_log (entity, id, deleted)
+SELECT 'deck', id, FALSE FROM decks
+UNION ALL
+SELECT 'card', id, FALSE FROM cards
+UNION ALL
+SELECT 'tag', id, FALSE FROM tags
+UNION ALL
+SELECT 'deck_card', id, FALSE FROM deck_cards
+UNION ALL
+SELECT 'card_tag', id, FALSE FROM card_tags
+ON CONFLICT (entity, id) DO NOTHING;
@@ -0,0 +1,16 @@
+-- migrate: no-transaction
+--
+-- A card can only have a tag once. Checking before inserting isn't enough with
+-- concurrent requests, the index makes the database reject the second one.
+
+-- Duplicates left by concurrent requests, the card tag with the lowest id is kept.
+DELETE FROM card_tags
+USING card_tags AS kept
+WHERE card_tags.card_id = kept.card_id
+	AND card_tags.tag_id = kept.tag_id
+	AND card_tags.id > kept.id;
+
+-- Tags of a card on deck pages, and checking a card isn't tagged twice.
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS card_tag_unique ON card_tags (card_id, tag_id);
+
+DROP INDEX CONCURRENTLY IF EXISTS card_tags_card_id_tag_id_index;
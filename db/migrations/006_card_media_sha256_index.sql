@@ -0,0 +1,4 @@
+-- migrate: no-transaction
+--
+-- Checking which blobs are still referenced when sweeping media.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS card_media_sha256_index ON card_media (sha256);
@@ -0,0 +1,2 @@
+-- Headers of stored responses, so retries get the same response.
+ALTER TABLE idempotency_keys ADD COLUMN IF NOT EXISTS headers jsonb;